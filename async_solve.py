@@ -0,0 +1,430 @@
+"""
+Solving puzzles from asyncio code
+
+The solvers in puzzle_tools block until they finish, so these run them
+in a thread or in a process of their own while the event loop carries
+on. They report how many puzzles have been expanded from time to time,
+and stop the search once the task awaiting it is cancelled. Requests
+for a search already running, for an equal puzzle with the same solver
+and options, wait for that search instead of starting another.
+"""
+from functools import partial
+from puzzle_tools import (PuzzleNode, a_star_solve, beam_solve,
+                          breadth_first_solve, depth_first_solve,
+                          greedy_best_first_solve, iterative_deepening_solve)
+from search_hooks import SearchHooks
+import asyncio
+import multiprocessing
+import threading
+
+# solvers that can be run, by name
+SOLVERS = {"depth_first": depth_first_solve,
+           "breadth_first": breadth_first_solve,
+           "a_star": a_star_solve,
+           "beam": beam_solve,
+           "greedy_best_first": greedy_best_first_solve,
+           "iterative_deepening": iterative_deepening_solve}
+
+# searches running, by (solver, puzzle, process, options)
+_in_flight = {}
+
+
+class SearchCancelled(Exception):
+    """
+    Raised inside a search to stop it once nobody is waiting for it.
+    """
+    pass
+
+
+class _ProgressHooks(SearchHooks):
+    """
+    Solver hooks that count the puzzles expanded, and every interval of
+    them report the count and check whether the search was cancelled,
+    passing every event on to other hooks, if any.
+    """
+
+    def __init__(self, interval, report, cancelled, hooks=None):
+        """
+        Create _ProgressHooks self calling report with the number of
+        puzzles expanded every interval puzzles, and stopping the search
+        once cancelled is set, and passing every event on to hooks.
+
+        @type self: _ProgressHooks
+        @type interval: int
+        @type report: (int) -> None
+        @type cancelled: threading.Event | multiprocessing.Event
+        @type hooks: SearchHooks | None
+        @rtype: None
+        """
+        assert interval > 0
+        self.interval, self.report = interval, report
+        self.cancelled, self.hooks = cancelled, hooks
+        self.expanded = 0
+
+    def on_expand(self, puzzle, depth):
+        """
+        Count the expansion of puzzle.
+
+        @type self: _ProgressHooks
+        @type puzzle: Puzzle
+        @type depth: int
+        @rtype: None
+        """
+        self.expanded += 1
+        if self.expanded % self.interval == 0:
+            if self.cancelled.is_set():
+                raise SearchCancelled()
+            self.report(self.expanded)
+        if self.hooks is not None:
+            self.hooks.on_expand(puzzle, depth)
+
+    def on_generate(self, puzzle, depth):
+        """
+        Pass on that puzzle was made as an extension.
+
+        @type self: _ProgressHooks
+        @type puzzle: Puzzle
+        @type depth: int
+        @rtype: None
+        """
+        if self.hooks is not None:
+            self.hooks.on_generate(puzzle, depth)
+
+    def on_prune(self, puzzle, depth):
+        """
+        Pass on that puzzle was dropped because it fails fast.
+
+        @type self: _ProgressHooks
+        @type puzzle: Puzzle
+        @type depth: int
+        @rtype: None
+        """
+        if self.hooks is not None:
+            self.hooks.on_prune(puzzle, depth)
+
+    def on_duplicate(self, puzzle, depth):
+        """
+        Pass on that puzzle was dropped because it was seen already.
+
+        @type self: _ProgressHooks
+        @type puzzle: Puzzle
+        @type depth: int
+        @rtype: None
+        """
+        if self.hooks is not None:
+            self.hooks.on_duplicate(puzzle, depth)
+
+    def on_solution(self, puzzle, depth):
+        """
+        Pass on that puzzle is the solution found.
+
+        @type self: _ProgressHooks
+        @type puzzle: Puzzle
+        @type depth: int
+        @rtype: None
+        """
+        if self.hooks is not None:
+            self.hooks.on_solution(puzzle, depth)
+
+
+def _path(node):
+    """
+    Return the class and context of the puzzles along the path starting at
+    PuzzleNode node, with what to_bytes returns for each, to be sent
+    without the deep nesting of the nodes themselves.
+
+    @type node: PuzzleNode
+    @rtype: (type, object, list[bytes])
+    """
+    cls, context = type(node.puzzle), node.puzzle.context()
+    states = [node.puzzle.to_bytes()]
+    while node.children:
+        node = node.children[0]
+        states.append(node.puzzle.to_bytes())
+    return cls, context, states
+
+
+def _chain(path):
+    """
+    Return the path of PuzzleNodes through the puzzles of path, as _path
+    gives it.
+
+    @type path: (type, object, list[bytes])
+    @rtype: PuzzleNode
+    """
+    cls, context, states = path
+    root = node = PuzzleNode(cls.from_bytes(states[0], context))
+    for data in states[1:]:
+        child = PuzzleNode(cls.from_bytes(data, context), None, node)
+        node.children = [child]
+        node = child
+    return root
+
+
+def _run_in_process(solver, puzzle, options, interval, conn, cancelled):
+    """
+    Run SOLVERS[solver] on puzzle with options in this process, sending
+    progress and then the outcome over conn.
+
+    @type solver: str
+    @type puzzle: Puzzle
+    @type options: dict
+    @type interval: int
+    @type conn: multiprocessing.connection.Connection
+    @type cancelled: multiprocessing.Event
+    @rtype: None
+    """
+    hooks = _ProgressHooks(interval,
+                           lambda n: conn.send(("progress", n)), cancelled)
+    try:
+        result = SOLVERS[solver](puzzle, hooks=hooks, **options)
+    except SearchCancelled:
+        conn.send(("cancelled", None))
+    except Exception as error:
+        conn.send(("error", error))
+    else:
+        if isinstance(result, PuzzleNode):
+            conn.send(("path", _path(result)))
+        else:
+            conn.send(("result", result))
+    finally:
+        conn.close()
+
+
+class _Search:
+    """
+    One search running for everyone waiting for it.
+    """
+
+    def __init__(self):
+        """
+        Create a _Search self with nobody waiting for it yet.
+
+        @type self: _Search
+        @rtype: None
+        """
+        self.progress, self.waiters, self.task = [], 0, None
+
+    def report(self, expanded):
+        """
+        Pass the number of puzzles expanded so far to everyone waiting
+        who asked for progress.
+
+        @type self: _Search
+        @type expanded: int
+        @rtype: None
+        """
+        for progress in list(self.progress):
+            progress(expanded)
+
+    async def in_thread(self, solver, puzzle, options, interval, executor,
+                        hooks):
+        """
+        Return the result of SOLVERS[solver] on puzzle with options, run
+        in executor, or the event loop's default executor if None, passing
+        the events of the search on to hooks, if any.
+
+        @type self: _Search
+        @type solver: str
+        @type puzzle: Puzzle
+        @type options: dict
+        @type interval: int
+        @type executor: concurrent.futures.Executor | None
+        @type hooks: SearchHooks | None
+        @rtype: object
+        """
+        loop = asyncio.get_running_loop()
+        cancelled = threading.Event()
+        hooks = _ProgressHooks(
+            interval, lambda n: loop.call_soon_threadsafe(self.report, n),
+            cancelled, hooks)
+        try:
+            return await loop.run_in_executor(
+                executor, partial(SOLVERS[solver], puzzle, hooks=hooks,
+                                  **options))
+        except asyncio.CancelledError:
+            # the thread carries on until the hooks next look
+            cancelled.set()
+            raise
+
+    async def in_process(self, solver, puzzle, options, interval):
+        """
+        Return the result of SOLVERS[solver] on puzzle with options, run
+        in a new process.
+
+        @type self: _Search
+        @type solver: str
+        @type puzzle: Puzzle
+        @type options: dict
+        @type interval: int
+        @rtype: object
+        """
+        loop = asyncio.get_running_loop()
+        conn, child_conn = multiprocessing.Pipe(duplex=False)
+        cancelled = multiprocessing.Event()
+        process = multiprocessing.Process(
+            target=_run_in_process,
+            args=(solver, puzzle, options, interval, child_conn, cancelled),
+            daemon=True)
+        process.start()
+        child_conn.close()
+        messages = asyncio.Queue()
+
+        def receive():
+            try:
+                messages.put_nowait(conn.recv())
+            except EOFError:
+                loop.remove_reader(conn.fileno())
+                messages.put_nowait(
+                    ("error", RuntimeError("search process ended early")))
+
+        loop.add_reader(conn.fileno(), receive)
+        try:
+            while True:
+                kind, value = await messages.get()
+                if kind == "progress":
+                    self.report(value)
+                elif kind == "path":
+                    return _chain(value)
+                elif kind == "result":
+                    return value
+                elif kind == "error":
+                    raise value
+        except asyncio.CancelledError:
+            cancelled.set()
+            raise
+        finally:
+            loop.remove_reader(conn.fileno())
+            # let a cancelled search stop by itself for a moment
+            await loop.run_in_executor(None, process.join, 1)
+            if process.is_alive():
+                process.terminate()
+                process.join()
+            conn.close()
+
+
+async def solve_async(puzzle, solver="breadth_first", process=False,
+                      progress=None, interval=1000, executor=None, hooks=None,
+                      **options):
+    """
+    Return what SOLVERS[solver] returns for puzzle with keyword arguments
+    options, searching in a thread of executor, or a new process if
+    process is True, without blocking the event loop.
+
+    Every interval puzzles expanded, progress, if given, is called with the
+    number expanded so far, and the search stops if every task awaiting it
+    has been cancelled. While a search is running, awaiting the same
+    search, for a puzzle equal to puzzle with the same solver, process,
+    hooks and options, waits for it instead of starting another.
+
+    Hooks, if given, are called with the events of the search, in the
+    thread searching. They can't be given with process True, since what
+    they recorded would stay in the other process. Nor can options ask
+    for worker processes, which would search beyond reach of progress
+    and cancellation.
+
+    @type puzzle: Puzzle
+    @type solver: str
+    @type process: bool
+    @type progress: ((int) -> None) | None
+    @type interval: int
+    @type executor: concurrent.futures.Executor | None
+    @type hooks: SearchHooks | None
+    @rtype: object
+
+    >>> from word_ladder_puzzle import WordLadderPuzzle
+    >>> word_set = {"case", "same", "some", "rome", "rose", "rost", "cost"}
+    >>> w = WordLadderPuzzle("same", "cost", word_set)
+    >>> asyncio.run(solve_async(w, moves=True))
+    ['some', 'rome', 'rose', 'rost', 'cost']
+    >>> node = asyncio.run(solve_async(w, "depth_first", process=True))
+    >>> node.children[0].puzzle == w.apply_move("some")
+    True
+    >>> async def twice():
+    ...     first = asyncio.ensure_future(solve_async(w, moves=True))
+    ...     second = asyncio.ensure_future(solve_async(w, moves=True))
+    ...     await asyncio.sleep(0)
+    ...     running = len(_in_flight)
+    ...     return running, await first == await second
+    >>> asyncio.run(twice())
+    (1, True)
+    >>> from search_hooks import SearchProfile
+    >>> profile = SearchProfile()
+    >>> asyncio.run(solve_async(w, hooks=profile, moves=True))
+    ['some', 'rome', 'rose', 'rost', 'cost']
+    >>> profile.total("solution")
+    1
+    >>> asyncio.run(solve_async(w, workers=2))
+    Traceback (most recent call last):
+    ...
+    ValueError: worker processes can't be cancelled or report progress
+    """
+    if options.get("workers") is not None:
+        raise ValueError(
+            "worker processes can't be cancelled or report progress")
+    if process and hooks is not None:
+        raise ValueError("hooks can't be given for a search in a process")
+    if process:
+        key = (solver, puzzle, process, tuple(sorted(options.items())))
+    else:
+        key = (solver, puzzle, process, executor, hooks,
+               tuple(sorted(options.items())))
+    try:
+        hash(key)
+    except TypeError:
+        # options that can't be compared can't be shared
+        key = object()
+    search = _in_flight.get(key)
+    if search is None:
+        search = _Search()
+        if process:
+            coroutine = search.in_process(solver, puzzle, options, interval)
+        else:
+            coroutine = search.in_thread(solver, puzzle, options, interval,
+                                         executor, hooks)
+        search.task = asyncio.ensure_future(coroutine)
+        _in_flight[key] = search
+        search.task.add_done_callback(lambda _: _in_flight.pop(key, None))
+    if progress is not None:
+        search.progress.append(progress)
+    search.waiters += 1
+    try:
+        return await asyncio.shield(search.task)
+    finally:
+        search.waiters -= 1
+        if progress is not None:
+            search.progress.remove(progress)
+        if search.waiters == 0 and not search.task.done():
+            # nobody is left waiting for this search
+            search.task.cancel()
+
+
+async def depth_first_solve_async(puzzle, **options):
+    """
+    Return what depth_first_solve returns for puzzle, as solve_async does.
+
+    @type puzzle: Puzzle
+    @rtype: PuzzleNode | list | None
+    """
+    return await solve_async(puzzle, "depth_first", **options)
+
+
+async def breadth_first_solve_async(puzzle, **options):
+    """
+    Return what breadth_first_solve returns for puzzle, as solve_async
+    does.
+
+    @type puzzle: Puzzle
+    @rtype: PuzzleNode | list | None
+
+    >>> from mn_puzzle import MNPuzzle
+    >>> start_grid = (("5", "4", "*"), ("3", "2", "1"))
+    >>> target_grid = (("1", "2", "3"), ("4", "5", "*"))
+    >>> counts = []
+    >>> moves = asyncio.run(breadth_first_solve_async(
+    ...     MNPuzzle(start_grid, target_grid), moves=True, interval=10,
+    ...     progress=counts.append))
+    >>> len(moves), counts[:3]
+    (13, [10, 20, 30])
+    """
+    return await solve_async(puzzle, "breadth_first", **options)
@@ -0,0 +1,591 @@
+"""
+Microbenchmarks of the methods solvers call for every puzzle
+
+Solving a puzzle end to end takes too long, and varies too much from run
+to run, to show a method getting 20% slower. These time extensions(),
+is_solved(), fail_fast(), == and hashing the state key on their own, for
+each kind of puzzle at a few sizes, over states sampled by random moves
+from a fixed seed.
+
+Every timed call is made on a fresh copy of its state, rebuilt with
+from_bytes, so that nothing a puzzle keeps from an earlier call makes
+it look faster than it is in a search. The states are timed a few at a
+time, each few right after a fixed piece of plain Python work like that
+puzzles do, the reference, so that a machine running faster or slower
+from one moment to the next changes both alike. Each method is timed as
+a multiple of the reference over a few passes through all of them, so
+that a slow spell of the machine falls on only some of the passes of
+each, and the median pass is kept.
+
+A process has its own layout in memory and seed for hashing strings,
+which can make a method faster or slower in it throughout, so the passes
+are run in several new processes and the median process is kept, along
+with how much the processes spread: the noise of the method.
+
+Run with --save to record the times and noise as the baseline in
+benchmarks.json, next to this file, and with --compare to check the
+times against it, failing if any method is slower, as a multiple of the
+reference, by more than the threshold and by more than its noise can
+explain. A method that seems slower is timed again in more processes,
+and only reported if it is still slower with those added. Multiples of
+the reference are much steadier than nanoseconds from machine to
+machine, but are best compared with a baseline recorded on the same
+machine and Python.
+"""
+from grid_peg_solitaire_puzzle import GridPegSolitairePuzzle
+from mn_puzzle import MNPuzzle
+from random import Random
+from sudoku_puzzle import SudokuPuzzle
+from time import perf_counter
+from word_dictionary import WordDictionary
+from word_ladder_puzzle import WordLadderPuzzle
+from statistics import median
+import gc
+import json
+import multiprocessing
+import os
+
+# where the baseline is kept
+BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                        "benchmarks.json")
+
+# each method timed, called on a puzzle p and a fresh copy q of it
+OPERATIONS = {"extensions": lambda p, q: p.extensions(),
+              "is_solved": lambda p, q: p.is_solved(),
+              "fail_fast": lambda p, q: p.fail_fast(),
+              "eq": lambda p, q: p == q,
+              "hash": lambda p, q: hash(p.state_key())}
+
+# states sampled for each case
+_STATES = 200
+
+# states timed together right after the reference
+_CHUNK = 10
+
+# rounds of the reference run before each few states
+_REFERENCE = 10
+
+# standard errors by which a method must be slower to be reported
+_CONFIDENCE = 3.0
+
+
+def _reference(n):
+    """
+    Do n rounds of the tuple, string, set and dict work puzzles do, as a
+    measure of how fast the machine is running. Every round starts
+    afresh, so the time taken grows in proportion to n.
+
+    @type n: int
+    @rtype: dict[(int, str), int]
+    """
+    found = {}
+    for _ in range(n):
+        found, seen, recent = {}, set(), ()
+        for i in range(16):
+            word = "abcdefgh"[i % 8:] + "xyz"[:i % 3]
+            pair = (i, word)
+            if pair not in seen:
+                seen.add(pair)
+            found[pair] = found.get(pair, 0) + len(recent)
+            recent = recent[1:4] + (i,)
+            hash(recent)
+    return found
+
+
+def _walk(puzzle, random, count, every=1):
+    """
+    Return the states of up to count puzzles met on random walks from
+    puzzle, as to_bytes gives them, keeping one in every every puzzles
+    and starting over from puzzle whenever a walk gets stuck.
+
+    @type puzzle: Puzzle
+    @type random: Random
+    @type count: int
+    @type every: int
+    @rtype: list[bytes]
+    """
+    states, current, step = [], puzzle, 0
+    while len(states) < count:
+        extensions = current.extensions()
+        if not extensions:
+            current = puzzle
+            continue
+        current = random.choice(extensions)
+        step += 1
+        if step % every == 0:
+            states.append(current.to_bytes())
+    return states
+
+
+def _mn_case(n, m, random):
+    """
+    Return an nxm MNPuzzle working towards tiles in order with the blank
+    last, and states sampled from it.
+
+    @type n: int
+    @type m: int
+    @type random: Random
+    @rtype: (MNPuzzle, list[bytes])
+    """
+    symbols = [str(i) for i in range(1, n * m)] + ["*"]
+    grid = tuple([tuple(symbols[r * m:(r + 1) * m]) for r in range(n)])
+    puzzle = MNPuzzle(grid, grid)
+    return puzzle, _walk(puzzle, random, _STATES, every=3)
+
+
+def _sudoku_case(n, random):
+    """
+    Return an nxn SudokuPuzzle, and states with a random number of its
+    positions left open, from none to all but one.
+
+    @type n: int
+    @type random: Random
+    @rtype: (SudokuPuzzle, list[bytes])
+    """
+    root = round(n ** (1 / 2))
+    symbol_set = set("123456789ABCDEFGHIJKLMNOPQRSTUVWXYZ"[:n])
+    order = sorted(symbol_set)
+    # a solved grid, shifted by a box and a row from row to row
+    solved = [order[(r * root + r // root + c) % n]
+              for r in range(n) for c in range(n)]
+    puzzle = SudokuPuzzle(n, solved, symbol_set)
+    states = []
+    for _ in range(_STATES):
+        symbols = solved[:]
+        for i in random.sample(range(n * n), random.randrange(n * n)):
+            symbols[i] = "*"
+        states.append(SudokuPuzzle(n, symbols, symbol_set).to_bytes())
+    return puzzle, states
+
+
+def _peg_case(rows, cols, random):
+    """
+    Return a GridPegSolitairePuzzle on a rows x cols board, with its
+    corners cut away if it is at least 7x7, full of pegs but for the
+    middle, and states sampled from it.
+
+    @type rows: int
+    @type cols: int
+    @type random: Random
+    @rtype: (GridPegSolitairePuzzle, list[bytes])
+    """
+    cut = 2 if min(rows, cols) >= 7 else 0
+    grid = [["#" if (r < cut or r >= rows - cut) and
+             (c < cut or c >= cols - cut) else "*"
+             for c in range(cols)] for r in range(rows)]
+    grid[rows // 2][cols // 2] = "."
+    puzzle = GridPegSolitairePuzzle(grid, {"*", ".", "#"})
+    return puzzle, _walk(puzzle, random, _STATES)
+
+
+def _word_case(length, words, random):
+    """
+    Return a WordLadderPuzzle between words of length letters, and
+    states at other words of that length, all going to the same word.
+
+    @type length: int
+    @type words: WordDictionary
+    @type random: Random
+    @rtype: (WordLadderPuzzle, list[bytes])
+    """
+    pool = sorted(words.words(length))
+    to_word = random.choice(pool)
+    puzzle = WordLadderPuzzle(random.choice(pool), to_word, words)
+    return puzzle, [WordLadderPuzzle(w, to_word, words).to_bytes()
+                    for w in random.sample(pool, _STATES)]
+
+
+def cases(words=None):
+    """
+    Yield the name of each case, a puzzle of that case and states of
+    puzzles sharing its context, the same ones on every run.
+
+    The word ladder cases use the words at path words, or words.wdb if it
+    has been compiled and words otherwise.
+
+    @type words: str | None
+    @rtype: iterator[(str, Puzzle, list[bytes])]
+    """
+    random = Random(2016)
+    for n, m in [(3, 3), (4, 4), (5, 5)]:
+        yield ("MNPuzzle {}x{}".format(n, m),) + _mn_case(n, m, random)
+    for n in [4, 9, 16]:
+        yield ("SudokuPuzzle {}x{}".format(n, n),) + _sudoku_case(n, random)
+    for rows, cols in [(4, 4), (5, 5), (7, 7)]:
+        yield (("GridPegSolitairePuzzle {}x{}".format(rows, cols),) +
+               _peg_case(rows, cols, random))
+    if words is None:
+        words = "words.wdb" if os.path.exists("words.wdb") else "words"
+    if words.endswith(".wdb"):
+        dictionary = WordDictionary.open(words)
+    else:
+        dictionary = WordDictionary.from_file(words)
+    for length in [3, 5, 7]:
+        yield (("WordLadderPuzzle {} letters".format(length),) +
+               _word_case(length, dictionary, random))
+
+
+def _pass(operation, puzzle, states):
+    """
+    Return the seconds that OPERATIONS[operation] took on fresh copies of
+    the puzzles with states states and the context of puzzle, a few
+    states at a time, and the seconds _reference took just before each
+    few.
+
+    @type operation: str
+    @type puzzle: Puzzle
+    @type states: list[bytes]
+    @rtype: (float, float)
+    """
+    call, cls, context = OPERATIONS[operation], type(puzzle), puzzle.context()
+    puzzles = [cls.from_bytes(data, context) for data in states]
+    copies = [cls.from_bytes(data, context) for data in states]
+    elapsed = reference = 0.0
+    enabled = gc.isenabled()
+    gc.disable()
+    try:
+        for c in range(0, len(states), _CHUNK):
+            start = perf_counter()
+            _reference(_REFERENCE)
+            reference += perf_counter() - start
+            start = perf_counter()
+            for p, q in zip(puzzles[c:c + _CHUNK], copies[c:c + _CHUNK]):
+                call(p, q)
+            elapsed += perf_counter() - start
+    finally:
+        if enabled:
+            gc.enable()
+    return elapsed, reference
+
+
+def _measure(repeats, words, only):
+    """
+    Return the nanoseconds per call and the multiple of the reference of
+    each operation in each case, or only the (case, operation) pairs in
+    only if it is given, timed in this process over repeats passes
+    through all of them, as the median of the passes.
+
+    @type repeats: int
+    @type words: str | None
+    @type only: set[(str, str)] | None
+    @rtype: dict[str, dict[str, (float, float)]]
+    """
+    timed, sizes = [], {}
+    for name, puzzle, states in cases(words):
+        operations = [operation for operation in OPERATIONS
+                      if only is None or (name, operation) in only]
+        if operations:
+            # a first pass fills what puzzles share, such as the
+            # neighbours of words, as an earlier part of a search would
+            _pass("extensions", puzzle, states)
+            timed.append((name, puzzle, states, operations))
+            sizes[name] = len(states)
+    passes = {}
+    for _ in range(repeats):
+        for name, puzzle, states, operations in timed:
+            for operation in operations:
+                passes.setdefault((name, operation), []).append(
+                    _pass(operation, puzzle, states))
+    measured = {}
+    for (name, operation), times in passes.items():
+        measured.setdefault(name, {})[operation] = (
+            median([elapsed for elapsed, _ in times]) / sizes[name] * 1e9,
+            median([elapsed / reference for elapsed, reference in times]) *
+            _REFERENCE / sizes[name])
+    return measured
+
+
+def _noise(samples):
+    """
+    Return the spread of samples, as a fraction of their median: the
+    standard deviation it would be if they were normally distributed,
+    estimated from their median absolute deviation.
+
+    @type samples: list[float]
+    @rtype: float
+
+    >>> round(_noise([1.0, 1.1, 0.9, 1.0, 2.0]), 4)
+    0.1483
+    """
+    middle = median(samples)
+    return 1.4826 * median([abs(s - middle) for s in samples]) / middle
+
+
+def _summary(samples, ns):
+    """
+    Return the times of an operation from the multiples of the reference
+    samples and nanoseconds ns measured in separate processes.
+
+    @type samples: list[float]
+    @type ns: list[float]
+    @rtype: dict[str, float | int | list[float]]
+    """
+    return {"ns": median(ns), "relative": median(samples),
+            "noise": _noise(samples), "processes": len(samples),
+            "samples": samples, "ns_samples": ns}
+
+
+def run(repeats=3, processes=5, words=None, report=None, only=None):
+    """
+    Return the time of each operation in each case, as a dict from case
+    name to a dict from operation to a dict of "ns", the median
+    nanoseconds per call, "relative", the median multiple of the
+    reference, "noise", how much the multiples measured in different
+    processes spread, and "processes", how many there were, with the
+    samples themselves. Only the (case, operation) pairs in only are
+    timed if it is given.
+
+    Each of processes new processes times every operation over repeats
+    passes: a process has a layout in memory and a seed for hashing
+    strings of its own, which change times by more than running the
+    same process longer can make up for.
+
+    report, if given, is called with the case, operation and times of
+    each once all are measured.
+
+    @type repeats: int
+    @type processes: int
+    @type words: str | None
+    @type report: ((str, str, dict) -> None) | None
+    @type only: set[(str, str)] | None
+    @rtype: dict[str, dict[str, dict]]
+    """
+    measured = []
+    with multiprocessing.get_context("spawn").Pool(
+            1, maxtasksperchild=1) as pool:
+        for _ in range(processes):
+            measured.append(pool.apply(_measure, (repeats, words, only)))
+    results = {}
+    for name in measured[0]:
+        results[name] = {}
+        for operation in measured[0][name]:
+            times = results[name][operation] = _summary(
+                [m[name][operation][1] for m in measured],
+                [m[name][operation][0] for m in measured])
+            if report is not None:
+                report(name, operation, times)
+    return results
+
+
+def _pool(results, more):
+    """
+    Add the samples of more to those of results, for the operations in
+    both.
+
+    @type results: dict[str, dict[str, dict]]
+    @type more: dict[str, dict[str, dict]]
+    @rtype: None
+    """
+    for name, operations in more.items():
+        for operation, times in operations.items():
+            old = results[name][operation]
+            results[name][operation] = _summary(
+                old["samples"] + times["samples"],
+                old["ns_samples"] + times["ns_samples"])
+
+
+def compare(baseline, results, threshold, confidence=_CONFIDENCE):
+    """
+    Return the case, operation, baseline and new times, relative to the
+    reference, of each operation in both baseline and results that
+    became slower by more than the fraction threshold, and by more than
+    confidence standard errors of the difference between the two, as
+    estimated from how much each spread between processes.
+
+    An operation spreading a lot between processes must be slower by
+    more than threshold to be reported, by as much as tolerance gives.
+
+    @type baseline: dict[str, dict[str, dict]]
+    @type results: dict[str, dict[str, dict]]
+    @type threshold: float
+    @type confidence: float
+    @rtype: list[(str, str, float, float)]
+
+    >>> baseline = {"A": {"eq": {"relative": 1.0, "noise": 0.02,
+    ...                          "processes": 9},
+    ...                   "hash": {"relative": 2.0, "noise": 0.02,
+    ...                            "processes": 9}},
+    ...             "B": {"eq": {"relative": 3.0, "noise": 0.02,
+    ...                          "processes": 9}}}
+    >>> results = {"A": {"eq": {"relative": 1.25, "noise": 0.02,
+    ...                         "processes": 5},
+    ...                  "hash": {"relative": 1.5, "noise": 0.02,
+    ...                           "processes": 5}},
+    ...            "C": {"eq": {"relative": 9.0, "noise": 0.02,
+    ...                         "processes": 5}}}
+    >>> compare(baseline, results, 0.2)
+    [('A', 'eq', 1.0, 1.25)]
+    >>> compare(baseline, results, 0.3)
+    []
+    >>> results["A"]["eq"]["noise"] = 0.2
+    >>> compare(baseline, results, 0.2)
+    []
+    """
+    slower = []
+    for name in sorted(results):
+        for operation, times in sorted(results[name].items()):
+            old = baseline.get(name, {}).get(operation)
+            if old is None:
+                continue
+            change = times["relative"] / old["relative"] - 1
+            if change > tolerance(old, times, threshold, confidence):
+                slower.append((name, operation, old["relative"],
+                               times["relative"]))
+    return slower
+
+
+def tolerance(old, new, threshold, confidence=_CONFIDENCE):
+    """
+    Return the fraction by which an operation with times new must be
+    slower than with times old for compare to report it: threshold, or
+    confidence standard errors of the difference between their medians,
+    whichever is more.
+
+    @type old: dict
+    @type new: dict
+    @type threshold: float
+    @type confidence: float
+    @rtype: float
+
+    >>> old = {"noise": 0.04, "processes": 9}
+    >>> tolerance(old, {"noise": 0.04, "processes": 5}, 0.15)
+    0.15
+    >>> round(tolerance(old, {"noise": 0.1, "processes": 5}, 0.15), 4)
+    0.2097
+    """
+    noise = max(old["noise"], new["noise"])
+    # the standard error of a median is about 1.25 times that of a mean
+    error = 1.2533 * noise * (1 / old["processes"] +
+                              1 / new["processes"]) ** 0.5
+    return max(threshold, confidence * error)
+
+
+def confirm(baseline, results, threshold, retries=2, repeats=3,
+            processes=5, words=None):
+    """
+    Return what compare returns for baseline and results, after timing
+    each operation that seems slower again in processes more processes,
+    up to retries more times, adding the new samples to those of results
+    so that the medians grow steadier each time.
+
+    @type baseline: dict[str, dict[str, dict]]
+    @type results: dict[str, dict[str, dict]]
+    @type threshold: float
+    @type retries: int
+    @type repeats: int
+    @type processes: int
+    @type words: str | None
+    @rtype: list[(str, str, float, float)]
+    """
+    slower = compare(baseline, results, threshold)
+    for _ in range(retries):
+        if not slower:
+            break
+        only = {(name, operation) for name, operation, _, _ in slower}
+        _pool(results, run(repeats, processes, words, only=only))
+        suspects = {}
+        for name, operation in only:
+            suspects.setdefault(name, {})[operation] = results[name][operation]
+        slower = compare(baseline, suspects, threshold)
+    return slower
+
+
+def load(path=BASELINE):
+    """
+    Return the times recorded at path by save.
+
+    @type path: str
+    @rtype: dict[str, dict[str, dict]]
+    """
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)["results"]
+
+
+def save(results, path=BASELINE):
+    """
+    Record results at path as the baseline, without the samples.
+
+    @type results: dict[str, dict[str, dict]]
+    @type path: str
+    @rtype: None
+    """
+    import platform
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({"python": platform.python_version(),
+                   "machine": platform.machine(),
+                   "results": {name: {op: {"ns": round(t["ns"], 6),
+                                           "relative": round(t["relative"], 6),
+                                           "noise": round(t["noise"], 6),
+                                           "processes": t["processes"]}
+                                      for op, t in times.items()}
+                               for name, times in results.items()}},
+                  f, indent=1, sort_keys=True)
+        f.write("\n")
+
+
+if __name__ == "__main__":
+    import doctest
+    doctest.testmod()
+    import argparse
+    import sys
+    parser = argparse.ArgumentParser(
+        description="Time the methods solvers call for every puzzle.")
+    parser.add_argument("--save", action="store_true",
+                        help="record the times as the baseline")
+    parser.add_argument("--compare", action="store_true",
+                        help="fail if any time is slower than the baseline "
+                             "by more than the threshold")
+    parser.add_argument("--threshold", type=float, default=0.15,
+                        help="slowdown allowed by --compare, as a fraction")
+    parser.add_argument("--retries", type=int, default=2,
+                        help="times a method that seems slower is timed "
+                             "again before it is reported")
+    parser.add_argument("--baseline", default=BASELINE,
+                        help="baseline file, benchmarks.json by default")
+    parser.add_argument("--processes", type=int, default=None,
+                        help="processes timing every method, 9 with --save "
+                             "and 5 otherwise")
+    parser.add_argument("--repeats", type=int, default=3,
+                        help="passes through every method in each process, "
+                             "of which the median is kept")
+    parser.add_argument("--words", default=None,
+                        help="words for word ladders")
+    args = parser.parse_args()
+    processes = args.processes or (9 if args.save else 5)
+    baseline = load(args.baseline) if args.compare else {}
+    start = perf_counter()
+
+    def report(name, operation, times):
+        old = baseline.get(name, {}).get(operation)
+        change = "" if old is None else "{:+7.1%}".format(
+            times["relative"] / old["relative"] - 1)
+        print("{:<30} {:<11} {:>12.0f} ns {:>10.4f} x {:>6.1%} {}".format(
+            name, operation, times["ns"], times["relative"], times["noise"],
+            change))
+
+    results = run(args.repeats, processes, args.words, report)
+    print("ran in {:.1f} seconds".format(perf_counter() - start))
+    if args.save:
+        save(results, args.baseline)
+        print("saved the baseline to {}".format(args.baseline))
+        # what --compare, with its own processes timed again as often as
+        # it may, needs to see before it reports a method slower
+        compared = {"processes": 5 * (args.retries + 1)}
+        for name, times in sorted(results.items()):
+            for operation, t in sorted(times.items()):
+                needed = tolerance(t, dict(compared, noise=t["noise"]),
+                                   args.threshold)
+                if needed > args.threshold:
+                    print("too noisy here for --compare to report less than "
+                          "{:.0%} slower: {} {}".format(needed, name,
+                                                        operation))
+    if args.compare:
+        slower = confirm(baseline, results, args.threshold, args.retries,
+                         args.repeats, processes, args.words)
+        for name, operation, old, new in slower:
+            print("SLOWER: {} {} {:.4f} x -> {:.4f} x ({:+.1%})".format(
+                name, operation, old, new, new / old - 1))
+        if slower:
+            sys.exit(1)
+        print("no method slower than the baseline by more than {:.0%}".format(
+            args.threshold))
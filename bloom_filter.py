@@ -0,0 +1,181 @@
+"""
+A compact, probabilistic set of seen states
+
+A BloomFilter stands in for the set of seen states passed to
+depth_first_solve when an exact set would not fit in memory. It keeps a
+fixed number of bits however many states are added, at the price of
+sometimes claiming a state was seen when it wasn't, which makes a search
+skip that state.
+"""
+from math import ceil, exp, log
+
+_MASK = (1 << 64) - 1
+
+
+def _fingerprint(key):
+    """
+    Return a well mixed 64-bit fingerprint of hashable key.
+
+    Python hashes small ints to themselves, so hash(key) is scrambled
+    with the splitmix64 finaliser before its bits are used.
+
+    @type key: object
+    @rtype: int
+    """
+    z = (hash(key) + 0x9E3779B97F4A7C15) & _MASK
+    z = ((z ^ (z >> 30)) * 0xBF58476D1CE4E5B9) & _MASK
+    z = ((z ^ (z >> 27)) * 0x94D049BB133111EB) & _MASK
+    return z ^ (z >> 31)
+
+
+class BloomFilter:
+    """
+    A set of hashable keys that supports add and in, and may answer True
+    for a key never added, but never False for a key that was.
+    """
+
+    def __init__(self, capacity, error_rate=0.001, memory=None):
+        """
+        Create an empty BloomFilter self sized to hold capacity keys with
+        a chance of error_rate of wrongly reporting a key as added, or
+        with memory bytes of bits if memory is given, in which case
+        error_rate is whatever those bits allow.
+
+        @type self: BloomFilter
+        @type capacity: int
+        @type error_rate: float
+        @type memory: int | None
+        @rtype: None
+
+        >>> BloomFilter(1000, 0.01).memory
+        1199
+        >>> BloomFilter(1000, memory=1024).hashes
+        6
+        """
+        assert capacity > 0
+        if memory is None:
+            assert 0 < error_rate < 1
+            memory = int(ceil(-capacity * log(error_rate) / log(2) ** 2 / 8))
+        assert memory > 0
+        self.capacity, self.memory = capacity, memory
+        self._size = 8 * memory
+        # the number of hashes that makes errors least likely when full
+        self.hashes = max(1, int(round(self._size / capacity * log(2))))
+        self._bits = bytearray(memory)
+        self._added = self._set = 0
+
+    def _positions(self, key):
+        """
+        Return the bits that stand for key, chosen by double hashing from
+        the two halves of its fingerprint.
+
+        @type self: BloomFilter
+        @type key: object
+        @rtype: list[int]
+        """
+        fingerprint = _fingerprint(key)
+        h1, h2 = fingerprint & 0xFFFFFFFF, (fingerprint >> 32) | 1
+        return [(h1 + i * h2) % self._size for i in range(self.hashes)]
+
+    def add(self, key):
+        """
+        Add key to this BloomFilter.
+
+        @type self: BloomFilter
+        @type key: object
+        @rtype: None
+        """
+        bits = self._bits
+        for p in self._positions(key):
+            byte, bit = p >> 3, 1 << (p & 7)
+            if not bits[byte] & bit:
+                bits[byte] |= bit
+                self._set += 1
+        self._added += 1
+
+    def __contains__(self, key):
+        """
+        Return whether key may have been added to this BloomFilter; False
+        means it certainly was not.
+
+        @type self: BloomFilter
+        @type key: object
+        @rtype: bool
+
+        >>> seen = BloomFilter(100)
+        >>> seen.add(5)
+        >>> 5 in seen
+        True
+        >>> 6 in seen
+        False
+        """
+        bits = self._bits
+        for p in self._positions(key):
+            if not bits[p >> 3] & (1 << (p & 7)):
+                return False
+        return True
+
+    def __len__(self):
+        """
+        Return the number of keys added to this BloomFilter, counting a key
+        added again each time.
+
+        @type self: BloomFilter
+        @rtype: int
+        """
+        return self._added
+
+    def fill_ratio(self):
+        """
+        Return the fraction of the bits of this BloomFilter that are set.
+
+        @type self: BloomFilter
+        @rtype: float
+
+        >>> seen = BloomFilter(1000, memory=1000)
+        >>> seen.fill_ratio()
+        0.0
+        >>> for i in range(1000):
+        ...     seen.add(i)
+        >>> 0.4 < seen.fill_ratio() < 0.6
+        True
+        """
+        return self._set / self._size
+
+    def error_rate(self):
+        """
+        Return the chance, as this BloomFilter is filled now, that a key
+        never added is reported as added.
+
+        @type self: BloomFilter
+        @rtype: float
+        """
+        return self.fill_ratio() ** self.hashes
+
+    def expected_error_rate(self):
+        """
+        Return the chance that a key never added is reported as added once
+        capacity keys have been added.
+
+        @type self: BloomFilter
+        @rtype: float
+
+        >>> round(BloomFilter(1000, 0.01).expected_error_rate(), 3)
+        0.01
+        """
+        return (1 - exp(-self.hashes * self.capacity / self._size)) ** \
+            self.hashes
+
+    def __repr__(self):
+        """
+        Return a representation of this BloomFilter.
+
+        @type self: BloomFilter
+        @rtype: str
+
+        >>> BloomFilter(1000, memory=1024)
+        BloomFilter(capacity=1000, memory=1024, added=0, fill_ratio=0.000)
+        """
+        return ("BloomFilter(capacity={}, memory={}, added={}, "
+                "fill_ratio={:.3f})".format(self.capacity, self.memory,
+                                            self._added, self.fill_ratio()))
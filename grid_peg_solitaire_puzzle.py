@@ -1,28 +1,430 @@
+from operator import add
 from puzzle import Puzzle
+from puzzle_tools import PuzzleNode, solution_moves
+from weakref import WeakValueDictionary
+from zobrist import zobrist_keys
+
+# weight of a peg one step further from a cell in a pagoda function,
+# chosen so that SIGMA ** 2 + SIGMA == 1
+SIGMA = (5 ** 0.5 - 1) / 2
+
+# pagoda values closer than this are taken as equal
+_SLACK = 1e-9
+
+# boards shared by every puzzle with the same shape and unused cells
+_boards = WeakValueDictionary()
+
+
+class _PegBoard:
+    """
+    What GridPegSolitairePuzzles on the same board share: its shape, which
+    cells are in use and every jump that can be made on it.
+
+    Cell (row, col) is bit row * cols + col of a board's bit masks.
+    """
+
+    def __init__(self, rows, cols, holes):
+        """
+        Create the board with rows rows and cols columns whose cells in
+        use are the bits set in holes.
+
+        Each jump is kept as the masks of the cell jumped from, the cell
+        jumped over and the cell landed in, the three together, the
+        (row, column) of each of the three cells and the change it makes
+        to the Zobrist hash of the pegs. They are listed by landing cell in
+        reading order, then landing from the right, left, above and below.
+
+        @type self: _PegBoard
+        @type rows: int
+        @type cols: int
+        @type holes: int
+        @rtype: None
+        """
+        self.rows, self.cols, self.holes = rows, cols, holes
+        # Zobrist key of a peg in each flat position
+        self.zobrist = zobrist_keys(rows * cols)
+        # built when symmetry_tables is first asked
+        self._symmetry_tables = None
+        # cells in each class of the two three-colourings of the board,
+        # by (row + col) % 3 and by (row - col) % 3
+        self._classes = [0] * 6
+        for p in range(rows * cols):
+            row, col = divmod(p, cols)
+            self._classes[(row + col) % 3] |= 1 << p
+            self._classes[3 + (row - col) % 3] |= 1 << p
+        # tables for pagoda functions, built as they are first needed
+        self._final_cells, self._pagoda_deltas = {}, {}
+        self.jumps, self.jump_at = [], {}
+        for row in range(rows):
+            for col in range(cols):
+                for dr, dc in [(0, 1), (0, -1), (-1, 0), (1, 0)]:
+                    cells = [(row + 2 * dr, col + 2 * dc),
+                             (row + dr, col + dc), (row, col)]
+                    if all([0 <= r < rows and 0 <= c < cols and
+                            holes >> (r * cols + c) & 1 for r, c in cells]):
+                        f, o, t = [r * cols + c for r, c in cells]
+                        key = (self.zobrist[f] ^ self.zobrist[o] ^
+                               self.zobrist[t])
+                        f, o, t = 1 << f, 1 << o, 1 << t
+                        jump = (f, o, t, f | o | t, tuple(cells), key)
+                        self.jumps.append(jump)
+                        self.jump_at[tuple(cells)] = jump
+
+    def symmetry_tables(self):
+        """
+        Return, for each reflection or rotation of the board other than
+        the identity that maps usable cells onto usable cells, a table
+        per byte of a peg mask giving where that byte's pegs are moved.
+
+        @type self: _PegBoard
+        @rtype: list[list[list[int]]]
+        """
+        if self._symmetry_tables is None:
+            rows, cols, cells = self.rows, self.cols, self.rows * self.cols
+            moves = [lambda r, c: (r, cols - 1 - c),
+                     lambda r, c: (rows - 1 - r, c),
+                     lambda r, c: (rows - 1 - r, cols - 1 - c)]
+            if rows == cols:
+                moves += [lambda r, c: (c, r),
+                          lambda r, c: (cols - 1 - c, rows - 1 - r),
+                          lambda r, c: (c, rows - 1 - r),
+                          lambda r, c: (cols - 1 - c, r)]
+            self._symmetry_tables = []
+            for move in moves:
+                image = []
+                for p in range(cells):
+                    r, c = move(*divmod(p, cols))
+                    image.append(r * cols + c)
+                if all([(self.holes >> p & 1) == (self.holes >> image[p] & 1)
+                        for p in range(cells)]):
+                    self._symmetry_tables.append(
+                        [[sum([1 << image[8 * k + i] for i in range(8)
+                               if byte >> i & 1 and 8 * k + i < cells])
+                          for byte in range(256)]
+                         for k in range((cells + 7) // 8)])
+        return self._symmetry_tables
+
+    @staticmethod
+    def image(pegs, tables):
+        """
+        Return where the pegs in bit mask pegs are moved by the reflection
+        or rotation given by tables, one of self.symmetry_tables().
+
+        @type pegs: int
+        @type tables: list[list[int]]
+        @rtype: int
+        """
+        image = 0
+        for table in tables:
+            image |= table[pegs & 255]
+            pegs >>= 8
+        return image
+
+    def signature(self, pegs):
+        """
+        Return which of the classes of each three-colouring of the board
+        hold an odd number of the pegs in bit mask pegs, up to swapping
+        odd and even.
+
+        Each jump covers one cell of every class, taking a peg from two
+        classes and adding one to the third, so it swaps odd and even in
+        every class and leaves the signature unchanged.
+
+        @type self: _PegBoard
+        @type pegs: int
+        @rtype: ((int, int, int), (int, int, int))
+        """
+        signature = []
+        for masks in (self._classes[:3], self._classes[3:]):
+            odd = [bin(pegs & mask).count("1") % 2 for mask in masks]
+            if odd[0]:
+                odd = [1 - x for x in odd]
+            signature.append(tuple(odd))
+        return tuple(signature)
+
+    def final_cells(self, signature):
+        """
+        Return the flat positions of the usable cells where a last peg
+        would have signature signature.
+
+        @type self: _PegBoard
+        @type signature: ((int, int, int), (int, int, int))
+        @rtype: tuple[int]
+        """
+        if signature not in self._final_cells:
+            self._final_cells[signature] = tuple(
+                [p for p in range(self.rows * self.cols)
+                 if self.holes >> p & 1 and
+                 self.signature(1 << p) == signature])
+        return self._final_cells[signature]
+
+    def _weight(self, p, t):
+        """
+        Return the weight of a peg at flat position p in the pagoda
+        function for cell t: SIGMA to the power of their distance apart
+        along rows and columns. For any jump the weights of the two cells
+        left empty add up to at least the weight of the cell landed in.
+
+        @type self: _PegBoard
+        @type p: int
+        @type t: int
+        @rtype: float
+        """
+        (pr, pc), (tr, tc) = divmod(p, self.cols), divmod(t, self.cols)
+        return SIGMA ** (abs(pr - tr) + abs(pc - tc))
+
+    def pagoda(self, pegs, cells):
+        """
+        Return the value for the pegs in bit mask pegs of the pagoda
+        function of each cell in cells. No jump ever increases a value,
+        and a single peg on a cell gives that cell's pagoda value 1.
+
+        @type self: _PegBoard
+        @type pegs: int
+        @type cells: tuple[int]
+        @rtype: tuple[float]
+        """
+        occupied = [p for p in range(self.rows * self.cols) if pegs >> p & 1]
+        return tuple([sum([self._weight(p, t) for p in occupied])
+                      for t in cells])
+
+    def pagoda_deltas(self, cells):
+        """
+        Return, for each jump in self.jumps, how it changes the value of
+        the pagoda function of each cell in cells.
+
+        @type self: _PegBoard
+        @type cells: tuple[int]
+        @rtype: list[tuple[float]]
+        """
+        if cells not in self._pagoda_deltas:
+            deltas = []
+            for f, o, t, _, _, _ in self.jumps:
+                f, o, t = [x.bit_length() - 1 for x in (f, o, t)]
+                deltas.append(tuple([self._weight(t, c) - self._weight(f, c) -
+                                     self._weight(o, c) for c in cells]))
+            self._pagoda_deltas[cells] = deltas
+        return self._pagoda_deltas[cells]
+
+    def cells(self, pegs):
+        """
+        Return the flat positions of the bits set in pegs.
+
+        @type self: _PegBoard
+        @type pegs: int
+        @rtype: tuple[int]
+        """
+        return tuple([p for p in range(self.rows * self.cols)
+                      if pegs >> p & 1])
+
+    def hash(self, pegs):
+        """
+        Return the Zobrist hash of the pegs in bit mask pegs.
+
+        @type self: _PegBoard
+        @type pegs: int
+        @rtype: int
+        """
+        zobrist = 0
+        for p in self.cells(pegs):
+            zobrist ^= self.zobrist[p]
+        return zobrist
+
+    def jumps_from(self, pegs, values, deltas):
+        """
+        Yield each jump that can be made with the pegs in bit mask pegs,
+        with the pegs it leaves and pagoda values values updated by that
+        jump's entry in deltas.
+
+        @type self: _PegBoard
+        @type pegs: int
+        @type values: tuple[float]
+        @type deltas: list[tuple[float]]
+        @rtype: Generator[(tuple, int, tuple[float)]]
+        """
+        for i, jump in enumerate(self.jumps):
+            if pegs & jump[0] and pegs & jump[1] and not pegs & jump[2]:
+                yield jump, pegs ^ jump[3], tuple(map(add, values, deltas[i]))
+
+    def unjumps_from(self, pegs, values, deltas):
+        """
+        Yield each jump that could have left the pegs in bit mask pegs,
+        with the pegs before it and pagoda values values of the empty
+        cells updated by that jump's entry in deltas. Emptying the cells a
+        jump fills and filling those it empties is itself a jump, so a
+        jump undone changes the pagoda values of the empty cells as a jump
+        changes those of the pegs.
+
+        @type self: _PegBoard
+        @type pegs: int
+        @type values: tuple[float]
+        @type deltas: list[tuple[float]]
+        @rtype: Generator[(tuple, int, tuple[float)]]
+        """
+        for i, jump in enumerate(self.jumps):
+            if pegs & jump[2] and not pegs & jump[0] and not pegs & jump[1]:
+                yield jump, pegs ^ jump[3], tuple(map(add, values, deltas[i]))
+
+    @staticmethod
+    def get(marker):
+        """
+        Return the shared board with the shape and unused cells of marker.
+
+        @type marker: list[list[str]]
+        @rtype: _PegBoard
+        """
+        rows, cols = len(marker), len(marker[0])
+        holes = 0
+        for row in range(rows):
+            for col in range(cols):
+                if marker[row][col] != "#":
+                    holes |= 1 << (row * cols + col)
+        return _PegBoard.intern(rows, cols, holes)
+
+    @staticmethod
+    def intern(rows, cols, holes):
+        """
+        Return the shared board with rows rows and cols columns whose cells
+        in use are the bits set in holes.
+
+        @type rows: int
+        @type cols: int
+        @type holes: int
+        @rtype: _PegBoard
+        """
+        key = (rows, cols, holes)
+        board = _boards.get(key)
+        if board is None:
+            board = _PegBoard(rows, cols, holes)
+            _boards[key] = board
+        return board
+
+    def __reduce__(self):
+        """
+        Return how to pickle this board, so that unpickling it gives back
+        the shared board rather than a copy of its tables.
+
+        @type self: _PegBoard
+        @rtype: tuple
+
+        >>> import pickle
+        >>> gpsp = GridPegSolitairePuzzle([["*", "*", "."]], {"*", ".", "#"})
+        >>> pickle.loads(pickle.dumps(gpsp))._board is gpsp._board
+        True
+        """
+        return _PegBoard.intern, (self.rows, self.cols, self.holes)
+
+    def pegs(self, marker):
+        """
+        Return the bit mask of the pegs in marker.
+
+        @type self: _PegBoard
+        @type marker: list[list[str]]
+        @rtype: int
+        """
+        pegs = 0
+        for row in range(self.rows):
+            for col in range(self.cols):
+                if marker[row][col] == "*":
+                    pegs |= 1 << (row * self.cols + col)
+        return pegs
+
+    def marker(self, pegs):
+        """
+        Return the rows of markers for the pegs in bit mask pegs.
+
+        @type self: _PegBoard
+        @type pegs: int
+        @rtype: list[list[str]]
+        """
+        marker = []
+        for row in range(self.rows):
+            marker.append([])
+            for col in range(self.cols):
+                bit = 1 << (row * self.cols + col)
+                if not self.holes & bit:
+                    marker[row].append("#")
+                elif pegs & bit:
+                    marker[row].append("*")
+                else:
+                    marker[row].append(".")
+        return marker
 
 
 class GridPegSolitairePuzzle(Puzzle):
     """
     Snapshot of peg solitaire on a rectangular grid. May be solved,
     unsolved, or even unsolvable.
+
+    The pegs are kept as the bits of an int, so a jump flips three bits
+    and is found by testing precomputed masks of the board's jumps.
     """
 
-    def __init__(self, marker, marker_set):
+    def __init__(self, marker, marker_set, target=None):
         """
         Create a new GridPegSolitairePuzzle self with
         marker indicating pegs, spaces, and unused
         and marker_set indicating allowed markers.
 
+        The puzzle is solved when the pegs are placed as in target, which
+        must use the same cells as marker, or when one peg is left if
+        target is None.
+
         @type marker: list[list[str]]
         @type marker_set: set[str]
                           "#" for unused, "*" for peg, "." for empty
+        @type target: list[list[str]] | None
         """
         assert isinstance(marker, list)
         assert len(marker) > 0
         assert all([len(x) == len(marker[0]) for x in marker[1:]])
         assert all([all(x in marker_set for x in row) for row in marker])
         assert all([x == "*" or x == "." or x == "#" for x in marker_set])
-        self._marker, self._marker_set = marker, marker_set
+        self._board = _PegBoard.get(marker)
+        self._pegs, self._marker_set = self._board.pegs(marker), marker_set
+        self._zobrist = self._board.hash(self._pegs)
+        # worked out when fail_fast is first asked, then kept up to date
+        self._final_cells = self._pagoda = None
+        self._target = self._floors = None
+        if target is not None:
+            assert _PegBoard.get(target) is self._board, \
+                "target must use the same cells"
+            self._target = self._board.pegs(target)
+            # a configuration can only reach the target if none of the
+            # pagoda functions of the target's pegs is below its value
+            # for the target
+            self._final_cells = self._board.cells(self._target)
+            self._floors = self._board.pagoda(self._target, self._final_cells)
+
+    def _jumped(self, pegs, zobrist=None):
+        """
+        Return a new GridPegSolitairePuzzle on the same board as self with
+        the pegs in bit mask pegs, whose Zobrist hash is zobrist if given.
+
+        @type self: GridPegSolitairePuzzle
+        @type pegs: int
+        @type zobrist: int | None
+        @rtype: GridPegSolitairePuzzle
+        """
+        puzzle = self.__class__.__new__(self.__class__)
+        puzzle._board, puzzle._pegs = self._board, pegs
+        if zobrist is None:
+            zobrist = self._board.hash(pegs)
+        puzzle._zobrist = zobrist
+        puzzle._marker_set = self._marker_set
+        puzzle._target, puzzle._floors = self._target, self._floors
+        puzzle._final_cells, puzzle._pagoda = self._final_cells, None
+        return puzzle
+
+    @property
+    def _marker(self):
+        """
+        Rows of markers, "#" for unused, "*" for peg, "." for empty.
+
+        @type self: GridPegSolitairePuzzle
+        @rtype: list[list[str]]
+        """
+        return self._board.marker(self._pegs)
 
     def __str__(self):
         """
@@ -97,8 +499,141 @@ class GridPegSolitairePuzzle(Puzzle):
         >>> gpsp3 ==  gpsp4
         False
         """
-        return (type(self) == type(other) and self._marker == other._marker and
-                self._marker_set == other._marker_set)
+        return (type(self) == type(other) and self._pegs == other._pegs and
+                self._board is other._board and
+                self._marker_set == other._marker_set and
+                self._target == other._target)
+
+    def __hash__(self):
+        """
+        Return the Zobrist hash of the pegs of this GridPegSolitairePuzzle,
+        kept up to date jump by jump
+
+        @type self: GridPegSolitairePuzzle
+        @rtype: int
+
+        >>> grid = [["*", "*", ".", "#"]]
+        >>> hash(GridPegSolitairePuzzle(grid, {"*", ".", "#"})) == hash(
+        ...     GridPegSolitairePuzzle([row[:] for row in grid], {"*", ".", "#"}))
+        True
+        >>> jumped = GridPegSolitairePuzzle(grid, {"*", ".", "#"}).extensions()
+        >>> hash(jumped[0]) == hash(
+        ...     GridPegSolitairePuzzle([[".", ".", "*", "#"]], {"*", ".", "#"}))
+        True
+        """
+        return self._zobrist
+
+    def state_key(self):
+        """
+        Overrides Puzzle.state_key()
+
+        Return the bit mask of pegs, which identifies the configuration
+        among those on the same board and, being an int, is hashed and
+        compared at least as quickly as the Zobrist hash.
+
+        @type self: GridPegSolitairePuzzle
+        @rtype: int
+
+        >>> GridPegSolitairePuzzle([["*", ".", "*"]], {"*", ".", "#"}).state_key()
+        5
+        """
+        return self._pegs
+
+    def context(self):
+        """
+        Overrides Puzzle.context()
+
+        Return what every GridPegSolitairePuzzle reached from self shares:
+        the board, the markers allowed, and the target with its pagoda
+        tables if there is one.
+
+        @type self: GridPegSolitairePuzzle
+        @rtype: tuple
+        """
+        return (self._board, self._marker_set, self._target,
+                None if self._target is None else self._final_cells,
+                self._floors)
+
+    def to_bytes(self):
+        """
+        Overrides Puzzle.to_bytes()
+
+        Return the bit mask of pegs, a bit for each cell of the board.
+
+        @type self: GridPegSolitairePuzzle
+        @rtype: bytes
+
+        >>> grid = [["*", "*", "*", "*", "*"], ["*", "*", ".", "*", "*"]]
+        >>> gpsp = GridPegSolitairePuzzle(grid, {"*", ".", "#"})
+        >>> data = gpsp.extensions()[0].to_bytes()
+        >>> len(data)
+        2
+        >>> copy = GridPegSolitairePuzzle.from_bytes(data, gpsp.context())
+        >>> copy == gpsp.extensions()[0]
+        True
+        >>> target = [[".", ".", ".", ".", "."], [".", ".", "*", ".", "."]]
+        >>> gpsp = GridPegSolitairePuzzle(grid, {"*", ".", "#"}, target)
+        >>> copy = GridPegSolitairePuzzle.from_bytes(gpsp.to_bytes(),
+        ...                                          gpsp.context())
+        >>> copy == gpsp, hash(copy) == hash(gpsp)
+        (True, True)
+        """
+        board = self._board
+        return self._pegs.to_bytes((board.rows * board.cols + 7) // 8,
+                                   "little")
+
+    @classmethod
+    def from_bytes(cls, data, context):
+        """
+        Overrides Puzzle.from_bytes()
+
+        Return the GridPegSolitairePuzzle whose to_bytes gave data, given
+        its context().
+
+        @type cls: type
+        @type data: bytes
+        @type context: tuple
+        @rtype: GridPegSolitairePuzzle
+        """
+        board, marker_set, target, final_cells, floors = context
+        puzzle = cls.__new__(cls)
+        puzzle._board, puzzle._marker_set = board, marker_set
+        puzzle._pegs = int.from_bytes(data, "little")
+        puzzle._zobrist = board.hash(puzzle._pegs)
+        puzzle._target, puzzle._floors = target, floors
+        puzzle._final_cells, puzzle._pagoda = final_cells, None
+        return puzzle
+
+    def canonical_key(self):
+        """
+        Overrides Puzzle.canonical_key()
+
+        Return the smallest bit mask of pegs among the reflections and
+        rotations of this configuration that fit the board, and that leave
+        the target in place if there is one. Whether the puzzle can be
+        solved doesn't depend on which of these is played.
+
+        @type self: GridPegSolitairePuzzle
+        @rtype: int
+
+        >>> grid1 = [["*", "*", "."], [".", ".", "."], [".", ".", "."]]
+        >>> grid2 = [[".", ".", "."], [".", ".", "*"], [".", ".", "*"]]
+        >>> p1 = GridPegSolitairePuzzle(grid1, {"*", ".", "#"})
+        >>> p2 = GridPegSolitairePuzzle(grid2, {"*", ".", "#"})
+        >>> p1.canonical_key() == p2.canonical_key()
+        True
+        >>> p1.canonical_key() == p1.extensions()[0].canonical_key()
+        False
+        """
+        pegs = best = self._pegs
+        for tables in self._board.symmetry_tables():
+            if (self._target is not None and
+                    _PegBoard.image(self._target, tables) != self._target):
+                continue
+            image = _PegBoard.image(pegs, tables)
+            if image < best:
+                best = image
+        return best
 
     def extensions(self):
         """
@@ -157,78 +692,122 @@ class GridPegSolitairePuzzle(Puzzle):
         True
         """
 
+        pegs, board, pagoda = self._pegs, self._board, self._pagoda
+        zobrist = self._zobrist
+        if pagoda is None:
+            # a jump needs pegs on its first two cells and a hole on its last
+            return [self._jumped(pegs ^ cells, zobrist ^ key)
+                    for f, o, t, cells, _, key in board.jumps
+                    if pegs & f and pegs & o and not pegs & t]
+        # keep the pagoda values fail_fast uses up to date
         new_configs = []
-        # to save typing
-        m = [x for x in self._marker]
-
-        for row in range(len(m)):
-            for col in range(len(m[row])):
-
-                if m[row][col] == ".":
-                    if (col + 2 < len(m[row]) and m[row][col + 2] == "*" and
-                        m[row][col + 1] == "*"):
-                        # jump to the left
-                        new_marker = m[:]
-                        new_marker[row] = (m[row][: col] + ["*"] + ["."] +
-                                           ["."] + m[row][col + 3:])
-                        puz = GridPegSolitairePuzzle(new_marker,
-                                                     self._marker_set)
-                        new_configs.append(puz)
-
-                    if (col - 2 >= 0 and m[row][col - 2] == "*" and
-                        m[row][col - 1] == "*"):
-                        # jump to the right
-                        new_marker = m[:]
-                        new_marker[row] = (m[row][: col - 2] + ["."] + ["."] +
-                                           ["*"] + m[row][col + 1:])
-
-                        puz = GridPegSolitairePuzzle(new_marker,
-                                                     self._marker_set)
-                        new_configs.append(puz)
-
-                    if (row - 2 >= 0 and m[row - 2][col] == "*" and
-                                m[row - 1][col] == "*"):
-                        # jump down
-                        new_marker = []
-
-                        # copy contents of m into new_marker
-                        for i in range(len(m)):
-                            new_marker.append([])
-                            for item in m[i]:
-                                new_marker[i].append(item)
-
-                        new_marker[row - 2][col] = "."
-                        new_marker[row - 1][col] = "."
-                        new_marker[row][col] = "*"
-                        puz = GridPegSolitairePuzzle(new_marker,
-                                                     self._marker_set)
-                        new_configs.append(puz)
-
-                    if (row + 2 < len(m) and m[row + 2][col] == "*" and
-                                m[row + 1][col] == "*"):
-                        # jump up
-
-                        new_marker = []
-                        for i in range(len(m)):
-                            new_marker.append([])
-                            for item in m[i]:
-                                new_marker[i].append(item)
-
-                        new_marker[row + 2][col] = "."
-                        new_marker[row + 1][col] = "."
-                        new_marker[row][col] = "*"
-                        puz = GridPegSolitairePuzzle(new_marker,
-                                                     self._marker_set)
-                        new_configs.append(puz)
-
+        deltas = board.pagoda_deltas(self._final_cells)
+        for jump, new_pegs, values in board.jumps_from(pegs, pagoda, deltas):
+            puz = self._jumped(new_pegs, zobrist ^ jump[5])
+            puz._final_cells, puz._pagoda = self._final_cells, values
+            new_configs.append(puz)
         return new_configs
 
+    def fail_fast(self):
+        """
+        Overrides Puzzle.fail_fast()
+
+        Return True if this configuration can never be reduced to one peg,
+        or to the target if there is one.
+
+        A jump leaves the signature of the pegs, as given by
+        _PegBoard.signature, unchanged, so the last peg can only be left on
+        a cell with the same signature. Nor does a jump ever increase the
+        pagoda function of a cell, which is 1 for a single peg on that
+        cell, so a cell whose pagoda value is below 1 can't be the last
+        one either. The cells left are found once, and their pagoda values
+        are then updated by each jump. The target, likewise, needs the
+        same signature and no smaller pagoda values for its pegs' cells.
+
+        @type self: GridPegSolitairePuzzle
+        @rtype: bool
+
+        >>> grid = [["*", "*", "*", "."]]
+        >>> GridPegSolitairePuzzle(grid, {"*", ".", "#"}).fail_fast()
+        True
+        >>> grid = [["*", ".", ".", ".", "*"]]
+        >>> GridPegSolitairePuzzle(grid, {"*", ".", "#"}).fail_fast()
+        True
+        >>> grid = [["*", "*", ".", "*", "*"], ["*", "*", "*", "*", "*"]]
+        >>> GridPegSolitairePuzzle(grid, {"*", ".", "#"}).fail_fast()
+        False
+        >>> target = [[".", ".", ".", ".", "."], [".", ".", ".", "*", "."]]
+        >>> GridPegSolitairePuzzle(grid, {"*", ".", "#"}, target).fail_fast()
+        True
+        """
+        pegs, board, target = self._pegs, self._board, self._target
+        if target is None:
+            if pegs & (pegs - 1) == 0:
+                # already solved
+                return False
+            if self._pagoda is None:
+                self._final_cells = board.final_cells(board.signature(pegs))
+                self._pagoda = board.pagoda(pegs, self._final_cells)
+            return all([value < 1 - _SLACK for value in self._pagoda])
+        if pegs == target:
+            return False
+        if self._pagoda is None:
+            if (bin(pegs).count("1") <= bin(target).count("1") or
+                    board.signature(pegs) != board.signature(target)):
+                # every jump takes away one peg
+                return True
+            self._pagoda = board.pagoda(pegs, self._final_cells)
+        return any([value < floor - _SLACK
+                    for value, floor in zip(self._pagoda, self._floors)])
+
+    def describe_move(self, extension):
+        """
+        Overrides Puzzle.describe_move()
+
+        Return the jump from this configuration to extension as the
+        (row, column) cells the peg jumps from, over and to.
+
+        @param GridPegSolitairePuzzle self: This GridPegSolitaire puzzle
+        @param GridPegSolitairePuzzle extension: an extension of self
+        @rtype: ((int, int), (int, int), (int, int))
+
+        >>> grid = [["*", "*", ".", "*"]]
+        >>> gpsp = GridPegSolitairePuzzle(grid, {"*", ".", "#"})
+        >>> jump = gpsp.describe_move(gpsp.extensions()[0])
+        >>> jump
+        ((0, 0), (0, 1), (0, 2))
+        >>> gpsp.apply_move(jump)._marker
+        [['.', '.', '*', '*']]
+        """
+        changed = self._pegs ^ extension._pegs
+        for f, _, _, cells, move, _ in self._board.jumps:
+            if changed == cells and self._pegs & f:
+                return move
+
+    def apply_move(self, move):
+        """
+        Overrides Puzzle.apply_move()
+
+        Return the configuration reached by the jump move, given as the
+        (row, column) cells the peg jumps from, over and to.
+
+        @param GridPegSolitairePuzzle self: This GridPegSolitaire puzzle
+        @param ((int, int), (int, int), (int, int)) move: a legal jump
+        @rtype: GridPegSolitairePuzzle
+        """
+        jump, pegs = self._board.jump_at.get(tuple(move)), self._pegs
+        if jump is None or not (pegs & jump[0] and pegs & jump[1] and
+                                not pegs & jump[2]):
+            raise ValueError("illegal jump {} in\n{}".format(move, self))
+        return self._jumped(pegs ^ jump[3], self._zobrist ^ jump[5])
+
     def is_solved(self):
         """
         Overrides Puzzle.is_solved()
 
         Returns if it has reached solved configuration. A configuration is
-        solved when there is exactly one "*" left
+        solved when its pegs are placed as in the target, or when there is
+        exactly one "*" left if there is no target
 
         @param GridPegSolitairePuzzle self: This GridPegSolitaire puzzle
         @rtype : bool
@@ -260,16 +839,157 @@ class GridPegSolitairePuzzle(Puzzle):
         >>> gpsp3 = GridPegSolitairePuzzle(grid3, {"*", ".", "#"})
         >>> gpsp3.is_solved()
         False
-
+        >>> GridPegSolitairePuzzle(grid2, {"*", ".", "#"}, grid3).is_solved()
+        False
+        >>> GridPegSolitairePuzzle(grid3, {"*", ".", "#"}, grid3).is_solved()
+        True
         """
-        i = 0
-        for row in self._marker:
-            for x in row:
-                if x == "*":
-                    i += 1
-                    if i > 1:
-                        return False
-        return True
+        if self._target is not None:
+            return self._pegs == self._target
+        # at most one bit set
+        return self._pegs & (self._pegs - 1) == 0
+
+
+def _layers(board, roots, depth, cells, floors, every, backward,
+            meet=None):
+    """
+    Return the configurations reachable from the bit masks of pegs in
+    roots in each number of jumps up to depth, or, if backward, those
+    from which roots can be reached, as one dict per number of jumps
+    mapping each mask to the mask it was reached from. If meet is given,
+    the last dict holds only the first configuration found in meet, and
+    is empty if there is none.
+
+    Configurations are dropped when their pagoda values for cells cells,
+    of the pegs or, if backward, of the empty cells, fall below floors:
+    all of them if every, otherwise any of them.
+
+    @type board: _PegBoard
+    @type roots: list[int]
+    @type depth: int
+    @type cells: tuple[int]
+    @type floors: tuple[float]
+    @type every: bool
+    @type backward: bool
+    @type meet: dict[int, int | None] | None
+    @rtype: list[dict[int, int | None]]
+    """
+    deltas = board.pagoda_deltas(cells)
+    step = board.unjumps_from if backward else board.jumps_from
+    frontier = {}
+    for pegs in roots:
+        frontier[pegs] = board.pagoda(board.holes ^ pegs if backward
+                                      else pegs, cells)
+    layers = [dict.fromkeys(frontier)]
+    if meet is not None and depth == 0:
+        layers[0] = dict([(pegs, None) for pegs in frontier if pegs in meet])
+    for i in range(depth):
+        parents, new_frontier = {}, {}
+        if meet is not None and i == depth - 1:
+            for pegs, values in frontier.items():
+                for _, new_pegs, _ in step(pegs, values, deltas):
+                    if new_pegs in meet:
+                        layers.append({new_pegs: pegs})
+                        return layers
+            layers.append({})
+            return layers
+        for pegs, values in frontier.items():
+            for _, new_pegs, new_values in step(pegs, values, deltas):
+                if new_pegs in parents:
+                    continue
+                low = [value < floor - _SLACK
+                       for value, floor in zip(new_values, floors)]
+                if low and (all(low) if every else any(low)):
+                    continue
+                parents[new_pegs] = pegs
+                new_frontier[new_pegs] = new_values
+        layers.append(parents)
+        frontier = new_frontier
+    return layers
+
+
+def meet_in_the_middle_solve(puzzle, moves=False):
+    """
+    Return a path from GridPegSolitairePuzzle puzzle to a solution, as
+    breadth_first_solve does, or None if there is none.
+
+    Every jump takes away one peg, so every solution takes the same
+    number of jumps. Jumps are searched forward from puzzle for half of
+    them and undone backward from the target, or from each single peg
+    that could be left, for the rest, until the two meet at the middle
+    peg count. Either side drops configurations that can be shown by
+    pagoda functions to be unable to reach the other.
+
+    If moves is True, return the list of jumps instead of a path.
+
+    @type puzzle: GridPegSolitairePuzzle
+    @type moves: bool
+    @rtype: PuzzleNode | list | None
+
+    >>> grid = [["*", ".", "*", "*"],
+    ...         ["*", "*", "*", "*"],
+    ...         ["*", "*", "*", "*"],
+    ...         ["*", "*", "*", "*"]]
+    >>> target = [[".", ".", ".", "."],
+    ...           [".", ".", ".", "."],
+    ...           [".", ".", ".", "."],
+    ...           [".", ".", "*", "."]]
+    >>> start = GridPegSolitairePuzzle(grid, {"*", ".", "#"}, target)
+    >>> jumps = meet_in_the_middle_solve(start, True)
+    >>> len(jumps)
+    14
+    >>> from puzzle_tools import replay
+    >>> list(replay(start, jumps))[-1].is_solved()
+    True
+    >>> corner = [row[:] for row in target]
+    >>> corner[3][2], corner[0][0] = ".", "*"
+    >>> puzzle = GridPegSolitairePuzzle(grid, {"*", ".", "#"}, corner)
+    >>> print(meet_in_the_middle_solve(puzzle))
+    None
+    """
+    if moves:
+        return solution_moves(meet_in_the_middle_solve(puzzle))
+    if not puzzle.is_solved() and puzzle.fail_fast():
+        return None
+    board, start = puzzle._board, puzzle._pegs
+    if puzzle._target is None:
+        cells = board.final_cells(board.signature(start))
+        goals, every = [1 << t for t in cells], True
+        floors = tuple([1.0] * len(cells))
+    else:
+        cells, floors, every = puzzle._final_cells, puzzle._floors, False
+        goals = [puzzle._target]
+    if not goals:
+        return None
+    count = bin(start).count("1") - bin(goals[0]).count("1")
+    if count < 0:
+        return None
+    forward = _layers(board, [start], count // 2, cells, floors, every, False)
+    # the empty cells of puzzle can't hold less, by their pagoda functions,
+    # in any configuration it can reach
+    empty = board.cells(board.holes ^ start)
+    backward = _layers(board, goals, count - count // 2, empty,
+                       board.pagoda(board.holes ^ start, empty), False, True,
+                       forward[-1])
+    if not backward[-1]:
+        return None
+    meet = list(backward[-1])[0]
+    path, pegs = [], meet
+    for layer in reversed(forward[1:]):
+        path.append(pegs)
+        pegs = layer[pegs]
+    path.reverse()
+    pegs = meet
+    for layer in reversed(backward[1:]):
+        pegs = layer[pegs]
+        path.append(pegs)
+    root = node = PuzzleNode(puzzle)
+    for pegs in path:
+        child = PuzzleNode(node.puzzle._jumped(pegs), parent=node)
+        node.children = [child]
+        node = child
+    return root
+
 
 if __name__ == "__main__":
     import doctest
@@ -290,3 +1010,15 @@ if __name__ == "__main__":
     end = time.time()
     print("Solved 5x5 peg solitaire in {} seconds.".format(end - start))
     print("Using depth-first: \n{}".format(solution))
+
+    target = [[".", ".", ".", ".", "."],
+              [".", ".", "*", ".", "."],
+              [".", ".", ".", ".", "."],
+              [".", ".", ".", ".", "."],
+              [".", ".", ".", ".", "."]]
+    gpsp = GridPegSolitairePuzzle(grid, {"*", ".", "#"}, target)
+    start = time.time()
+    solution = meet_in_the_middle_solve(gpsp, True)
+    end = time.time()
+    print("Finished on the given cell in {} seconds.".format(end - start))
+    print("Using meet-in-the-middle: {}".format(solution))
@@ -0,0 +1,324 @@
+"""
+Additive pattern databases for MNPuzzle
+
+A pattern database records, for every placement of a chosen set of tiles,
+the fewest moves of those tiles needed to bring them to their places in
+to_grid. Moves of the other tiles are not counted, so the databases for
+disjoint sets of tiles can be added together and the sum still never
+overestimates the moves needed to solve a puzzle.
+
+Databases are built offline with breadth-first search, saved as one byte
+per placement and memory-mapped when loaded, so every process solving
+puzzles with the same database shares the same pages.
+"""
+from collections import deque
+from mn_puzzle import _neighbour_table
+import json
+import mmap
+
+# first line of every database file, followed by a line of json metadata
+_MAGIC = b"mnpdb 1\n"
+
+# marks placements the search has not reached yet
+_UNSEEN = 255
+
+
+def _rank_factors(cells, k):
+    """
+    Return the place values used to rank placements of k distinct tiles
+    on cells cells.
+
+    @type cells: int
+    @type k: int
+    @rtype: list[int]
+
+    >>> _rank_factors(6, 3)
+    [20, 4, 1]
+    """
+    factors = [1] * k
+    for i in range(k - 2, -1, -1):
+        factors[i] = factors[i + 1] * (cells - 1 - i)
+    return factors
+
+
+class PatternDatabase:
+    """
+    The fewest moves of the tiles in pattern needed to bring them from any
+    placement to their places in to_grid.
+    """
+
+    def __init__(self, to_grid, pattern, table):
+        """
+        Create a PatternDatabase self for pattern, a tuple of symbols in
+        to_grid, from table, which holds one distance per placement.
+
+        @type self: PatternDatabase
+        @type to_grid: tuple[tuple[str]]
+        @type pattern: tuple[str]
+        @type table: bytes | bytearray | memoryview
+        @rtype: None
+        """
+        self.n, self.m = len(to_grid), len(to_grid[0])
+        self.to_grid, self.pattern, self._table = to_grid, pattern, table
+        self._factors = _rank_factors(self.n * self.m, len(pattern))
+        assert len(table) == self._factors[0] * (self.n * self.m)
+
+    def _rank(self, placement):
+        """
+        Return the index in self._table of placement, the flat positions
+        of the tiles in self.pattern.
+
+        @type self: PatternDatabase
+        @type placement: list[int] | tuple[int]
+        @rtype: int
+
+        >>> db = PatternDatabase((("1", "2", "3"), ("4", "5", "*")),
+        ...                      ("1", "2"), bytes(30))
+        >>> sorted([db._rank((a, b)) for a in range(6) for b in range(6)
+        ...         if a != b]) == list(range(30))
+        True
+        """
+        rank = 0
+        for i, p in enumerate(placement):
+            # number the free cells left after placing the earlier tiles
+            digit = p
+            for q in placement[:i]:
+                if q < p:
+                    digit -= 1
+            rank += digit * self._factors[i]
+        return rank
+
+    def lookup(self, positions):
+        """
+        Return the distance for the placement of pattern tiles given in
+        positions, which maps every symbol to its flat position.
+
+        @type self: PatternDatabase
+        @type positions: dict[str, int]
+        @rtype: int
+        """
+        return self._table[self._rank([positions[s] for s in self.pattern])]
+
+    def __call__(self, puzzle):
+        """
+        Return the distance for the pattern tiles of MNPuzzle puzzle, which
+        must be working towards self.to_grid.
+
+        @type self: PatternDatabase
+        @type puzzle: MNPuzzle
+        @rtype: int
+        """
+        return self.lookup(puzzle.positions())
+
+    @staticmethod
+    def build(to_grid, pattern):
+        """
+        Return the PatternDatabase for pattern, a tuple of distinct symbols
+        of to_grid, found by breadth-first search outward from to_grid.
+
+        Searching tracks the placement of the pattern tiles and the blank.
+        Moving a pattern tile costs one move and moving any other tile
+        costs nothing, so the search visits zero-cost moves first.
+
+        @type to_grid: tuple[tuple[str]]
+        @type pattern: tuple[str]
+        @rtype: PatternDatabase
+
+        >>> db = PatternDatabase.build((("1", "2", "3"), ("4", "5", "*")),
+        ...                            ("1", "2"))
+        >>> db.lookup({"1": 0, "2": 1})
+        0
+        >>> db.lookup({"1": 1, "2": 0})
+        6
+        """
+        n, m = len(to_grid), len(to_grid[0])
+        cells = n * m
+        flat = [s for row in to_grid for s in row]
+        assert flat.count("*") == 1 and "*" not in pattern
+        assert len(set(pattern)) == len(pattern)
+        assert all([flat.count(s) == 1 for s in pattern])
+        neighbours = _neighbour_table(n, m)
+        db = PatternDatabase(to_grid, tuple(pattern),
+                             bytearray([_UNSEEN]) *
+                             (_rank_factors(cells, len(pattern))[0] * cells))
+        # distance of each (placement, blank) pair
+        distance = bytearray([_UNSEEN]) * (len(db._table) * cells)
+        start = tuple([flat.index(s) for s in pattern])
+        blank = flat.index("*")
+        distance[db._rank(start) * cells + blank] = 0
+        q = deque([(start, blank, 0)])
+        while q:
+            placement, blank, moves = q.popleft()
+            rank = db._rank(placement)
+            if distance[rank * cells + blank] < moves:
+                # reached more cheaply after this pair was queued
+                continue
+            if moves < db._table[rank]:
+                db._table[rank] = moves
+            for p in neighbours[blank]:
+                if p in placement:
+                    # a pattern tile slides into the blank
+                    i = placement.index(p)
+                    new_placement = (placement[:i] + (blank,) +
+                                     placement[i + 1:])
+                    new_moves = moves + 1
+                    index = db._rank(new_placement) * cells + p
+                else:
+                    new_placement, new_moves = placement, moves
+                    index = rank * cells + p
+                if new_moves < distance[index]:
+                    distance[index] = new_moves
+                    if new_moves == moves:
+                        q.appendleft((new_placement, p, new_moves))
+                    else:
+                        q.append((new_placement, p, new_moves))
+        return db
+
+    def save(self, path):
+        """
+        Write this PatternDatabase to the file at path.
+
+        @type self: PatternDatabase
+        @type path: str
+        @rtype: None
+        """
+        header = json.dumps({"to_grid": self.to_grid,
+                             "pattern": self.pattern}).encode("utf-8")
+        with open(path, "wb") as f:
+            f.write(_MAGIC + header + b"\n")
+            f.write(self._table)
+
+    @staticmethod
+    def load(path):
+        """
+        Return the PatternDatabase saved at path, memory-mapped so that
+        every process loading it shares one copy of the table.
+
+        @type path: str
+        @rtype: PatternDatabase
+        """
+        with open(path, "rb") as f:
+            data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        assert data[:len(_MAGIC)] == _MAGIC, "not a pattern database"
+        end = data.find(b"\n", len(_MAGIC))
+        header = json.loads(data[len(_MAGIC):end].decode("utf-8"))
+        to_grid = tuple([tuple(row) for row in header["to_grid"]])
+        return PatternDatabase(to_grid, tuple(header["pattern"]),
+                               memoryview(data)[end + 1:])
+
+
+class AdditivePatternHeuristic:
+    """
+    Sum of the distances in PatternDatabases for disjoint tile patterns
+    sharing one to_grid: an estimate of the moves still needed to solve
+    an MNPuzzle that never overestimates.
+    """
+
+    def __init__(self, databases):
+        """
+        Create an AdditivePatternHeuristic self from databases.
+
+        @type self: AdditivePatternHeuristic
+        @type databases: list[PatternDatabase]
+        @rtype: None
+        """
+        assert len(databases) > 0
+        assert all([db.to_grid == databases[0].to_grid for db in databases])
+        tiles = [s for db in databases for s in db.pattern]
+        assert len(set(tiles)) == len(tiles), "patterns must be disjoint"
+        self.to_grid, self._databases = databases[0].to_grid, databases
+
+    def __call__(self, puzzle):
+        """
+        Return the estimated number of moves needed to solve MNPuzzle
+        puzzle, which must be working towards self.to_grid.
+
+        @type self: AdditivePatternHeuristic
+        @type puzzle: MNPuzzle
+        @rtype: int
+
+        >>> from mn_puzzle import MNPuzzle
+        >>> from puzzle_tools import a_star_solve
+        >>> import os, tempfile
+        >>> target_grid = (("1", "2", "3"), ("4", "5", "*"))
+        >>> directory = tempfile.mkdtemp()
+        >>> paths = build_databases(target_grid, [3, 2], directory)
+        >>> h = AdditivePatternHeuristic.load(paths)
+        >>> puzzle = MNPuzzle((("*", "2", "3"), ("1", "4", "5")), target_grid)
+        >>> h(puzzle)
+        3
+        >>> node = a_star_solve(puzzle, h)
+        >>> node.children[0].children[0].children[0].puzzle.is_solved()
+        True
+        """
+        positions = puzzle.positions()
+        return sum([db.lookup(positions) for db in self._databases])
+
+    @staticmethod
+    def load(paths):
+        """
+        Return the AdditivePatternHeuristic for the databases saved at
+        paths.
+
+        @type paths: list[str]
+        @rtype: AdditivePatternHeuristic
+        """
+        return AdditivePatternHeuristic([PatternDatabase.load(path)
+                                         for path in paths])
+
+
+def build_databases(to_grid, sizes, directory):
+    """
+    Build and save to directory one PatternDatabase per entry of sizes,
+    splitting the tiles of to_grid into patterns of those sizes in reading
+    order, and return the paths of the saved files.
+
+    @type to_grid: tuple[tuple[str]]
+    @type sizes: list[int]
+    @type directory: str
+    @rtype: list[str]
+    """
+    import os
+    tiles = [s for row in to_grid for s in row if s != "*"]
+    assert sum(sizes) == len(tiles)
+    paths, start = [], 0
+    for i, size in enumerate(sizes):
+        db = PatternDatabase.build(to_grid, tuple(tiles[start:start + size]))
+        path = os.path.join(directory, "mn_{}x{}_{}.pdb".format(
+            len(to_grid), len(to_grid[0]), i))
+        db.save(path)
+        paths.append(path)
+        start += size
+    return paths
+
+
+if __name__ == "__main__":
+    import doctest
+    doctest.testmod()
+    import argparse
+    from time import time
+    parser = argparse.ArgumentParser(
+        description="Build additive pattern databases for the nxm puzzle "
+                    "whose target has tiles 1, 2, ... in order and the "
+                    "blank last.")
+    parser.add_argument("n", type=int, help="number of rows")
+    parser.add_argument("m", type=int, help="number of columns")
+    parser.add_argument("--sizes", default=None,
+                        help="pattern sizes, such as 6-6-3 for the "
+                             "15-puzzle")
+    parser.add_argument("--directory", default=".",
+                        help="where to write the databases")
+    args = parser.parse_args()
+    count = args.n * args.m - 1
+    if args.sizes:
+        sizes = [int(x) for x in args.sizes.split("-")]
+    else:
+        # patterns of at most 6 tiles keep each table to a few megabytes
+        sizes = [6] * (count // 6) + ([count % 6] if count % 6 else [])
+    symbols = [str(i) for i in range(1, count + 1)] + ["*"]
+    target = tuple([tuple(symbols[r * args.m:(r + 1) * args.m])
+                    for r in range(args.n)])
+    start = time()
+    for p in build_databases(target, sizes, args.directory):
+        print("wrote {}".format(p))
+    print("built in {} seconds".format(time() - start))
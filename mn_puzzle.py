@@ -1,10 +1,400 @@
 from puzzle import Puzzle
+from bisect import bisect_left
+from collections import OrderedDict
+from weakref import WeakValueDictionary
+from zobrist import zobrist_keys
+import threading
+
+# boards with at most this many cells are packed into an int, 4 bits per cell
+_PACKED_CELLS = 16
+
+# most lines a context remembers the linear conflicts of
+_LINE_CONFLICTS = 1 << 16
+
+# neighbour table for every board shape, keyed by (n, m)
+_neighbour_tables = {}
+
+# contexts shared by every MNPuzzle with the same target and symbols
+_contexts = WeakValueDictionary()
+
+# held while looking up or adding a context, so that threads making
+# puzzles at once never make two contexts for the same key
+_interning = threading.Lock()
+
+
+def _neighbour_table(n, m):
+    """
+    Return a tuple whose p-th entry lists the flat positions next to flat
+    position p on an nxm board, in the order above, below, left, right.
+
+    @param int n: number of rows
+    @param int m: number of columns
+    @rtype: tuple[tuple[int]]
+
+    >>> _neighbour_table(2, 3)
+    ((3, 1), (4, 0, 2), (5, 1), (0, 4), (1, 3, 5), (2, 4))
+    """
+    if (n, m) not in _neighbour_tables:
+        table = []
+        for p in range(n * m):
+            i, j = divmod(p, m)
+            neighbours = []
+            if i - 1 >= 0:
+                neighbours.append(p - m)
+            if i + 1 < n:
+                neighbours.append(p + m)
+            if j - 1 >= 0:
+                neighbours.append(p - 1)
+            if j + 1 < m:
+                neighbours.append(p + 1)
+            table.append(tuple(neighbours))
+        _neighbour_tables[(n, m)] = tuple(table)
+    return _neighbour_tables[(n, m)]
+
+
+class _MNContext:
+    """
+    Everything MNPuzzles working towards the same to_grid share: the board
+    shape, the symbol <-> code tables, the neighbour table, the Zobrist
+    keys and the packed target state.
+    """
+
+    def __init__(self, n, m, to_grid, symbols):
+        """
+        Create the context for nxm boards over symbols working towards
+        to_grid.
+
+        @param _MNContext self: this context
+        @param int n: number of rows
+        @param int m: number of columns
+        @param tuple[tuple[str]] to_grid: solution configuration
+        @param tuple[str] symbols: symbols in use, with "*" first
+        @rtype: None
+        """
+        self.n, self.m, self.to_grid = n, m, to_grid
+        # code of a symbol is its index in symbols, so the blank is 0
+        self.symbols = symbols
+        self.codes = {s: c for c, s in enumerate(symbols)}
+        self.neighbours = _neighbour_table(n, m)
+        self.packed = n * m <= _PACKED_CELLS and len(symbols) <= 16
+        # Zobrist key of each code in each flat position; the blank's is 0,
+        # so a move changes the hash by the moved tile's two keys
+        keys = zobrist_keys(n * m * len(symbols))
+        self.zobrist = [[0] + keys[p * len(symbols) + 1:
+                                   (p + 1) * len(symbols)]
+                        for p in range(n * m)]
+        if (len(to_grid) == n and all([len(r) == m for r in to_grid]) and
+                sum([r.count("*") for r in to_grid]) == 1):
+            self.goal, _ = self.pack(to_grid)
+        else:
+            # no state of this shape can ever match to_grid
+            self.goal = None
+        # tables for estimate and move_estimate, built when first needed
+        self._goal_row = self._goal_col = None
+        # linear conflicts of recently seen lines, least recent first
+        self._line_conflicts = OrderedDict()
+        # built when symmetries is first asked
+        self._symmetries = None
+
+    @staticmethod
+    def get(from_grid, to_grid):
+        """
+        Return the shared context for puzzles with grids like from_grid
+        working towards to_grid.
+
+        @param tuple[tuple[str]] from_grid: a configuration
+        @param tuple[tuple[str]] to_grid: solution configuration
+        @rtype: _MNContext
+        """
+        symbols = set()
+        for row in from_grid + to_grid:
+            symbols.update(row)
+        symbols.discard("*")
+        symbols = ("*",) + tuple(sorted(symbols))
+        return _MNContext.intern(len(from_grid), len(from_grid[0]), to_grid,
+                                 symbols)
+
+    @staticmethod
+    def intern(n, m, to_grid, symbols):
+        """
+        Return the shared context for nxm boards over symbols working
+        towards to_grid.
+
+        @param int n: number of rows
+        @param int m: number of columns
+        @param tuple[tuple[str]] to_grid: solution configuration
+        @param tuple[str] symbols: symbols in use, with "*" first
+        @rtype: _MNContext
+        """
+        key = (n, m, to_grid, symbols)
+        with _interning:
+            context = _contexts.get(key)
+            if context is None:
+                context = _MNContext(*key)
+                _contexts[key] = context
+        return context
+
+    def __reduce__(self):
+        """
+        Return how to pickle this context, so that unpickling it gives back
+        the shared context rather than a copy of its tables.
+
+        @param _MNContext self: this context
+        @rtype: tuple
+
+        >>> import pickle
+        >>> m = MNPuzzle((("*", "2"), ("3", "4")), (("3", "2"), ("*", "4")))
+        >>> pickle.loads(pickle.dumps(m))._context is m._context
+        True
+        """
+        return _MNContext.intern, (self.n, self.m, self.to_grid, self.symbols)
+
+    def pack(self, grid):
+        """
+        Return the packed state of grid and the flat position of its blank.
+
+        @param _MNContext self: this context
+        @param tuple[tuple[str]] grid: a configuration of this shape
+        @rtype: (int | tuple[int], int)
+        """
+        cells = [self.codes[s] for row in grid for s in row]
+        blank = cells.index(0)
+        if self.packed:
+            state = 0
+            for p, code in enumerate(cells):
+                state |= code << (4 * p)
+            return state, blank
+        return tuple(cells), blank
+
+    def cells(self, state):
+        """
+        Return the code in each flat position of packed state.
+
+        @param _MNContext self: this context
+        @param int | tuple[int] state: a packed state
+        @rtype: tuple[int]
+        """
+        if self.packed:
+            return tuple([(state >> (4 * p)) & 15
+                          for p in range(self.n * self.m)])
+        return state
+
+    def hash(self, state):
+        """
+        Return the Zobrist hash of packed state.
+
+        @param _MNContext self: this context
+        @param int | tuple[int] state: a packed state
+        @rtype: int
+        """
+        zobrist = 0
+        for keys, code in zip(self.zobrist, self.cells(state)):
+            zobrist ^= keys[code]
+        return zobrist
+
+    def unpack(self, state):
+        """
+        Return packed state as a grid of symbols.
+
+        @param _MNContext self: this context
+        @param int | tuple[int] state: a packed state
+        @rtype: tuple[tuple[str]]
+        """
+        symbols, m = self.symbols, self.m
+        cells = self.cells(state)
+        return tuple([tuple([symbols[c] for c in cells[r:r + m]])
+                      for r in range(0, len(cells), m)])
+
+    def symmetries(self):
+        """
+        Return each reflection or rotation of the board, other than the
+        identity, that keeps the blank's target cell in place, as a pair of
+        where it moves each flat position and the relabelling of codes
+        that turns the moved to_grid back into to_grid.
+
+        Such a symmetry maps a configuration's moves to the moves of its
+        image and to_grid to itself, so every configuration is exactly as
+        far from to_grid as its image. There are none unless every tile in
+        to_grid is distinct.
+
+        @param _MNContext self: this context
+        @rtype: list[(tuple[int], tuple[int])]
+        """
+        if self._symmetries is None:
+            self._symmetries = []
+            n, m = self.n, self.m
+            if self.goal is None or len(self.symbols) < n * m:
+                return self._symmetries
+            moves = [lambda r, c: (r, m - 1 - c),
+                     lambda r, c: (n - 1 - r, c),
+                     lambda r, c: (n - 1 - r, m - 1 - c)]
+            if n == m:
+                moves += [lambda r, c: (c, r),
+                          lambda r, c: (m - 1 - c, n - 1 - r),
+                          lambda r, c: (c, n - 1 - r),
+                          lambda r, c: (m - 1 - c, r)]
+            goal = self.cells(self.goal)
+            for move in moves:
+                image = []
+                for p in range(n * m):
+                    r, c = move(*divmod(p, m))
+                    image.append(r * m + c)
+                if image[goal.index(0)] == goal.index(0):
+                    relabel = [0] * (n * m)
+                    for p in range(n * m):
+                        relabel[goal[p]] = goal[image[p]]
+                    self._symmetries.append((tuple(image), tuple(relabel)))
+        return self._symmetries
+
+    def _build_estimate_tables(self):
+        """
+        Build the target row and column of every code, or leave them as
+        empty tuples when the target doesn't pin down one cell per tile.
+
+        @param _MNContext self: this context
+        @rtype: None
+        """
+        n, m = self.n, self.m
+        if self.goal is None or len(self.symbols) < n * m:
+            # unreachable, or repeated tiles with no single target cell
+            self._goal_row = self._goal_col = ()
+            return
+        goal_row, goal_col = [0] * (n * m), [0] * (n * m)
+        for p, c in enumerate(self.cells(self.goal)):
+            goal_row[c], goal_col[c] = divmod(p, m)
+        self._goal_row, self._goal_col = tuple(goal_row), tuple(goal_col)
+
+    def _line_conflict(self, state, row, index):
+        """
+        Return how many tiles must leave row index (or column index, when
+        row is False) of packed state so that the tiles there that belong
+        there can pass each other into their target order.
+
+        @param _MNContext self: this context
+        @param int | tuple[int] state: a packed state
+        @param bool row: whether index is a row rather than a column
+        @param int index: row or column number
+        @rtype: int
+        """
+        n, m = self.n, self.m
+        if row:
+            positions = range(index * m, index * m + m)
+        else:
+            positions = range(index, n * m, m)
+        if self.packed:
+            codes = tuple([(state >> (4 * p)) & 15 for p in positions])
+        else:
+            codes = tuple([state[p] for p in positions])
+        key = (row, index, codes)
+        conflicts = self._line_conflicts
+        found = conflicts.get(key)
+        if found is not None:
+            try:
+                conflicts.move_to_end(key)
+            except KeyError:
+                # dropped by another thread meanwhile
+                pass
+            return found
+        if row:
+            line, place = self._goal_row, self._goal_col
+        else:
+            line, place = self._goal_col, self._goal_row
+        # target places, in current order, of the tiles at home here
+        targets = [place[c] for c in codes if c and line[c] == index]
+        # the tiles that can stay form an increasing subsequence
+        tails = []
+        for t in targets:
+            i = bisect_left(tails, t)
+            if i == len(tails):
+                tails.append(t)
+            else:
+                tails[i] = t
+        found = conflicts[key] = len(targets) - len(tails)
+        if len(conflicts) > _LINE_CONFLICTS:
+            try:
+                conflicts.popitem(last=False)
+            except KeyError:
+                pass
+        return found
+
+    def estimate(self, state):
+        """
+        Return the Manhattan distance of packed state from the goal plus
+        two moves for every tile that must step out of its target row or
+        column to let another pass, or 0 when that can't be worked out.
+
+        @param _MNContext self: this context
+        @param int | tuple[int] state: a packed state
+        @rtype: int
+        """
+        if self._goal_row is None:
+            self._build_estimate_tables()
+        if not self._goal_row:
+            return 0
+        n, m = self.n, self.m
+        goal_row, goal_col = self._goal_row, self._goal_col
+        total = 0
+        for p, c in enumerate(self.cells(state)):
+            if c:
+                total += abs(p // m - goal_row[c]) + abs(p % m - goal_col[c])
+        for r in range(n):
+            total += 2 * self._line_conflict(state, True, r)
+        for c in range(m):
+            total += 2 * self._line_conflict(state, False, c)
+        return total
+
+    def move_estimate(self, estimate, state, new_state, code, old, new):
+        """
+        Return estimate(new_state), given that it is estimate(state) and
+        that new_state is state with the tile code slid from flat position
+        old to flat position new.
+
+        Only the moved tile's distance and the two rows or columns it
+        moves between can change, so the update looks at nothing else.
+
+        @param _MNContext self: this context
+        @param int estimate: estimate of state
+        @param int | tuple[int] state: packed state before the move
+        @param int | tuple[int] new_state: packed state after the move
+        @param int code: code of the tile that moved
+        @param int old: flat position the tile left
+        @param int new: flat position the tile moved to
+        @rtype: int
+        """
+        if self._goal_row is None:
+            # a parent unpickled or read with from_bytes can bring its
+            # estimate into a context that hasn't built the tables yet
+            self._build_estimate_tables()
+        if not self._goal_row:
+            return 0
+        m = self.m
+        old_row, old_col = divmod(old, m)
+        new_row, new_col = divmod(new, m)
+        goal_row, goal_col = self._goal_row[code], self._goal_col[code]
+        estimate += (abs(new_row - goal_row) + abs(new_col - goal_col) -
+                     abs(old_row - goal_row) - abs(old_col - goal_col))
+        # a tile sliding along a row only changes the columns it is in,
+        # and one sliding along a column only changes the rows
+        row = old_row != new_row
+        if row:
+            lines = (old_row, new_row)
+        else:
+            lines = (old_col, new_col)
+        for index in lines:
+            estimate += 2 * (self._line_conflict(new_state, row, index) -
+                             self._line_conflict(state, row, index))
+        return estimate
 
 
 class MNPuzzle(Puzzle):
     """
     An nxm puzzle, like the 15-puzzle, which may be solved, unsolved,
     or even unsolvable.
+
+    The configuration is kept packed: boards of up to 16 cells are an int
+    holding a 4-bit code per cell, larger boards a flat tuple of codes.
+    The position of the blank is tracked so that each move is a constant
+    time update using the neighbour table shared by boards of this shape.
     """
 
     def __init__(self, from_grid, to_grid):
@@ -16,14 +406,229 @@ class MNPuzzle(Puzzle):
         @param tuple[tuple[str]] from_grid: current configuration
         @param tuple[tuple[str]] to_grid: solution configuration
         @rtype: None
+
+        >>> m = MNPuzzle([["*", "2"], ["3", "4"]], [["3", "2"], ["*", "4"]])
+        >>> m == MNPuzzle((("*", "2"), ("3", "4")), (("3", "2"), ("*", "4")))
+        True
         """
         # represent grid symbols with letters or numerals
         # represent the empty space with a "*"
         assert len(from_grid) > 0
         assert all([len(r) == len(from_grid[0]) for r in from_grid])
         assert all([len(r) == len(to_grid[0]) for r in to_grid])
-        self.n, self.m = len(from_grid), len(from_grid[0])
-        self.from_grid, self.to_grid = from_grid, to_grid
+        assert sum([r.count("*") for r in from_grid]) == 1
+        from_grid = tuple([tuple(row) for row in from_grid])
+        to_grid = tuple([tuple(row) for row in to_grid])
+        self._context = _MNContext.get(from_grid, to_grid)
+        self._state, self._blank = self._context.pack(from_grid)
+        self._zobrist = self._context.hash(self._state)
+        # unknown until fail_fast or heuristic is first asked
+        self._solvable = self._estimate = None
+
+    @classmethod
+    def _from_state(cls, context, state, blank, zobrist):
+        """
+        Return a new MNPuzzle in packed state with its blank at flat
+        position blank and Zobrist hash zobrist, skipping the checks and
+        packing done by __init__.
+
+        @param type cls: MNPuzzle or a subclass
+        @param _MNContext context: context shared with the parent puzzle
+        @param int | tuple[int] state: packed configuration
+        @param int blank: flat position of "*"
+        @param int zobrist: Zobrist hash of state
+        @rtype: MNPuzzle
+        """
+        puzzle = cls.__new__(cls)
+        puzzle._context, puzzle._state, puzzle._blank = context, state, blank
+        puzzle._zobrist = zobrist
+        puzzle._solvable = puzzle._estimate = None
+        return puzzle
+
+    @property
+    def n(self):
+        """
+        Number of rows.
+
+        @param MNPuzzle self: this puzzle
+        @rtype: int
+        """
+        return self._context.n
+
+    @property
+    def m(self):
+        """
+        Number of columns.
+
+        @param MNPuzzle self: this puzzle
+        @rtype: int
+        """
+        return self._context.m
+
+    @property
+    def to_grid(self):
+        """
+        Solution configuration.
+
+        @param MNPuzzle self: this puzzle
+        @rtype: tuple[tuple[str]]
+        """
+        return self._context.to_grid
+
+    @property
+    def from_grid(self):
+        """
+        Current configuration, unpacked.
+
+        @param MNPuzzle self: this puzzle
+        @rtype: tuple[tuple[str]]
+
+        >>> MNPuzzle((("*", "2"), ("3", "4")), (("3", "2"), ("*", "4"))).from_grid
+        (('*', '2'), ('3', '4'))
+        """
+        return self._context.unpack(self._state)
+
+    def positions(self):
+        """
+        Return the flat position, row by row, of every symbol on the board.
+
+        @param MNPuzzle self: this puzzle
+        @rtype: dict[str, int]
+
+        >>> p = MNPuzzle((("*", "2"), ("3", "4")), (("3", "2"), ("*", "4")))
+        >>> sorted(p.positions().items())
+        [('*', 0), ('2', 1), ('3', 2), ('4', 3)]
+        """
+        symbols = self._context.symbols
+        return {symbols[c]: p
+                for p, c in enumerate(self._context.cells(self._state))}
+
+    def state_key(self):
+        """
+        Overrides Puzzle.state_key()
+
+        Return the packed configuration if it is an int, which is hashed
+        and compared as quickly as any key could be. Otherwise return this
+        puzzle itself, so that sets of seen states compare Zobrist hashes
+        first and whole configurations only when two hashes match.
+
+        @param MNPuzzle self: this puzzle
+        @rtype: int | MNPuzzle
+        """
+        if self._context.packed:
+            return self._state
+        return self
+
+    def context(self):
+        """
+        Overrides Puzzle.context()
+
+        Return the context this puzzle shares with every MNPuzzle working
+        towards the same to_grid over the same symbols.
+
+        @param MNPuzzle self: this puzzle
+        @rtype: _MNContext
+        """
+        return self._context
+
+    def to_bytes(self):
+        """
+        Overrides Puzzle.to_bytes()
+
+        Return the flat position of the blank in two bytes, followed by
+        the packed configuration: half a byte per tile if it is an int,
+        otherwise a byte per tile, or two if there are over 256 symbols.
+
+        @param MNPuzzle self: this puzzle
+        @rtype: bytes
+
+        >>> target_grid = (("1", "2", "3"), ("4", "5", "*"))
+        >>> puzzle = MNPuzzle((("*", "2", "3"), ("1", "4", "5")), target_grid)
+        >>> data = puzzle.to_bytes()
+        >>> len(data)
+        5
+        >>> copy = MNPuzzle.from_bytes(data, puzzle.context())
+        >>> copy == puzzle, hash(copy) == hash(puzzle)
+        (True, True)
+        >>> big = tuple([tuple([str(r * 17 + c) for c in range(17)])
+        ...              for r in range(2)])
+        >>> big = (big[0], big[1][:-1] + ("*",))
+        >>> puzzle = MNPuzzle(big, big).extensions()[0]
+        >>> data = puzzle.to_bytes()
+        >>> len(data), MNPuzzle.from_bytes(data, puzzle.context()) == puzzle
+        (36, True)
+        """
+        context, state = self._context, self._state
+        blank = self._blank.to_bytes(2, "little")
+        if context.packed:
+            return blank + state.to_bytes((4 * context.n * context.m + 7) // 8,
+                                          "little")
+        if len(context.symbols) <= 256:
+            return blank + bytes(state)
+        return blank + b"".join([c.to_bytes(2, "little") for c in state])
+
+    @classmethod
+    def from_bytes(cls, data, context):
+        """
+        Overrides Puzzle.from_bytes()
+
+        Return the MNPuzzle whose to_bytes gave data, in context.
+
+        @param type cls: MNPuzzle or a subclass
+        @param bytes data: what to_bytes returned
+        @param _MNContext context: what context returned
+        @rtype: MNPuzzle
+        """
+        blank = int.from_bytes(data[:2], "little")
+        if context.packed:
+            state = int.from_bytes(data[2:], "little")
+        elif len(context.symbols) <= 256:
+            state = tuple(data[2:])
+        else:
+            state = tuple([int.from_bytes(data[i:i + 2], "little")
+                           for i in range(2, len(data), 2)])
+        return cls._from_state(context, state, blank, context.hash(state))
+
+    def canonical_key(self):
+        """
+        Overrides Puzzle.canonical_key()
+
+        Return the smallest packed configuration among this one and its
+        images under the reflections and rotations of the board that map
+        to_grid to itself once the tiles are relabelled.
+
+        @param MNPuzzle self: this puzzle
+        @rtype: int | tuple[int]
+
+        >>> target_grid = (("1", "2", "3"), ("4", "5", "6"), ("7", "8", "*"))
+        >>> p1 = MNPuzzle((("1", "2", "3"), ("4", "5", "6"), ("7", "*", "8")),
+        ...               target_grid)
+        >>> p2 = MNPuzzle((("1", "2", "3"), ("4", "5", "*"), ("7", "8", "6")),
+        ...               target_grid)
+        >>> p1.canonical_key() == p2.canonical_key()
+        True
+        >>> p3 = MNPuzzle(target_grid, target_grid)
+        >>> p1.canonical_key() == p3.canonical_key()
+        False
+        """
+        context = self._context
+        symmetries = context.symmetries()
+        if not symmetries:
+            return self._state
+        cells, best = context.cells(self._state), self._state
+        for image, relabel in symmetries:
+            moved = [0] * len(cells)
+            for p, c in enumerate(cells):
+                moved[image[p]] = relabel[c]
+            if context.packed:
+                key = 0
+                for p, c in enumerate(moved):
+                    key |= c << (4 * p)
+            else:
+                key = tuple(moved)
+            if key < best:
+                best = key
+        return best
 
     def __eq__(self,other):
         """
@@ -41,9 +646,28 @@ class MNPuzzle(Puzzle):
         >>> m2 == m3
         False
         """
-        return (type(self) == type(other) and self.from_grid == other.from_grid and
-                self.to_grid == other.to_grid and self.m == other.m and
-                self.n == other.n)
+        # contexts are shared, so the same target and symbols means the
+        # very same context
+        return (type(self) == type(other) and self._state == other._state and
+                self._context is other._context)
+
+    def __hash__(self):
+        """
+        Return the Zobrist hash of this mn puzzle's configuration, kept up
+        to date move by move
+
+        @param MNPuzzle self: this puzzle
+        @rtype: int
+
+        >>> m1 = MNPuzzle((("*","2"), ("3","4")),(("3","2"), ("*","4")))
+        >>> m2 = MNPuzzle((("*","2"), ("3","4")),(("3","2"), ("*","4")))
+        >>> hash(m1) == hash(m2)
+        True
+        >>> m3 = m1.extensions()[0].extensions()[0]
+        >>> hash(m3) == hash(MNPuzzle(m3.from_grid, m3.to_grid))
+        True
+        """
+        return self._zobrist
 
     def __str__(self):
         """
@@ -63,15 +687,17 @@ class MNPuzzle(Puzzle):
         # doctest above is creating issues with \n character, so I have tested
         # it by printing it to the screen and inspecting if it prints properly
 
+        # unpack once rather than on every access
+        from_grid, to_grid = self.from_grid, self.to_grid
         s = ""
-        for i in range(len(self.from_grid)):
-            for j in range(len(self.from_grid[0])):
-                s += self.from_grid[i][j] + " "
+        for i in range(len(from_grid)):
+            for j in range(len(from_grid[0])):
+                s += from_grid[i][j] + " "
 
             s += "\t"
 
-            for j in range((len(self.to_grid[0]))):
-                s += self.to_grid[i][j] + " "
+            for j in range((len(to_grid[0]))):
+                s += to_grid[i][j] + " "
 
             s += "\n"
 
@@ -98,90 +724,197 @@ class MNPuzzle(Puzzle):
         True
         >>> extends[1] == MNPuzzle(t2 , target_grid)
         True
+        >>> big = MNPuzzle((("1", "2", "3", "4", "5"), ("6", "7", "8", "9", "*"),
+        ...                 ("A", "B", "C", "D", "E"), ("F", "G", "H", "I", "J")),
+        ...                (("1", "2", "3", "4", "5"), ("6", "7", "8", "9", "E"),
+        ...                 ("A", "B", "C", "D", "*"), ("F", "G", "H", "I", "J")))
+        >>> [e.is_solved() for e in big.extensions()]
+        [False, True, False]
         """
-
+        context, state, blank = self._context, self._state, self._blank
+        estimate, zobrist = self._estimate, self._zobrist
         new_configs = []
-        for i in range(len(self.from_grid)):
-            for j in range(len(self.from_grid[0])):
-                if self.from_grid[i][j] == "*":
-                    # the present position is a space
-
-                    if i - 1 >= 0 and not (self.from_grid[i-1][j] == "*"):
-                        # there is a position above it and it has a symbol
-                        new_grid = []
-                        sym = self.from_grid[i-1][j]
-                        # copy contents of tuple(tuple) to a list[list]
-                        for row in range(len(self.from_grid)):
-                            new_grid.append([])
-                            for col in range(len(self.from_grid[i])):
-                                new_grid[row].append(self.from_grid[row][col])
-
-                        new_grid[i][j] = sym
-                        new_grid[i-1][j] = "*"
-                        temp = []
-                        # convert each row of grid to a tuple and store in temp.
-                        # i.e convert from list[list] to list[tuple]
-                        for row in new_grid:
-                            temp.append(tuple(row))
-
-                        # append the puzzle with this new grid into a list
-                        # and convert the list[tuple] to a tuple(tuple)
-                        new_configs.append(MNPuzzle(tuple(temp), self.to_grid))
-
-                    if i + 1 < len(self.from_grid) and not (self.from_grid[i+1][j] == "*"):
-                        # there is a position below it and it has a symbol
-                        new_grid = []
-                        sym = self.from_grid[i+1][j]
-
-                        for row in range(len(self.from_grid)):
-                            new_grid.append([])
-                            for col in range(len(self.from_grid[i])):
-                                new_grid[row].append(self.from_grid[row][col])
-
-                        new_grid[i][j] = sym
-                        new_grid[i+1][j] = "*"
-                        temp = []
-
-                        for row in new_grid:
-                            temp.append(tuple(row))
-                        new_configs.append(MNPuzzle(tuple(temp), self.to_grid))
-
-                    if j - 1 >= 0 and not (self.from_grid[i][j-1] == "*"):
-                        # there is a position to the left of it and it has a
-                        # symbol
-                        new_grid = []
-                        sym = self.from_grid[i][j-1]
-                        for row in range(len(self.from_grid)):
-                            new_grid.append([])
-                            for col in range(len(self.from_grid[i])):
-                                new_grid[row].append(self.from_grid[row][col])
-
-                        new_grid[i][j] = sym
-                        new_grid[i][j-1] = "*"
-                        temp = []
-                        for row in new_grid:
-                            temp.append(tuple(row))
-                        new_configs.append(MNPuzzle(tuple(temp), self.to_grid))
-
-                    if j + 1 < len(self.from_grid[i]) and not (self.from_grid[i][j+1] == "*"):
-                        # there is a position to the right of it and it has a
-                        # symbol
-                        new_grid = []
-                        sym = self.from_grid[i][j+1]
-                        for row in range(len(self.from_grid)):
-                            new_grid.append([])
-                            for col in range(len(self.from_grid[i])):
-                                new_grid[row].append(self.from_grid[row][col])
-
-                        new_grid[i][j] = sym
-                        new_grid[i][j+1] = "*"
-                        temp = []
-                        for row in new_grid:
-                            temp.append(tuple(row))
-                        new_configs.append(MNPuzzle(tuple(temp), self.to_grid))
-
+        for q in context.neighbours[blank]:
+            if context.packed:
+                # the blank's code is 0, so moving the tile at q into the
+                # blank clears q's nibble and sets blank's
+                code = (state >> (4 * q)) & 15
+                new_state = (state ^ (code << (4 * q))) | (code << (4 * blank))
+            else:
+                cells = list(state)
+                code = cells[q]
+                cells[blank], cells[q] = code, 0
+                new_state = tuple(cells)
+            keys = context.zobrist
+            config = self._from_state(context, new_state, q,
+                                      zobrist ^ keys[q][code] ^
+                                      keys[blank][code])
+            # a move never changes whether to_grid can be reached
+            config._solvable = self._solvable
+            if estimate is not None:
+                # only keep the estimate up to date once it has been asked
+                config._estimate = context.move_estimate(
+                    estimate, state, new_state, code, q, blank)
+            new_configs.append(config)
         return new_configs
 
+    def describe_move(self, extension):
+        """
+        Overrides Puzzle.describe_move()
+
+        Return the direction, "U", "D", "L" or "R", in which "*" moves to
+        reach extension.
+
+        @param MNPuzzle self: this puzzle
+        @param MNPuzzle extension: an extension of this puzzle
+        @rtype: str
+
+        >>> target_grid = (("1", "2", "3"), ("4", "5", "*"))
+        >>> gr = MNPuzzle((("*", "2", "3"), ("1", "4", "5")), target_grid)
+        >>> [gr.describe_move(e) for e in gr.extensions()]
+        ['D', 'R']
+        >>> gr.apply_move("R") == gr.extensions()[1]
+        True
+        """
+        step, m = extension._blank - self._blank, self.m
+        if step == -m:
+            return "U"
+        elif step == m:
+            return "D"
+        return "L" if step == -1 else "R"
+
+    def apply_move(self, move):
+        """
+        Overrides Puzzle.apply_move()
+
+        Return the extension reached by moving "*" in direction move.
+
+        @param MNPuzzle self: this puzzle
+        @param str move: one of "U", "D", "L" or "R"
+        @rtype: MNPuzzle
+        """
+        for extension in self.extensions():
+            if self.describe_move(extension) == move:
+                return extension
+        raise ValueError("can't move {} in\n{}".format(move, self))
+
+    def heuristic(self):
+        """
+        Overrides Puzzle.heuristic()
+
+        Return the Manhattan distance of every tile from its place in
+        to_grid plus two moves for each tile that has to step out of its
+        target row or column to let another tile in that line pass. This
+        never overestimates the moves left when every tile in to_grid is
+        distinct; otherwise it is 0.
+
+        The estimate is computed in full the first time it is asked, and
+        after that each extension updates its parent's estimate from the
+        tile that moved and the two lines it moved between.
+
+        @param MNPuzzle self: this puzzle
+        @rtype: int
+
+        >>> target_grid = (("1", "2", "3"), ("4", "5", "6"), ("7", "8", "*"))
+        >>> p = MNPuzzle((("3", "2", "1"), ("4", "5", "6"), ("7", "*", "8")),
+        ...              target_grid)
+        >>> p.heuristic()
+        9
+        >>> [e.heuristic() for e in p.extensions()]
+        [10, 10, 8]
+        >>> [MNPuzzle(e.from_grid, target_grid).heuristic()
+        ...  for e in p.extensions()]
+        [10, 10, 8]
+        >>> import pickle
+        >>> data = pickle.dumps(p)
+        >>> _contexts.clear()
+        >>> copy = pickle.loads(data)
+        >>> copy._context is p._context
+        False
+        >>> [e.heuristic() for e in copy.extensions()]
+        [10, 10, 8]
+        """
+        if self._estimate is None:
+            self._estimate = self._context.estimate(self._state)
+        return self._estimate
+
+    def fail_fast(self):
+        """
+        Overrides Puzzle.fail_fast()
+
+        Return True if to_grid can never be reached from this configuration.
+        A move swaps the blank with a neighbour, so it changes both the
+        parity of the permutation taking this configuration to to_grid and
+        the parity of the blank's distance from its target cell. These two
+        parities must therefore agree for to_grid to be reachable, and on
+        boards with at least two rows and columns that is also enough.
+
+        The answer is computed once in O(nm) and handed down to extensions.
+
+        @param MNPuzzle self: this puzzle
+        @rtype: bool
+
+        >>> target_grid = (("1", "2"), ("3", "*"))
+        >>> MNPuzzle((("1", "*"), ("3", "2")), target_grid).fail_fast()
+        False
+        >>> MNPuzzle((("2", "1"), ("3", "*")), target_grid).fail_fast()
+        True
+        >>> MNPuzzle((("2", "*"), ("3", "1")), target_grid).fail_fast()
+        True
+        >>> MNPuzzle((("1", "2", "*"),), (("2", "1", "*"),)).fail_fast()
+        True
+        >>> from puzzle_tools import breadth_first_solve
+        >>> breadth_first_solve(MNPuzzle((("2", "1", "3"), ("4", "5", "*")),
+        ...                              (("1", "2", "3"), ("4", "5", "*"))))
+        """
+        if self._solvable is None:
+            self._solvable = self._reachable()
+        return not self._solvable
+
+    def _reachable(self):
+        """
+        Return whether to_grid can be reached from this configuration,
+        or True whenever that can't be decided by parity alone.
+
+        @param MNPuzzle self: this puzzle
+        @rtype: bool
+        """
+        context = self._context
+        if context.goal is None:
+            return False
+        n, m = context.n, context.m
+        cells, goal = context.cells(self._state), context.cells(context.goal)
+        counts = [0] * len(context.symbols)
+        for c in cells:
+            counts[c] += 1
+        for c in goal:
+            counts[c] -= 1
+        if any(counts):
+            # not the same tiles as to_grid
+            return False
+        if n == 1 or m == 1:
+            # tiles on a single line can never pass each other
+            return [c for c in cells if c] == [c for c in goal if c]
+        if len(context.symbols) < n * m:
+            # repeated tiles can be swapped to fix either parity
+            return True
+        # target position of each code
+        goal_position = [0] * len(goal)
+        for p, c in enumerate(goal):
+            goal_position[c] = p
+        # parity of a permutation is that of its size minus its cycles
+        visited, cycles = [False] * len(cells), 0
+        for p in range(len(cells)):
+            if not visited[p]:
+                cycles += 1
+                while not visited[p]:
+                    visited[p] = True
+                    p = goal_position[cells[p]]
+        blank_row, blank_col = divmod(self._blank, m)
+        goal_row, goal_col = divmod(goal_position[0], m)
+        distance = abs(blank_row - goal_row) + abs(blank_col - goal_col)
+        return (len(cells) - cycles) % 2 == distance % 2
+
     def is_solved(self):
         """
         Overrides Puzzle.is_solved()
@@ -202,7 +935,7 @@ class MNPuzzle(Puzzle):
         >>> gr1.is_solved()
         True
         """
-        return self.from_grid == self.to_grid
+        return self._state == self._context.goal
 
 
 if __name__ == "__main__":
@@ -0,0 +1,307 @@
+"""
+Breadth-first search spread over worker processes
+
+Every state is owned by one worker, chosen by a digest of its key, and
+only that worker records whether the state has been seen. The search
+goes one layer at a time: each worker expands the states it found in the
+last layer and sorts their extensions by owner into shared memory, then
+each worker reads the extensions it owns, keeps those it hasn't seen and
+reports whether any is solved. Puzzles go between workers as what their
+to_bytes returns, and what they share, their context, is sent to each
+worker once. A solution is traced back through the owners of the
+states on its path, each of which keeps the bytes of the states it owns,
+so the path is rebuilt from those rather than by extending puzzles
+again, whose extensions needn't come in the same order in every
+process.
+"""
+from hashlib import blake2b
+from multiprocessing import Pipe, Process, resource_tracker
+from multiprocessing.shared_memory import SharedMemory
+from puzzle_tools import PuzzleNode, solution_moves
+import os
+import struct
+
+# how each puzzle is sent to its owner: its digest, its parent's digest
+# and the length of its bytes, which follow
+_RECORD = struct.Struct("<16s16sI")
+
+
+def _digest(puzzle, symmetry):
+    """
+    Return a 16-byte digest of the key of puzzle that solvers use to
+    recognise states already seen.
+
+    @type puzzle: Puzzle
+    @type symmetry: bool
+    @rtype: bytes
+    """
+    key = puzzle.canonical_key() if symmetry else puzzle.state_key()
+    return blake2b(str(key).encode("utf-8"), digest_size=16).digest()
+
+
+def _owner(digest, workers):
+    """
+    Return which of workers workers owns the state with digest digest.
+
+    @type digest: bytes
+    @type workers: int
+    @rtype: int
+    """
+    return int.from_bytes(digest[:8], "little") % workers
+
+
+def _receive(conn):
+    """
+    Return what the worker at the other end of conn answered, raising
+    the error it failed with instead if it failed.
+
+    @type conn: multiprocessing.connection.Connection
+    @rtype: object
+    """
+    try:
+        kind, value = conn.recv()
+    except EOFError:
+        raise RuntimeError("search worker ended early")
+    if kind == "error":
+        raise value
+    return value
+
+
+def _worker(index, workers, symmetry, conn):
+    """
+    Serve the commands sent over conn for worker index of workers,
+    until told to stop, answering each with ("result", answer), or
+    ("error", error) and stopping if a command fails.
+
+    @type index: int
+    @type workers: int
+    @type symmetry: bool
+    @type conn: multiprocessing.connection.Connection
+    @rtype: None
+    """
+    # the class of the puzzles searched and the context they share
+    cls = context = None
+    # digest of every state owned and seen -> (parent digest, what the
+    # state's to_bytes returns)
+    seen = {}
+    # (digest, puzzle) of the states owned that were found last layer
+    frontier = []
+    # segments written for the last layer, freed once all are read
+    segments = []
+    # a solved state found while expanding, reported at the next collect
+    found = None
+    try:
+        while True:
+            command, argument = conn.recv()
+            if command == "context":
+                cls, context = argument
+            elif command == "root":
+                digest, data = argument
+                seen[digest] = (None, data)
+                frontier = [(digest, cls.from_bytes(data, context))]
+            elif command == "expand":
+                batches = [bytearray() for _ in range(workers)]
+                new_frontier = []
+                for digest, puzzle in frontier:
+                    for child in puzzle.extensions():
+                        if child.is_solved() or not child.fail_fast():
+                            child_digest = _digest(child, symmetry)
+                            owner = _owner(child_digest, workers)
+                            if owner != index:
+                                data = child.to_bytes()
+                                batches[owner] += _RECORD.pack(
+                                    child_digest, digest, len(data))
+                                batches[owner] += data
+                            elif child_digest not in seen:
+                                # owned here, so no need to send it anywhere
+                                seen[child_digest] = (digest, child.to_bytes())
+                                new_frontier.append((child_digest, child))
+                                if found is None and child.is_solved():
+                                    found = child_digest
+                frontier = new_frontier
+                names = []
+                for batch in batches:
+                    if not batch:
+                        # shared memory can't be empty
+                        names.append(None)
+                        continue
+                    segment = SharedMemory(create=True, size=len(batch))
+                    segment.buf[:len(batch)] = batch
+                    segments.append(segment)
+                    names.append((segment.name, len(batch)))
+                conn.send(("result", names))
+            elif command == "collect":
+                for written in argument:
+                    if written is None:
+                        continue
+                    name, size = written
+                    segment = SharedMemory(name=name)
+                    batch = bytes(segment.buf[:size])
+                    segment.close()
+                    offset = 0
+                    while offset < len(batch):
+                        digest, parent, length = _RECORD.unpack_from(
+                            batch, offset)
+                        offset += _RECORD.size
+                        if digest not in seen:
+                            data = batch[offset:offset + length]
+                            child = cls.from_bytes(data, context)
+                            seen[digest] = (parent, data)
+                            frontier.append((digest, child))
+                            if found is None and child.is_solved():
+                                found = digest
+                        offset += length
+                conn.send(("result", (found, len(frontier))))
+                found = None
+            elif command == "release":
+                for segment in segments:
+                    segment.close()
+                    segment.unlink()
+                segments = []
+            elif command == "parent":
+                conn.send(("result", seen[argument]))
+            elif command == "stop":
+                break
+    except Exception as error:
+        conn.send(("error", error))
+        # other workers may still be reading what this one wrote, so
+        # keep it until the search is given up
+        while conn.recv()[0] != "stop":
+            pass
+    finally:
+        for segment in segments:
+            segment.close()
+            segment.unlink()
+        conn.close()
+
+
+def parallel_breadth_first_solve(puzzle, workers=None, moves=False,
+                                 symmetry=False):
+    """
+    Return a shortest path from PuzzleNode(puzzle) to a PuzzleNode
+    containing a solution, as breadth_first_solve does, searching with
+    workers worker processes, or one per CPU if workers is None.
+
+    @type puzzle: Puzzle
+    @type workers: int | None
+    @type moves: bool
+    @type symmetry: bool
+    @rtype: PuzzleNode | list | None
+
+    >>> from mn_puzzle import MNPuzzle
+    >>> target_grid = (("1", "2", "3"), ("4", "5", "*"))
+    >>> start_grid = (("5", "4", "*"), ("3", "2", "1"))
+    >>> puzzle = MNPuzzle(start_grid, target_grid)
+    >>> len(parallel_breadth_first_solve(puzzle, 3, True))
+    13
+    >>> from word_ladder_puzzle import WordLadderPuzzle
+    >>> word_set = {"case", "same", "some", "rome", "rose", "rost", "cost"}
+    >>> w = WordLadderPuzzle("same", "cost", word_set)
+    >>> parallel_breadth_first_solve(w, 2, True)
+    ['some', 'rome', 'rose', 'rost', 'cost']
+    >>> print(parallel_breadth_first_solve(WordLadderPuzzle("same", "cast",
+    ...                                                     word_set), 2))
+    None
+    >>> from sudoku_puzzle import SudokuPuzzle
+    >>> s = SudokuPuzzle(4, list("*BC*CD*B*A****BA"), {"A", "B", "C", "D"})
+    >>> moves = parallel_breadth_first_solve(s, 2, True)
+    >>> moves[:4]
+    [(0, 'A'), (3, 'D'), (6, 'A'), (8, 'B')]
+    >>> moves[4:]
+    [(10, 'D'), (11, 'C'), (12, 'D'), (13, 'C')]
+    >>> extensions = MNPuzzle.extensions
+    >>> MNPuzzle.extensions = lambda self: 1 / 0
+    >>> parallel_breadth_first_solve(puzzle, 2)
+    Traceback (most recent call last):
+    ZeroDivisionError: division by zero
+    >>> MNPuzzle.extensions = extensions
+    """
+    if moves:
+        return solution_moves(parallel_breadth_first_solve(puzzle, workers,
+                                                           False, symmetry))
+    if puzzle.is_solved():
+        return PuzzleNode(puzzle)
+    if puzzle.fail_fast():
+        # reject unsolvable puzzles before starting any workers
+        return None
+    if workers is None:
+        workers = os.cpu_count() or 1
+    # workers share one tracker of shared memory segments, so that one
+    # reading a segment and another freeing it agree that it is gone
+    resource_tracker.ensure_running()
+    conns, processes = [], []
+    for index in range(workers):
+        conn, child_conn = Pipe()
+        process = Process(target=_worker,
+                          args=(index, workers, symmetry, child_conn),
+                          daemon=True)
+        process.start()
+        # so that recv sees EOFError if the worker dies
+        child_conn.close()
+        conns.append(conn)
+        processes.append(process)
+    # names[source][destination] of the segment between them, for the
+    # layer being passed around until the workers are told to free it
+    names = []
+    try:
+        for conn in conns:
+            conn.send(("context", (type(puzzle), puzzle.context())))
+        root = _digest(puzzle, symmetry)
+        conns[_owner(root, workers)].send(("root", (root,
+                                                    puzzle.to_bytes())))
+        found = None
+        while found is None:
+            for conn in conns:
+                conn.send(("expand", None))
+            names = [_receive(conn) for conn in conns]
+            for destination, conn in enumerate(conns):
+                conn.send(("collect", [names[source][destination]
+                                       for source in range(workers)]))
+            results = [_receive(conn) for conn in conns]
+            for conn in conns:
+                conn.send(("release", None))
+            names = []
+            for digest, _ in results:
+                if digest is not None:
+                    found = digest
+                    break
+            if found is None and sum([size for _, size in results]) == 0:
+                return None
+        path, digest = [], found
+        while True:
+            conns[_owner(digest, workers)].send(("parent", digest))
+            digest, data = _receive(conns[_owner(digest, workers)])
+            if digest is None:
+                break
+            path.append(data)
+        cls, context = type(puzzle), puzzle.context()
+        root_node = node = PuzzleNode(puzzle)
+        for data in reversed(path):
+            child = PuzzleNode(cls.from_bytes(data, context), parent=node)
+            node.children = [child]
+            node = child
+        return root_node
+    finally:
+        for conn in conns:
+            try:
+                conn.send(("stop", None))
+            except OSError:
+                # that worker has already stopped
+                pass
+            conn.close()
+        for process in processes:
+            process.join(1)
+            if process.is_alive():
+                process.terminate()
+                process.join()
+        # a worker cut short never freed the segments it wrote
+        for row in names:
+            for written in row:
+                if written is None:
+                    continue
+                try:
+                    segment = SharedMemory(name=written[0])
+                except FileNotFoundError:
+                    continue
+                segment.close()
+                segment.unlink()
@@ -1,3 +1,6 @@
+import pickle
+
+
 class Puzzle:
     """"
     Snapshot of a full-information puzzle, which may be solved, unsolved,
@@ -16,6 +19,48 @@ class Puzzle:
         """
         return False
 
+    def state_key(self):
+        """
+        Return a hashable key that is the same for two Puzzles exactly
+        when they are in the same state, used by solvers to recognise
+        states they have already seen.
+
+        Override this in a subclass that has a cheaper key than its
+        string representation.
+
+        @type self: Puzzle
+        @rtype: object
+        """
+        return str(self)
+
+    def canonical_key(self):
+        """
+        Return a key like state_key that is also shared by every symmetric
+        copy of Puzzle self: any state that a symmetry of the puzzle maps
+        to self, where the symmetry maps extensions to extensions and
+        solutions to solutions.
+
+        Override this in a subclass with such symmetries; by default a
+        Puzzle has none and this is just state_key().
+
+        @type self: Puzzle
+        @rtype: object
+        """
+        return self.state_key()
+
+    def heuristic(self):
+        """
+        Return an estimate of the number of extensions still needed to
+        reach a solution from Puzzle self, which must never be more than
+        the true number.
+
+        Override this in a subclass that can estimate better than 0.
+
+        @type self: Puzzle
+        @rtype: int
+        """
+        return 0
+
     def is_solved(self):
         """
         Return True iff Puzzle self is solved.
@@ -39,3 +84,70 @@ class Puzzle:
         @rtype: generator[Puzzle]
         """
         raise NotImplementedError
+
+    def describe_move(self, extension):
+        """
+        Return a compact description of the move from Puzzle self to
+        extension, one of its extensions, which apply_move turns back into
+        extension.
+
+        Override this in a subclass with a description that doesn't depend
+        on the order of extensions; by default it is extension's position
+        in self.extensions().
+
+        @type self: Puzzle
+        @type extension: Puzzle
+        @rtype: object
+        """
+        return [str(x) for x in self.extensions()].index(str(extension))
+
+    def apply_move(self, move):
+        """
+        Return the extension of Puzzle self reached by move, as described
+        by describe_move.
+
+        @type self: Puzzle
+        @type move: object
+        @rtype: Puzzle
+        """
+        return self.extensions()[move]
+
+    def context(self):
+        """
+        Return what Puzzle self shares with every puzzle reached from it,
+        such as the board or the words in use, to be sent once to where
+        puzzles are rebuilt by from_bytes.
+
+        Override this together with to_bytes and from_bytes in a subclass
+        whose puzzles share more than a few bytes; by default there is no
+        context.
+
+        @type self: Puzzle
+        @rtype: object
+        """
+        return None
+
+    def to_bytes(self):
+        """
+        Return the state of Puzzle self as bytes, from which from_bytes
+        rebuilds it given self.context().
+
+        By default the whole puzzle is pickled.
+
+        @type self: Puzzle
+        @rtype: bytes
+        """
+        return pickle.dumps(self, pickle.HIGHEST_PROTOCOL)
+
+    @classmethod
+    def from_bytes(cls, data, context):
+        """
+        Return the puzzle whose state to_bytes turned into data, where
+        context is what that puzzle's context() returned.
+
+        @type cls: type
+        @type data: bytes
+        @type context: object
+        @rtype: Puzzle
+        """
+        return pickle.loads(data)
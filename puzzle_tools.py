@@ -2,7 +2,8 @@
 Some functions for working with puzzles
 """
 from puzzle import Puzzle
-from collections import deque
+from collections import deque, OrderedDict
+from heapq import heapify, heappush, heappop, nsmallest
 # set higher recursion limit
 # which is needed in PuzzleNode.__str__
 # you may uncomment the next lines on a unix system such as CDF
@@ -12,15 +13,30 @@ import sys
 sys.setrecursionlimit(10**6)
 
 
-def depth_first_solve(puzzle, seen=set()):
+def depth_first_solve(puzzle, seen=None, moves=False, symmetry=False,
+                      hooks=None):
     """
     Return a path from PuzzleNode(puzzle) to a PuzzleNode containing
     a solution, with each child containing an extension of the puzzle
     in its parent.  Return None if this is not possible.
 
+    If moves is True, return the list of moves along the path instead,
+    as given by solution_moves. If symmetry is True, states that are
+    symmetric copies of one another are seen as the same state.
+
+    The keys of states already seen are kept in seen, a new set if it is
+    None. Any object with add and in will do, such as a BloomFilter that
+    bounds the memory used at the risk of skipping a few states.
+
+    If hooks is given, its methods are called as the search goes, as
+    described in search_hooks.
+
     @type puzzle: Puzzle
-    @type seen: set
-    @rtype: PuzzleNode
+    @type seen: set | BloomFilter | None
+    @type moves: bool
+    @type symmetry: bool
+    @type hooks: SearchHooks | None
+    @rtype: PuzzleNode | list
 
     # for the doctest below, the test prints the node on the console. I felt it
     # would be easier to see and inspect the output rather than construct a node
@@ -39,20 +55,67 @@ def depth_first_solve(puzzle, seen=set()):
     >>> w2 = WordLadderPuzzle("same", "cost", {"case", "same", "some", "rome", "rose", "rost", "cost"})
     >>> node = depth_first_solve(w2)
     >>> print(node)
+    >>> from bloom_filter import BloomFilter
+    >>> from mn_puzzle import MNPuzzle
+    >>> target_grid = (("1", "2", "3"), ("4", "5", "*"))
+    >>> start_grid = (("*", "2", "3"), ("1", "4", "5"))
+    >>> seen = BloomFilter(360, memory=1024)
+    >>> depth_first_solve(MNPuzzle(start_grid, target_grid), seen) is None
+    False
+    >>> 0 < seen.fill_ratio() < 1
+    True
 
     """
-    if puzzle is None or str(puzzle) in seen:
+    if moves:
+        return solution_moves(depth_first_solve(puzzle, seen, False, symmetry,
+                                                hooks))
+    if puzzle is None:
         return None
+    if seen is None:
+        seen = set()
+    return _depth_first_solve(puzzle, seen, symmetry, hooks, 0)
 
-    seen.add(str(puzzle))
+
+def _depth_first_solve(puzzle, seen, symmetry, hooks, depth):
+    """
+    Return a path from PuzzleNode(puzzle), depth moves from where the
+    search started, to a PuzzleNode containing a solution, as
+    depth_first_solve does, or None if there is none.
+
+    @type puzzle: Puzzle
+    @type seen: set | BloomFilter
+    @type symmetry: bool
+    @type hooks: SearchHooks | None
+    @type depth: int
+    @rtype: PuzzleNode | None
+    """
+    key = puzzle.canonical_key() if symmetry else puzzle.state_key()
+    if key in seen:
+        if hooks is not None:
+            hooks.on_duplicate(puzzle, depth)
+        return None
+
+    seen.add(key)
 
     if puzzle.is_solved():
+        if hooks is not None:
+            hooks.on_solution(puzzle, depth)
         return PuzzleNode(puzzle)
 
+    elif puzzle.fail_fast():
+        # no point extending a puzzle that can't be solved
+        if hooks is not None:
+            hooks.on_prune(puzzle, depth)
+        return None
+
     else:
+        if hooks is not None:
+            hooks.on_expand(puzzle, depth)
         extensions = puzzle.extensions()
         for x in extensions:
-            node = depth_first_solve(x, seen)
+            if hooks is not None:
+                hooks.on_generate(x, depth + 1)
+            node = _depth_first_solve(x, seen, symmetry, hooks, depth + 1)
             if node:
                 main_node = PuzzleNode(puzzle)
                 node.parent = main_node
@@ -61,14 +124,27 @@ def depth_first_solve(puzzle, seen=set()):
     return None
 
 
-def breadth_first_solve(puzzle):
+def breadth_first_solve(puzzle, moves=False, symmetry=False, workers=None,
+                        hooks=None):
     """
     Return a path from PuzzleNode(puzzle) to a PuzzleNode containing
     a solution, with each child PuzzleNode containing an extension
     of the puzzle in its parent.  Return None if this is not possible.
 
+    If moves is True, return the list of moves along the path instead,
+    as given by solution_moves. If symmetry is True, states that are
+    symmetric copies of one another are seen as the same state. If
+    workers is given, search with that many worker processes, as
+    parallel_bfs.parallel_breadth_first_solve does. Otherwise, if hooks
+    is given, its methods are called as the search goes, as described in
+    search_hooks.
+
     @type puzzle: Puzzle
-    @rtype: PuzzleNode
+    @type moves: bool
+    @type symmetry: bool
+    @type workers: int | None
+    @type hooks: SearchHooks | None
+    @rtype: PuzzleNode | list
 
     # for the doctest below, the test prints the node on the console. I felt it
     # would be easier to see and inspect the output rather than construct a node
@@ -98,29 +174,534 @@ def breadth_first_solve(puzzle):
             children.append(PuzzleNode(config, None, puznode))
         return children
 
+    if workers is not None:
+        from parallel_bfs import parallel_breadth_first_solve
+        return parallel_breadth_first_solve(puzzle, workers, moves, symmetry)
+    if moves:
+        return solution_moves(breadth_first_solve(puzzle, False, symmetry,
+                                                  None, hooks))
+    if not puzzle.is_solved() and puzzle.fail_fast():
+        # reject unsolvable puzzles before searching at all
+        return None
+
+    key_of = _canonical_key if symmetry else _state_key
     seen = set()
-    q = deque([PuzzleNode(puzzle)])
+    # each node goes with the number of moves to it
+    q = deque([(PuzzleNode(puzzle), 0)])
     while q:
-        puznode = q.popleft()
-        seen.add(str(puznode))
+        puznode, depth = q.popleft()
+        seen.add(key_of(puznode.puzzle))
         if puznode.puzzle.is_solved():
-            # if this node is solved, trace back to its parent node
-            # in case puznode does not have a parent, it is its parent
-            parent = puznode
-
-            # if it has a parent, trace back to it
-            while puznode.parent:
-                parent = puznode.parent
-                parent.children = [puznode]
-                puznode = parent  # to find the grandparent
-
-            return parent
+            if hooks is not None:
+                hooks.on_solution(puznode.puzzle, depth)
+            return _trace_back(puznode)
         else:
+            if hooks is not None:
+                hooks.on_expand(puznode.puzzle, depth)
             children = get_children(puznode)
             for child in children:
-                if str(child) not in seen:
-                    q.append(child)
-                    seen.add(str(child))
+                if hooks is not None:
+                    hooks.on_generate(child.puzzle, depth + 1)
+                key = key_of(child.puzzle)
+                if key not in seen:
+                    seen.add(key)
+                    if (child.puzzle.is_solved() or
+                            not child.puzzle.fail_fast()):
+                        q.append((child, depth + 1))
+                    elif hooks is not None:
+                        hooks.on_prune(child.puzzle, depth + 1)
+                elif hooks is not None:
+                    hooks.on_duplicate(child.puzzle, depth + 1)
+
+
+def a_star_solve(puzzle, heuristic=None, moves=False, symmetry=False,
+                 hooks=None):
+    """
+    Return a shortest path from PuzzleNode(puzzle) to a PuzzleNode
+    containing a solution, with each child PuzzleNode containing an
+    extension of the puzzle in its parent.  Return None if this is not
+    possible.
+
+    Puzzles are expanded in order of the number of moves made so far plus
+    heuristic(puzzle), which must never overestimate the number of moves
+    still needed for the path to be shortest. By default each puzzle's
+    own heuristic() is used.
+
+    If moves is True, return the list of moves along the path instead,
+    as given by solution_moves. If symmetry is True, states that are
+    symmetric copies of one another are seen as the same state.
+    If hooks is given, its methods are called as the search goes, as
+    described in search_hooks.
+
+    @type puzzle: Puzzle
+    @type heuristic: ((Puzzle) -> int) | None
+    @type moves: bool
+    @type symmetry: bool
+    @type hooks: SearchHooks | None
+    @rtype: PuzzleNode | list
+
+    >>> from mn_puzzle import MNPuzzle
+    >>> target_grid = (("1", "2", "3"), ("4", "5", "*"))
+    >>> start_grid = (("*", "2", "3"), ("1", "4", "5"))
+    >>> node = a_star_solve(MNPuzzle(start_grid, target_grid), lambda p: 0)
+    >>> length = 0
+    >>> while node.children:
+    ...     node, length = node.children[0], length + 1
+    >>> node.puzzle.is_solved(), length
+    (True, 3)
+    >>> node = a_star_solve(MNPuzzle(start_grid, target_grid))
+    >>> node.children[0].children[0].children[0].puzzle.is_solved()
+    True
+    """
+    if moves:
+        return solution_moves(a_star_solve(puzzle, heuristic, False, symmetry,
+                                           hooks))
+    if not puzzle.is_solved() and puzzle.fail_fast():
+        # reject unsolvable puzzles before searching at all
+        return None
+    if heuristic is None:
+        heuristic = _own_heuristic
+
+    # the counter breaks ties between equal estimates in insertion order,
+    # so PuzzleNodes themselves are never compared
+    counter = 0
+    key_of = _canonical_key if symmetry else _state_key
+    best = {key_of(puzzle): 0}
+    q = [(heuristic(puzzle), counter, 0, PuzzleNode(puzzle))]
+    while q:
+        _, _, made, puznode = heappop(q)
+        if made > best[key_of(puznode.puzzle)]:
+            # a shorter way to this puzzle was found after this one was queued
+            continue
+        if puznode.puzzle.is_solved():
+            if hooks is not None:
+                hooks.on_solution(puznode.puzzle, made)
+            return _trace_back(puznode)
+        if hooks is not None:
+            hooks.on_expand(puznode.puzzle, made)
+        for config in puznode.puzzle.extensions():
+            if hooks is not None:
+                hooks.on_generate(config, made + 1)
+            key = key_of(config)
+            if key in best and best[key] <= made + 1:
+                if hooks is not None:
+                    hooks.on_duplicate(config, made + 1)
+                continue
+            best[key] = made + 1
+            if config.is_solved() or not config.fail_fast():
+                counter += 1
+                heappush(q, (made + 1 + heuristic(config), counter,
+                             made + 1, PuzzleNode(config, None, puznode)))
+            elif hooks is not None:
+                hooks.on_prune(config, made + 1)
+    return None
+
+
+def beam_solve(puzzle, width, heuristic=None, moves=False, symmetry=False,
+               hooks=None):
+    """
+    Return the first path found from PuzzleNode(puzzle) to a PuzzleNode
+    containing a solution, as breadth_first_solve does, together with its
+    number of moves, or None if none is found.
+
+    The search goes one move at a time, like breadth_first_solve, but
+    keeps only the width extensions with the lowest heuristic(puzzle) at
+    each step, so it uses little memory and time but may miss shorter
+    solutions, or every solution. By default each puzzle's own heuristic()
+    is used.
+
+    If moves is True, return the list of moves along the path instead,
+    as given by solution_moves. If symmetry is True, states that are
+    symmetric copies of one another are seen as the same state.
+    If hooks is given, its methods are called as the search goes, as
+    described in search_hooks.
+
+    @type puzzle: Puzzle
+    @type width: int
+    @type heuristic: ((Puzzle) -> int) | None
+    @type moves: bool
+    @type symmetry: bool
+    @type hooks: SearchHooks | None
+    @rtype: (PuzzleNode | list, int) | None
+
+    >>> from mn_puzzle import MNPuzzle
+    >>> target_grid = (("1", "2", "3"), ("4", "5", "*"))
+    >>> start_grid = (("5", "4", "*"), ("3", "2", "1"))
+    >>> node, length = beam_solve(MNPuzzle(start_grid, target_grid), 4)
+    >>> length >= 13
+    True
+    >>> for _ in range(length):
+    ...     node = node.children[0]
+    >>> node.puzzle.is_solved()
+    True
+    """
+    assert width > 0
+    if moves:
+        result = beam_solve(puzzle, width, heuristic, False, symmetry, hooks)
+        return result and (solution_moves(result[0]), result[1])
+    if not puzzle.is_solved() and puzzle.fail_fast():
+        # reject unsolvable puzzles before searching at all
+        return None
+    if heuristic is None:
+        heuristic = _own_heuristic
+    key_of = _canonical_key if symmetry else _state_key
+    seen, beam, length = {key_of(puzzle)}, [PuzzleNode(puzzle)], 0
+    counter = 0
+    while beam:
+        for puznode in beam:
+            if puznode.puzzle.is_solved():
+                if hooks is not None:
+                    hooks.on_solution(puznode.puzzle, length)
+                return _trace_back(puznode), length
+        candidates = []
+        for puznode in beam:
+            if hooks is not None:
+                hooks.on_expand(puznode.puzzle, length)
+            for config in puznode.puzzle.extensions():
+                if hooks is not None:
+                    hooks.on_generate(config, length + 1)
+                key = key_of(config)
+                if key not in seen:
+                    seen.add(key)
+                    if config.is_solved() or not config.fail_fast():
+                        # the counter breaks ties in the order found, so
+                        # PuzzleNodes themselves are never compared
+                        counter += 1
+                        candidates.append((heuristic(config), counter,
+                                           PuzzleNode(config, None, puznode)))
+                    elif hooks is not None:
+                        hooks.on_prune(config, length + 1)
+                elif hooks is not None:
+                    hooks.on_duplicate(config, length + 1)
+        beam = [puznode for _, _, puznode in nsmallest(width, candidates)]
+        length += 1
+    return None
+
+
+def greedy_best_first_solve(puzzle, heuristic=None, moves=False,
+                            symmetry=False, limit=10000, hooks=None):
+    """
+    Return the first path found from PuzzleNode(puzzle) to a PuzzleNode
+    containing a solution, as breadth_first_solve does, together with its
+    number of moves, or None if none is found.
+
+    The puzzle with the lowest heuristic(puzzle) is always expanded next,
+    however many moves it took to reach, so solutions are found quickly
+    but may be far from shortest. By default each puzzle's own
+    heuristic() is used. Whenever twice limit puzzles are waiting to be
+    expanded, all but the limit with the lowest heuristic are dropped, and
+    only the keys of the 8 * limit puzzles most recently found are kept
+    to recognise states already seen, so memory stays bounded but a
+    solution may be missed, or a state searched again. If limit is None,
+    nothing is dropped or forgotten.
+
+    If moves is True, return the list of moves along the path instead,
+    as given by solution_moves. If symmetry is True, states that are
+    symmetric copies of one another are seen as the same state.
+    If hooks is given, its methods are called as the search goes, as
+    described in search_hooks.
+
+    @type puzzle: Puzzle
+    @type heuristic: ((Puzzle) -> int) | None
+    @type moves: bool
+    @type symmetry: bool
+    @type limit: int | None
+    @type hooks: SearchHooks | None
+    @rtype: (PuzzleNode | list, int) | None
+
+    >>> from word_ladder_puzzle import WordLadderPuzzle
+    >>> word_set = {"case", "same", "some", "rome", "rose", "rost", "cost"}
+    >>> w = WordLadderPuzzle("same", "cost", word_set)
+    >>> greedy_best_first_solve(w, moves=True)
+    (['some', 'rome', 'rose', 'rost', 'cost'], 5)
+    >>> from mn_puzzle import MNPuzzle
+    >>> target_grid = (("1", "2", "3"), ("4", "5", "*"))
+    >>> start_grid = (("5", "4", "*"), ("3", "2", "1"))
+    >>> puzzle = MNPuzzle(start_grid, target_grid)
+    >>> greedy_best_first_solve(puzzle, limit=2)[1] >= 13
+    True
+    """
+    if moves:
+        result = greedy_best_first_solve(puzzle, heuristic, False, symmetry,
+                                         limit, hooks)
+        return result and (solution_moves(result[0]), result[1])
+    if not puzzle.is_solved() and puzzle.fail_fast():
+        # reject unsolvable puzzles before searching at all
+        return None
+    if heuristic is None:
+        heuristic = _own_heuristic
+    key_of = _canonical_key if symmetry else _state_key
+    counter = 0
+    # the keys of puzzles found, least recently found first
+    seen = OrderedDict([(key_of(puzzle), None)])
+    q = [(heuristic(puzzle), counter, 0, PuzzleNode(puzzle))]
+    while q:
+        _, _, made, puznode = heappop(q)
+        if puznode.puzzle.is_solved():
+            if hooks is not None:
+                hooks.on_solution(puznode.puzzle, made)
+            return _trace_back(puznode), made
+        if hooks is not None:
+            hooks.on_expand(puznode.puzzle, made)
+        for config in puznode.puzzle.extensions():
+            if hooks is not None:
+                hooks.on_generate(config, made + 1)
+            key = key_of(config)
+            if key not in seen:
+                seen[key] = None
+                if limit is not None and len(seen) > 8 * limit:
+                    seen.popitem(last=False)
+                if config.is_solved() or not config.fail_fast():
+                    counter += 1
+                    heappush(q, (heuristic(config), counter, made + 1,
+                                 PuzzleNode(config, None, puznode)))
+                elif hooks is not None:
+                    hooks.on_prune(config, made + 1)
+            else:
+                seen.move_to_end(key)
+                if hooks is not None:
+                    hooks.on_duplicate(config, made + 1)
+        if limit is not None and len(q) >= 2 * limit:
+            q = nsmallest(limit, q)
+            heapify(q)
+    return None
+
+
+def iterative_deepening_solve(puzzle, moves=False, symmetry=False,
+                              cache_size=0, hooks=None):
+    """
+    Return a shortest path from PuzzleNode(puzzle) to a PuzzleNode
+    containing a solution, as breadth_first_solve does, or None if there
+    is none, searching depth-first to a depth limit that grows by one
+    until a solution is found. Only the puzzles on the current path are
+    kept, so memory grows with the length of the path rather than the
+    number of puzzles seen.
+
+    If cache_size is more than 0, the keys of up to that many puzzles most
+    recently searched, with how many more moves they were searched to, are
+    kept as well, so that a puzzle reached again by another path is not
+    searched again to no greater depth.
+
+    If moves is True, return the list of moves along the path instead,
+    as given by solution_moves. If symmetry is True, states that are
+    symmetric copies of one another are seen as the same state.
+    If hooks is given, its methods are called as the search goes, as
+    described in search_hooks; a puzzle
+    searched again with a greater depth limit is reported again.
+
+    @type puzzle: Puzzle
+    @type moves: bool
+    @type symmetry: bool
+    @type cache_size: int
+    @type hooks: SearchHooks | None
+    @rtype: PuzzleNode | list | None
+
+    >>> from mn_puzzle import MNPuzzle
+    >>> target_grid = (("1", "2", "3"), ("4", "5", "*"))
+    >>> start_grid = (("5", "4", "*"), ("3", "2", "1"))
+    >>> puzzle = MNPuzzle(start_grid, target_grid)
+    >>> len(iterative_deepening_solve(puzzle, True, cache_size=1000))
+    13
+    >>> from word_ladder_puzzle import WordLadderPuzzle
+    >>> word_set = {"case", "same", "some", "rome", "rose", "rost", "cost"}
+    >>> w = WordLadderPuzzle("same", "cost", word_set)
+    >>> iterative_deepening_solve(w, True)
+    ['some', 'rome', 'rose', 'rost', 'cost']
+    >>> print(iterative_deepening_solve(WordLadderPuzzle("same", "cast",
+    ...                                                  word_set)))
+    None
+    """
+    if moves:
+        return solution_moves(iterative_deepening_solve(puzzle, False,
+                                                        symmetry, cache_size,
+                                                        hooks))
+    if not puzzle.is_solved() and puzzle.fail_fast():
+        # reject unsolvable puzzles before searching at all
+        return None
+    key_of = _canonical_key if symmetry else _state_key
+    limit = 0
+    while True:
+        # cut_off[0] is whether any path was cut short by limit
+        path, cache, cut_off = set(), OrderedDict(), [False]
+        node = _depth_limited_solve(puzzle, limit, key_of, path, cache,
+                                    cache_size, cut_off, hooks, 0)
+        if node is not None:
+            return node
+        if not cut_off[0]:
+            # every puzzle reachable was searched to the end
+            return None
+        limit += 1
+
+
+def _depth_limited_solve(puzzle, depth, key_of, path, cache, cache_size,
+                         cut_off, hooks, made):
+    """
+    Return a path from PuzzleNode(puzzle) to a PuzzleNode containing a
+    solution in at most depth moves that doesn't revisit the puzzles
+    with keys in path, or None if there is none.
+
+    cache maps the keys of up to cache_size puzzles recently searched
+    without finding a solution to the depth they were searched to, most
+    recent last. cut_off[0] is set to True if the search was cut short
+    by depth. hooks, if not None, are told of the search, with made the
+    number of moves to puzzle.
+
+    @type puzzle: Puzzle
+    @type depth: int
+    @type key_of: (Puzzle) -> object
+    @type path: set
+    @type cache: OrderedDict
+    @type cache_size: int
+    @type cut_off: list[bool]
+    @type hooks: SearchHooks | None
+    @type made: int
+    @rtype: PuzzleNode | None
+    """
+    if puzzle.is_solved():
+        if hooks is not None:
+            hooks.on_solution(puzzle, made)
+        return PuzzleNode(puzzle)
+    if depth == 0:
+        cut_off[0] = True
+        return None
+    key = key_of(puzzle)
+    if cache_size > 0 and cache.get(key, -1) >= depth:
+        cache.move_to_end(key)
+        if hooks is not None:
+            hooks.on_duplicate(puzzle, made)
+        return None
+    path.add(key)
+    if hooks is not None:
+        hooks.on_expand(puzzle, made)
+    for config in puzzle.extensions():
+        if hooks is not None:
+            hooks.on_generate(config, made + 1)
+        if key_of(config) in path:
+            if hooks is not None:
+                hooks.on_duplicate(config, made + 1)
+        elif not config.is_solved() and config.fail_fast():
+            if hooks is not None:
+                hooks.on_prune(config, made + 1)
+        else:
+            node = _depth_limited_solve(config, depth - 1, key_of, path,
+                                        cache, cache_size, cut_off, hooks,
+                                        made + 1)
+            if node is not None:
+                main_node = PuzzleNode(puzzle)
+                node.parent = main_node
+                main_node.children.append(node)
+                return main_node
+    path.remove(key)
+    if cache_size > 0:
+        cache[key] = depth
+        cache.move_to_end(key)
+        if len(cache) > cache_size:
+            cache.popitem(last=False)
+    return None
+
+
+def solution_moves(node):
+    """
+    Return the moves, as given by Puzzle.describe_move, along the path
+    of first children from PuzzleNode node, or None if node is None.
+
+    A list of moves is much smaller than the chain of puzzles it stands
+    for; replay rebuilds the puzzles from it.
+
+    @type node: PuzzleNode | None
+    @rtype: list | None
+
+    >>> from word_ladder_puzzle import WordLadderPuzzle
+    >>> word_set = {"case", "same", "some", "rome", "rose", "rost", "cost"}
+    >>> w = WordLadderPuzzle("same", "cost", word_set)
+    >>> solution_moves(breadth_first_solve(w))
+    ['some', 'rome', 'rose', 'rost', 'cost']
+    >>> breadth_first_solve(w, moves=True)
+    ['some', 'rome', 'rose', 'rost', 'cost']
+    """
+    if node is None:
+        return None
+    moves = []
+    while node.children:
+        moves.append(node.puzzle.describe_move(node.children[0].puzzle))
+        node = node.children[0]
+    return moves
+
+
+def replay(puzzle, moves):
+    """
+    Yield puzzle and then each puzzle reached by applying moves to it in
+    turn, building each one only when it is asked for.
+
+    @type puzzle: Puzzle
+    @type moves: list
+    @rtype: generator[Puzzle]
+
+    >>> from mn_puzzle import MNPuzzle
+    >>> target_grid = (("1", "2", "3"), ("4", "5", "*"))
+    >>> start_grid = (("*", "2", "3"), ("1", "4", "5"))
+    >>> path = breadth_first_solve(MNPuzzle(start_grid, target_grid), True)
+    >>> path
+    ['D', 'R', 'R']
+    >>> [p.is_solved() for p in replay(MNPuzzle(start_grid, target_grid),
+    ...                                path)]
+    [False, False, False, True]
+    """
+    yield puzzle
+    for move in moves:
+        puzzle = puzzle.apply_move(move)
+        yield puzzle
+
+
+def _state_key(puzzle):
+    """
+    Return puzzle's key for recognising states already seen.
+
+    @type puzzle: Puzzle
+    @rtype: object
+    """
+    return puzzle.state_key()
+
+
+def _canonical_key(puzzle):
+    """
+    Return puzzle's key for recognising states already seen, shared with
+    its symmetric copies.
+
+    @type puzzle: Puzzle
+    @rtype: object
+    """
+    return puzzle.canonical_key()
+
+
+def _own_heuristic(puzzle):
+    """
+    Return puzzle's own estimate of the moves it still needs.
+
+    @type puzzle: Puzzle
+    @rtype: int
+    """
+    return puzzle.heuristic()
+
+
+def _trace_back(puznode):
+    """
+    Return the root of the chain of parents leading to PuzzleNode puznode,
+    making each parent's only child the next node on the way to puznode.
+
+    @type puznode: PuzzleNode
+    @rtype: PuzzleNode
+    """
+    # in case puznode does not have a parent, it is its parent
+    parent = puznode
+
+    # if it has a parent, trace back to it
+    while puznode.parent:
+        parent = puznode.parent
+        parent.children = [puznode]
+        puznode = parent  # to find the grandparent
+
+    return parent
 
 
 # Class PuzzleNode helps build trees of PuzzleNodes that have
@@ -0,0 +1,510 @@
+"""
+Watching searches as they run
+
+Every solver in puzzle_tools takes a hooks object and calls its methods
+as the search goes, with depth the number of moves from the puzzle the
+search started from:
+
+    on_expand(puzzle, depth)      puzzle is about to be extended
+    on_generate(puzzle, depth)    puzzle was made as an extension
+    on_prune(puzzle, depth)       puzzle was dropped because it fails fast
+    on_duplicate(puzzle, depth)   puzzle was dropped because it was seen
+    on_solution(puzzle, depth)    puzzle is the solution found
+
+A hook may stop the search by raising an exception.
+
+SearchProfile counts these events and writes depth histograms and
+folded stacks, the text format flame graph tools such as flamegraph.pl
+and speedscope read. SampledHooks passes on only one event in so many,
+for hooks too costly to run on every event. StackSampler instead samples
+the Python stack of the thread searching, which shows the methods of
+Puzzle subclasses a search spends its time in without changing either
+the solver or the puzzle.
+"""
+import sys
+import threading
+
+
+class SearchHooks:
+    """
+    Hooks that do nothing, for subclasses to override the ones they need.
+    """
+
+    def on_expand(self, puzzle, depth):
+        """
+        Puzzle puzzle, depth moves from the start, is about to be extended.
+
+        @type self: SearchHooks
+        @type puzzle: Puzzle
+        @type depth: int
+        @rtype: None
+        """
+        pass
+
+    def on_generate(self, puzzle, depth):
+        """
+        Puzzle puzzle, depth moves from the start, was made as an
+        extension.
+
+        @type self: SearchHooks
+        @type puzzle: Puzzle
+        @type depth: int
+        @rtype: None
+        """
+        pass
+
+    def on_prune(self, puzzle, depth):
+        """
+        Puzzle puzzle, depth moves from the start, was dropped because it
+        fails fast.
+
+        @type self: SearchHooks
+        @type puzzle: Puzzle
+        @type depth: int
+        @rtype: None
+        """
+        pass
+
+    def on_duplicate(self, puzzle, depth):
+        """
+        Puzzle puzzle, depth moves from the start, was dropped because it
+        was seen already.
+
+        @type self: SearchHooks
+        @type puzzle: Puzzle
+        @type depth: int
+        @rtype: None
+        """
+        pass
+
+    def on_solution(self, puzzle, depth):
+        """
+        Puzzle puzzle, depth moves from the start, is the solution found.
+
+        @type self: SearchHooks
+        @type puzzle: Puzzle
+        @type depth: int
+        @rtype: None
+        """
+        pass
+
+
+class SampledHooks(SearchHooks):
+    """
+    Hooks passing on one in every so many events of each kind to other
+    hooks, and every solution.
+    """
+
+    def __init__(self, hooks, every):
+        """
+        Create SampledHooks self passing on one in every every events of
+        each kind to hooks, starting with the first.
+
+        @type self: SampledHooks
+        @type hooks: SearchHooks
+        @type every: int
+        @rtype: None
+        """
+        assert every > 0
+        self.hooks, self.every = hooks, every
+        self._expand = self._generate = self._prune = self._duplicate = 0
+
+    def on_expand(self, puzzle, depth):
+        """
+        Pass on one in every self.every expansions.
+
+        @type self: SampledHooks
+        @type puzzle: Puzzle
+        @type depth: int
+        @rtype: None
+        """
+        if self._expand == 0:
+            self.hooks.on_expand(puzzle, depth)
+        self._expand = (self._expand + 1) % self.every
+
+    def on_generate(self, puzzle, depth):
+        """
+        Pass on one in every self.every puzzles generated.
+
+        @type self: SampledHooks
+        @type puzzle: Puzzle
+        @type depth: int
+        @rtype: None
+        """
+        if self._generate == 0:
+            self.hooks.on_generate(puzzle, depth)
+        self._generate = (self._generate + 1) % self.every
+
+    def on_prune(self, puzzle, depth):
+        """
+        Pass on one in every self.every puzzles pruned.
+
+        @type self: SampledHooks
+        @type puzzle: Puzzle
+        @type depth: int
+        @rtype: None
+        """
+        if self._prune == 0:
+            self.hooks.on_prune(puzzle, depth)
+        self._prune = (self._prune + 1) % self.every
+
+    def on_duplicate(self, puzzle, depth):
+        """
+        Pass on one in every self.every duplicates.
+
+        @type self: SampledHooks
+        @type puzzle: Puzzle
+        @type depth: int
+        @rtype: None
+        """
+        if self._duplicate == 0:
+            self.hooks.on_duplicate(puzzle, depth)
+        self._duplicate = (self._duplicate + 1) % self.every
+
+    def on_solution(self, puzzle, depth):
+        """
+        Pass on every solution.
+
+        @type self: SampledHooks
+        @type puzzle: Puzzle
+        @type depth: int
+        @rtype: None
+        """
+        self.hooks.on_solution(puzzle, depth)
+
+
+class SearchProfile(SearchHooks):
+    """
+    Counts of the events of searches, by puzzle class, kind of event and
+    depth.
+    """
+
+    def __init__(self):
+        """
+        Create a SearchProfile self that has counted nothing.
+
+        @type self: SearchProfile
+        @rtype: None
+        """
+        # (puzzle class name, kind of event, depth) -> count
+        self.counts = {}
+
+    def _count(self, puzzle, kind, depth):
+        """
+        Count an event of kind kind for puzzle at depth depth.
+
+        @type self: SearchProfile
+        @type puzzle: Puzzle
+        @type kind: str
+        @type depth: int
+        @rtype: None
+        """
+        key = (type(puzzle).__name__, kind, depth)
+        self.counts[key] = self.counts.get(key, 0) + 1
+
+    def on_expand(self, puzzle, depth):
+        """
+        Count the expansion of puzzle at depth depth.
+
+        @type self: SearchProfile
+        @type puzzle: Puzzle
+        @type depth: int
+        @rtype: None
+        """
+        self._count(puzzle, "expand", depth)
+
+    def on_generate(self, puzzle, depth):
+        """
+        Count puzzle as generated at depth depth.
+
+        @type self: SearchProfile
+        @type puzzle: Puzzle
+        @type depth: int
+        @rtype: None
+        """
+        self._count(puzzle, "generate", depth)
+
+    def on_prune(self, puzzle, depth):
+        """
+        Count puzzle as pruned at depth depth.
+
+        @type self: SearchProfile
+        @type puzzle: Puzzle
+        @type depth: int
+        @rtype: None
+        """
+        self._count(puzzle, "prune", depth)
+
+    def on_duplicate(self, puzzle, depth):
+        """
+        Count puzzle as a duplicate at depth depth.
+
+        @type self: SearchProfile
+        @type puzzle: Puzzle
+        @type depth: int
+        @rtype: None
+        """
+        self._count(puzzle, "duplicate", depth)
+
+    def on_solution(self, puzzle, depth):
+        """
+        Count puzzle as a solution at depth depth.
+
+        @type self: SearchProfile
+        @type puzzle: Puzzle
+        @type depth: int
+        @rtype: None
+        """
+        self._count(puzzle, "solution", depth)
+
+    def total(self, kind):
+        """
+        Return the number of events of kind kind counted.
+
+        @type self: SearchProfile
+        @type kind: str
+        @rtype: int
+        """
+        return sum([n for (_, k, _), n in self.counts.items() if k == kind])
+
+    def histogram(self, kind="expand"):
+        """
+        Return the number of events of kind kind counted at each depth,
+        from 0 to the deepest counted.
+
+        @type self: SearchProfile
+        @type kind: str
+        @rtype: list[int]
+
+        >>> from puzzle_tools import breadth_first_solve
+        >>> from word_ladder_puzzle import WordLadderPuzzle
+        >>> word_set = {"case", "same", "some", "rome", "rose", "rost",
+        ...             "cost"}
+        >>> profile = SearchProfile()
+        >>> breadth_first_solve(WordLadderPuzzle("same", "cost", word_set),
+        ...                     moves=True, hooks=profile)
+        ['some', 'rome', 'rose', 'rost', 'cost']
+        >>> profile.histogram(), profile.histogram("solution")
+        ([1, 1, 1, 1, 1], [0, 0, 0, 0, 0, 1])
+        """
+        depths = [d for (_, k, d) in self.counts if k == kind]
+        found = [0] * (max(depths) + 1 if depths else 0)
+        for (_, k, d), n in self.counts.items():
+            if k == kind:
+                found[d] += n
+        return found
+
+    def format_histogram(self, kind="expand", width=40):
+        """
+        Return the histogram of events of kind kind as lines of depth,
+        count and a bar at most width characters long.
+
+        @type self: SearchProfile
+        @type kind: str
+        @type width: int
+        @rtype: str
+        """
+        found = self.histogram(kind)
+        most = max(found) if found else 0
+        return "\n".join(["{:>5} {:>10} {}".format(
+            d, n, "#" * (n * width // most if most else 0))
+            for d, n in enumerate(found)])
+
+    def folded(self):
+        """
+        Return the counts as folded stacks, one line each, so that a flame
+        graph shows the events of each kind for each puzzle class as a
+        tower with a level for each depth, as wide as the events at that
+        depth and deeper.
+
+        @type self: SearchProfile
+        @rtype: list[str]
+
+        >>> from mn_puzzle import MNPuzzle
+        >>> profile = SearchProfile()
+        >>> profile.on_expand(MNPuzzle((("*", "1"),), (("1", "*"),)), 1)
+        >>> profile.folded()
+        ['MNPuzzle;expand;depth 0;depth 1 1']
+        """
+        return sorted(["{};{};{} {}".format(
+            name, kind, ";".join(["depth {}".format(i)
+                                  for i in range(depth + 1)]), n)
+            for (name, kind, depth), n in self.counts.items()])
+
+    def save_folded(self, path):
+        """
+        Write the folded stacks of this SearchProfile to the file at path.
+
+        @type self: SearchProfile
+        @type path: str
+        @rtype: None
+        """
+        with open(path, "w", encoding="utf-8") as f:
+            f.writelines([line + "\n" for line in self.folded()])
+
+
+def _frame_name(frame):
+    """
+    Return the name of the function running in frame, with its module
+    and class.
+
+    @type frame: frame
+    @rtype: str
+    """
+    code = frame.f_code
+    return "{}:{}".format(frame.f_globals.get("__name__", "?"),
+                          getattr(code, "co_qualname", code.co_name))
+
+
+class StackSampler:
+    """
+    A thread that samples the Python stack of another thread now and then
+    and counts how often each stack is seen.
+
+    Only a thread holding the GIL can look at stacks, so samples are
+    taken at most about as often as sys.getswitchinterval() allows.
+    """
+
+    def __init__(self, interval=0.001, thread=None):
+        """
+        Create a StackSampler self that will sample the thread with
+        identifier thread, or the thread starting it if None, every
+        interval seconds.
+
+        @type self: StackSampler
+        @type interval: float
+        @type thread: int | None
+        @rtype: None
+        """
+        self.interval, self.thread = interval, thread
+        # stacks, as tuples of names from the outermost frame, -> samples
+        self.counts = {}
+        self.samples = 0
+        self._base = self._sampler = None
+        self._stopped = threading.Event()
+
+    def start(self):
+        """
+        Start sampling. When sampling the thread calling this, only frames
+        called from the caller are kept.
+
+        @type self: StackSampler
+        @rtype: None
+        """
+        self._begin(sys._getframe(1))
+
+    def _begin(self, base):
+        """
+        Start sampling, keeping only frames called from frame base if
+        sampling the thread calling this.
+
+        @type self: StackSampler
+        @type base: frame
+        @rtype: None
+        """
+        if self.thread is None:
+            self.thread = threading.get_ident()
+            self._base = base
+        self._stopped.clear()
+        self._sampler = threading.Thread(target=self._run, daemon=True)
+        self._sampler.start()
+
+    def stop(self):
+        """
+        Stop sampling.
+
+        @type self: StackSampler
+        @rtype: None
+        """
+        self._stopped.set()
+        self._sampler.join()
+        self._base = None
+
+    def __enter__(self):
+        """
+        Start sampling the thread entering the with block, keeping only
+        the frames called from the block.
+
+        @type self: StackSampler
+        @rtype: StackSampler
+
+        >>> from mn_puzzle import MNPuzzle
+        >>> from puzzle_tools import breadth_first_solve
+        >>> target_grid = (("1", "2", "3"), ("4", "5", "*"))
+        >>> start_grid = (("5", "4", "*"), ("3", "2", "1"))
+        >>> puzzle = MNPuzzle(start_grid, target_grid)
+        >>> with StackSampler() as sampler:
+        ...     while sampler.samples < 50:
+        ...         _ = breadth_first_solve(puzzle)
+        >>> stacks = sampler.folded()
+        >>> all([s.startswith("puzzle_tools:breadth_first_solve")
+        ...      for s in stacks])
+        True
+        >>> any(["mn_puzzle:MNPuzzle.extensions" in s for s in stacks])
+        True
+        """
+        self._begin(sys._getframe(1))
+        return self
+
+    def __exit__(self, *exc_info):
+        """
+        Stop sampling.
+
+        @type self: StackSampler
+        @rtype: None
+        """
+        self.stop()
+
+    def _run(self):
+        """
+        Sample the stack of self.thread until stopped.
+
+        @type self: StackSampler
+        @rtype: None
+        """
+        while not self._stopped.wait(self.interval):
+            frame = sys._current_frames().get(self.thread)
+            names = []
+            while frame is not None and frame is not self._base:
+                names.append(_frame_name(frame))
+                frame = frame.f_back
+            if names:
+                stack = tuple(reversed(names))
+                self.counts[stack] = self.counts.get(stack, 0) + 1
+                self.samples += 1
+
+    def hottest(self, count=10):
+        """
+        Return up to count of the functions most often found running, with
+        the number of samples each was running in, most first.
+
+        @type self: StackSampler
+        @type count: int
+        @rtype: list[(str, int)]
+        """
+        running = {}
+        for stack, n in self.counts.items():
+            running[stack[-1]] = running.get(stack[-1], 0) + n
+        return sorted(running.items(), key=lambda item: -item[1])[:count]
+
+    def folded(self):
+        """
+        Return the stacks sampled as folded stacks, one line each, for
+        flame graph tools.
+
+        @type self: StackSampler
+        @rtype: list[str]
+        """
+        return sorted(["{} {}".format(";".join(stack), n)
+                       for stack, n in self.counts.items()])
+
+    def save_folded(self, path):
+        """
+        Write the folded stacks of this StackSampler to the file at path.
+
+        @type self: StackSampler
+        @type path: str
+        @rtype: None
+        """
+        with open(path, "w", encoding="utf-8") as f:
+            f.writelines([line + "\n" for line in self.folded()])
@@ -0,0 +1,452 @@
+"""
+A local server that solves puzzles with workers kept warm
+
+Running a module's __main__ for every puzzle pays for starting Python,
+importing the puzzles and loading the words again each time, which for
+small puzzles is most of the time taken. The server starts a pool of
+workers once, each with the words and any pattern databases loaded, and
+answers solve requests read as JSON objects, one per line, from stdin or
+from clients of a Unix socket. Each answer is written as a JSON line as
+soon as its puzzle is solved, so answers may come back in a different
+order from the requests.
+
+A request names the puzzle, how it starts and the solver to use, with
+keyword arguments for the solver in "options":
+
+    {"id": 1, "puzzle": "mn", "from_grid": ["*23", "145"],
+     "to_grid": ["123", "45*"], "solver": "a_star"}
+    {"id": 2, "puzzle": "sudoku", "n": 4, "symbols": "ABCDCDABBADCDCB*",
+     "symbol_set": "ABCD", "solver": "depth_first"}
+    {"id": 3, "puzzle": "peg", "marker": ["**.*"], "solver": "breadth_first"}
+    {"id": 4, "puzzle": "word_ladder", "from_word": "same",
+     "to_word": "cost", "options": {"symmetry": false}}
+
+Rows of grids may be strings of one-character symbols or lists of
+symbols. The answer has the same id, the moves of a solution, or null if
+there is none, and stats on the search:
+
+    {"id": 4, "moves": ["came", ...], "stats": {"seconds": 0.01,
+     "length": 5, "worker": 1234, "expanded": 42, "generated": 300,
+     "pruned": 12, "duplicates": 200}}
+
+or, if the request could not be solved, the error instead of the moves.
+"""
+from grid_peg_solitaire_puzzle import (GridPegSolitairePuzzle,
+                                       meet_in_the_middle_solve)
+from mn_puzzle import MNPuzzle
+from puzzle_tools import (a_star_solve, beam_solve, breadth_first_solve,
+                          depth_first_solve, greedy_best_first_solve,
+                          iterative_deepening_solve)
+from search_hooks import SearchHooks
+from sudoku_puzzle import SudokuPuzzle
+from time import perf_counter
+from word_dictionary import WordDictionary
+from word_ladder_puzzle import WordLadderPuzzle
+import json
+import logging
+import multiprocessing
+import os
+import queue
+import socketserver
+import threading
+
+_logger = logging.getLogger(__name__)
+
+# solvers requests may name
+SOLVERS = {"depth_first": depth_first_solve,
+           "breadth_first": breadth_first_solve,
+           "a_star": a_star_solve,
+           "beam": beam_solve,
+           "greedy_best_first": greedy_best_first_solve,
+           "iterative_deepening": iterative_deepening_solve,
+           "meet_in_the_middle": meet_in_the_middle_solve}
+
+# solvers taking hooks, so that what they do can be counted
+_HOOKED = {"depth_first", "breadth_first", "a_star", "beam",
+           "greedy_best_first", "iterative_deepening"}
+
+# solvers taking a heuristic, given the pattern databases for MNPuzzles
+_INFORMED = {"a_star", "beam", "greedy_best_first"}
+
+# solvers giving the moves together with their length, or None
+_PAIRED = {"beam", "greedy_best_first"}
+
+# what each worker loads once: the words for word ladders and the
+# heuristic from pattern databases for MNPuzzles
+_words = None
+_heuristic = None
+
+
+def _load(words, databases):
+    """
+    Load the words at path words, compiled or not, and the pattern
+    databases at paths databases into this worker, skipping either if
+    None.
+
+    @type words: str | None
+    @type databases: list[str] | None
+    @rtype: None
+    """
+    global _words, _heuristic
+    if words is not None:
+        if words.endswith(".wdb"):
+            _words = WordDictionary.open(words)
+        else:
+            _words = WordDictionary.from_file(words)
+        _words.precompute_components()
+    if databases:
+        from mn_pattern_database import AdditivePatternHeuristic
+        _heuristic = AdditivePatternHeuristic.load(databases)
+
+
+class _Counter(SearchHooks):
+    """
+    Solver hooks counting the puzzles expanded, generated, pruned and
+    dropped as duplicates.
+    """
+
+    def __init__(self):
+        """
+        Create a _Counter self that has counted nothing.
+
+        @type self: _Counter
+        @rtype: None
+        """
+        self.expanded = self.generated = self.pruned = self.duplicates = 0
+
+    def on_expand(self, puzzle, depth):
+        """
+        Count the expansion of puzzle.
+
+        @type self: _Counter
+        @type puzzle: Puzzle
+        @type depth: int
+        @rtype: None
+        """
+        self.expanded += 1
+
+    def on_generate(self, puzzle, depth):
+        """
+        Count puzzle as generated.
+
+        @type self: _Counter
+        @type puzzle: Puzzle
+        @type depth: int
+        @rtype: None
+        """
+        self.generated += 1
+
+    def on_prune(self, puzzle, depth):
+        """
+        Count puzzle as pruned.
+
+        @type self: _Counter
+        @type puzzle: Puzzle
+        @type depth: int
+        @rtype: None
+        """
+        self.pruned += 1
+
+    def on_duplicate(self, puzzle, depth):
+        """
+        Count puzzle as a duplicate.
+
+        @type self: _Counter
+        @type puzzle: Puzzle
+        @type depth: int
+        @rtype: None
+        """
+        self.duplicates += 1
+
+
+def _grid(rows):
+    """
+    Return rows, each a string or list of symbols, as a tuple of tuples.
+
+    @type rows: list[str | list[str]]
+    @rtype: tuple[tuple[str]]
+    """
+    return tuple([tuple(row) for row in rows])
+
+
+def _puzzle(request):
+    """
+    Return the puzzle described by request.
+
+    @type request: dict
+    @rtype: Puzzle
+    """
+    kind = request["puzzle"]
+    if kind == "mn":
+        return MNPuzzle(_grid(request["from_grid"]),
+                        _grid(request["to_grid"]))
+    elif kind == "sudoku":
+        return SudokuPuzzle(request["n"], list(request["symbols"]),
+                            set(request["symbol_set"]))
+    elif kind == "peg":
+        target = request.get("target")
+        return GridPegSolitairePuzzle(
+            [list(row) for row in request["marker"]],
+            set(request.get("marker_set", "*.#")),
+            None if target is None else [list(row) for row in target])
+    elif kind == "word_ladder":
+        words = request.get("words", _words)
+        if words is None:
+            raise ValueError("no words loaded for word ladders")
+        return WordLadderPuzzle(request["from_word"], request["to_word"],
+                                words)
+    raise ValueError("unknown puzzle {!r}".format(kind))
+
+
+def _solve(request):
+    """
+    Return the answer to request, solving its puzzle in this worker.
+
+    @type request: dict
+    @rtype: dict
+    """
+    answer = {"id": request.get("id")}
+    try:
+        name = request.get("solver", "breadth_first")
+        if name not in SOLVERS:
+            raise ValueError("unknown solver {!r}".format(name))
+        puzzle = _puzzle(request)
+        options = dict(request.get("options", {}))
+        options["moves"] = True
+        counter = None
+        if name in _HOOKED:
+            counter = options["hooks"] = _Counter()
+        if (name in _INFORMED and "heuristic" not in options and
+                _heuristic is not None and isinstance(puzzle, MNPuzzle) and
+                puzzle.to_grid == _heuristic.to_grid):
+            options["heuristic"] = _heuristic
+        start = perf_counter()
+        moves = SOLVERS[name](puzzle, **options)
+        seconds = perf_counter() - start
+        if name in _PAIRED:
+            moves = None if moves is None else moves[0]
+    except Exception as error:
+        answer["error"] = "{}: {}".format(type(error).__name__, error)
+        return answer
+    answer["moves"] = moves
+    answer["stats"] = {"seconds": seconds,
+                       "length": None if moves is None else len(moves),
+                       "worker": os.getpid()}
+    if counter is not None:
+        answer["stats"].update({"expanded": counter.expanded,
+                                "generated": counter.generated,
+                                "pruned": counter.pruned,
+                                "duplicates": counter.duplicates})
+    return answer
+
+
+class SolverDaemon:
+    """
+    A pool of warm workers answering solve requests.
+    """
+
+    def __init__(self, workers=None, words=None, databases=None):
+        """
+        Create a SolverDaemon self with workers worker processes, or one
+        per CPU if None, each loading the words at path words and the
+        MNPuzzle pattern databases at paths databases, if given.
+
+        @type self: SolverDaemon
+        @type workers: int | None
+        @type words: str | None
+        @type databases: list[str] | None
+        @rtype: None
+        """
+        self._pool = multiprocessing.Pool(workers, _load, (words, databases))
+
+    def submit(self, request, respond):
+        """
+        Solve request in a worker, then call respond with the answer.
+
+        respond is called from the pool's own thread, which hands back
+        every answer, so it must return quickly and never raise.
+
+        @type self: SolverDaemon
+        @type request: dict
+        @type respond: (dict) -> None
+        @rtype: multiprocessing.pool.AsyncResult
+        """
+        def failed(error):
+            respond({"id": request.get("id"),
+                     "error": "{}: {}".format(type(error).__name__, error)})
+
+        return self._pool.apply_async(_solve, (request,), callback=respond,
+                                      error_callback=failed)
+
+    def serve(self, lines, write):
+        """
+        Answer the requests in lines, calling write with each answer as a
+        JSON line as soon as it is ready, until lines run out and every
+        request has been answered.
+
+        write is called from a thread of its own, so a reader that is slow
+        or gone never holds up the pool. If write raises OSError, as it
+        does once a client has disconnected, the error is logged and the
+        rest of the answers are dropped.
+
+        @type self: SolverDaemon
+        @type lines: iterable[str]
+        @type write: (str) -> None
+        @rtype: None
+
+        >>> daemon = SolverDaemon(1)
+        >>> requests = [
+        ...     '{"id": 1, "puzzle": "word_ladder", "from_word": "same", '
+        ...     '"to_word": "cost", "words": ["case", "same", "some", '
+        ...     '"rome", "rose", "rost", "cost"]}',
+        ...     '{"id": 2, "puzzle": "mn", "from_grid": ["*23", "145"], '
+        ...     '"to_grid": ["123", "45*"], "solver": "a_star"}',
+        ...     '{"id": 3, "puzzle": "sudoku", "n": 4, "solver": '
+        ...     '"depth_first", "symbols": "ABCDCDABBADCDCB*", '
+        ...     '"symbol_set": "ABCD"}',
+        ...     '{"id": 4, "puzzle": "peg", "marker": ["**.*"]}',
+        ...     '{"id": 5, "puzzle": "chess"}', 'not json',
+        ...     '{"id": 6, "puzzle": "mn", "from_grid": ["*23", "145"], '
+        ...     '"to_grid": ["123", "45*"], "solver": "greedy_best_first"}']
+        >>> answers = []
+        >>> daemon.serve(requests, answers.append)
+        >>> daemon.close()
+        >>> for answer in sorted([json.loads(a) for a in answers],
+        ...                      key=lambda a: str(a["id"])):
+        ...     print(answer["id"], answer.get("moves", answer.get("error")),
+        ...           answer.get("stats", {}).get("length"))
+        1 ['some', 'rome', 'rose', 'rost', 'cost'] 5
+        2 ['D', 'R', 'R'] 3
+        3 [[15, 'A']] 1
+        4 [[[0, 0], [0, 1], [0, 2]], [[0, 3], [0, 2], [0, 1]]] 2
+        5 ValueError: unknown puzzle 'chess' None
+        6 ['D', 'R', 'R'] 3
+        None JSONDecodeError: Expecting value: line 1 column 1 (char 0) None
+        >>> def hung_up(line):
+        ...     raise BrokenPipeError(32, "Broken pipe")
+        >>> daemon = SolverDaemon(1)
+        >>> logging.disable(logging.ERROR)
+        >>> daemon.serve(requests, hung_up)
+        >>> logging.disable(logging.NOTSET)
+        >>> answers = []
+        >>> daemon.serve(requests[:2], answers.append)
+        >>> daemon.close()
+        >>> len(answers)
+        2
+        """
+        # answers waiting to be written, then None once there are no more
+        answers = queue.Queue()
+
+        def writer():
+            while True:
+                answer = answers.get()
+                if answer is None:
+                    return
+                try:
+                    write(json.dumps(answer) + "\n")
+                except OSError:
+                    _logger.exception("stopped writing answers at id %r",
+                                      answer.get("id"))
+                    # drain the rest, so that nothing is left waiting
+                    while answers.get() is not None:
+                        pass
+                    return
+                except Exception:
+                    _logger.exception("can't write the answer with id %r",
+                                      answer.get("id"))
+
+        thread = threading.Thread(target=writer, daemon=True)
+        thread.start()
+        try:
+            pending = []
+            for line in lines:
+                if not line.strip():
+                    continue
+                try:
+                    request = json.loads(line)
+                    if not isinstance(request, dict):
+                        raise ValueError("a request must be a JSON object")
+                except ValueError as error:
+                    answers.put({"id": None,
+                                 "error": "{}: {}".format(
+                                     type(error).__name__, error)})
+                    continue
+                pending.append(self.submit(request, answers.put))
+            for result in pending:
+                # an answer is queued before its result is ready
+                result.wait()
+        finally:
+            answers.put(None)
+            thread.join()
+
+    def serve_socket(self, path):
+        """
+        Answer requests from every client connecting to the Unix socket at
+        path, each on its own connection, until interrupted.
+
+        @type self: SolverDaemon
+        @type path: str
+        @rtype: None
+        """
+        daemon = self
+
+        class Handler(socketserver.StreamRequestHandler):
+            def handle(self):
+                daemon.serve((line.decode("utf-8") for line in self.rfile),
+                             lambda line: self.wfile.write(
+                                 line.encode("utf-8")))
+
+        if os.path.exists(path):
+            os.unlink(path)
+        with socketserver.ThreadingUnixStreamServer(path, Handler) as server:
+            try:
+                server.serve_forever()
+            finally:
+                os.unlink(path)
+
+    def close(self):
+        """
+        Stop the workers of SolverDaemon self once they finish what they
+        are solving.
+
+        @type self: SolverDaemon
+        @rtype: None
+        """
+        self._pool.close()
+        self._pool.join()
+
+
+if __name__ == "__main__":
+    # no doctests here: their output would be mixed into the answers
+    import argparse
+    import sys
+    parser = argparse.ArgumentParser(
+        description="Answer JSON-lines solve requests from stdin, or from "
+                    "a Unix socket, with a pool of warm workers.")
+    parser.add_argument("--socket", default=None,
+                        help="Unix socket to listen on instead of stdin")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="worker processes, one per CPU by default")
+    parser.add_argument("--words", default=None,
+                        help="words for word ladders, words.wdb if "
+                             "compiled or words otherwise")
+    parser.add_argument("--databases", nargs="*", default=None,
+                        help="MNPuzzle pattern databases for a_star, beam "
+                             "and greedy_best_first")
+    args = parser.parse_args()
+    words = args.words
+    if words is None:
+        words = "words.wdb" if os.path.exists("words.wdb") else "words"
+    daemon = SolverDaemon(args.workers, words, args.databases)
+    try:
+        if args.socket is not None:
+            daemon.serve_socket(args.socket)
+        else:
+            def write(line):
+                sys.stdout.write(line)
+                sys.stdout.flush()
+            daemon.serve(sys.stdin, write)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        daemon.close()
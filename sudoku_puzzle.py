@@ -1,4 +1,28 @@
 from puzzle import Puzzle
+from zobrist import zobrist_keys
+
+# Zobrist keys of each symbol in each position, shared by every
+# SudokuPuzzle with the same n and symbol_set
+_zobrist_tables = {}
+
+
+def _zobrist_table(n, symbol_set):
+    """
+    Return the Zobrist keys for nxn SudokuPuzzles over symbol_set, as a
+    dict from each symbol to its key in each position. An open position
+    has no key.
+
+    @type n: int
+    @type symbol_set: set[str]
+    @rtype: dict[str, list[int]]
+    """
+    key = (n, frozenset(symbol_set))
+    if key not in _zobrist_tables:
+        keys = zobrist_keys(n ** 2 * len(symbol_set))
+        _zobrist_tables[key] = {
+            d: keys[k * n ** 2:(k + 1) * n ** 2]
+            for k, d in enumerate(sorted(symbol_set))}
+    return _zobrist_tables[key]
 
 
 class SudokuPuzzle(Puzzle):
@@ -25,6 +49,29 @@ class SudokuPuzzle(Puzzle):
         assert len(symbol_set) == n
         assert len(symbols) == n ** 2
         self._n, self._symbols, self._symbol_set = n, symbols, symbol_set
+        self._table = _zobrist_table(n, symbol_set)
+        self._zobrist = 0
+        for i, d in enumerate(symbols):
+            if d != "*":
+                self._zobrist ^= self._table[d][i]
+
+    def _placed(self, i, d):
+        """
+        Return a new SudokuPuzzle like self with symbol d placed in open
+        position i, updating the Zobrist hash rather than building it
+        again.
+
+        @type self: SudokuPuzzle
+        @type i: int
+        @type d: str
+        @rtype: SudokuPuzzle
+        """
+        puzzle = self.__class__.__new__(self.__class__)
+        puzzle._n, puzzle._symbol_set = self._n, self._symbol_set
+        puzzle._symbols = self._symbols[:i] + [d] + self._symbols[i + 1:]
+        puzzle._table = self._table
+        puzzle._zobrist = self._zobrist ^ self._table[d][i]
+        return puzzle
 
     def __eq__(self, other):
         """
@@ -58,6 +105,123 @@ class SudokuPuzzle(Puzzle):
                 self._n == other._n and self._symbols == other._symbols and
                 self._symbol_set == other._symbol_set)
 
+    def __reduce__(self):
+        """
+        Return how to pickle SudokuPuzzle self: by what it was created
+        from, so that unpickling it shares the Zobrist keys of puzzles
+        like it.
+
+        @type self: SudokuPuzzle
+        @rtype: tuple
+
+        >>> import pickle
+        >>> grid = ["A", "B", "C", "D"]
+        >>> grid += ["C", "D", "A", "B"]
+        >>> grid += ["B", "A", "D", "C"]
+        >>> grid += ["D", "C", "B", "*"]
+        >>> s = SudokuPuzzle(4, grid, {"A", "B", "C", "D"})
+        >>> pickle.loads(pickle.dumps(s)) == s
+        True
+        """
+        return SudokuPuzzle, (self._n, self._symbols, self._symbol_set)
+
+    def __hash__(self):
+        """
+        Return the Zobrist hash of SudokuPuzzle self, kept up to date as
+        symbols are placed.
+
+        @type self: SudokuPuzzle
+        @rtype: int
+
+        >>> grid = ["A", "B", "C", "D"]
+        >>> grid += ["C", "D", "A", "B"]
+        >>> grid += ["B", "A", "D", "C"]
+        >>> grid += ["D", "C", "B", "*"]
+        >>> s = SudokuPuzzle(4, grid, {"A", "B", "C", "D"}).extensions()[0]
+        >>> grid = grid[:-1] + ["A"]
+        >>> hash(s) == hash(SudokuPuzzle(4, grid, {"A", "B", "C", "D"}))
+        True
+        """
+        return self._zobrist
+
+    def state_key(self):
+        """
+        Overrides Puzzle.state_key()
+
+        Return SudokuPuzzle self itself, so that sets of seen states
+        compare Zobrist hashes first and whole grids only when two hashes
+        match.
+
+        @type self: SudokuPuzzle
+        @rtype: SudokuPuzzle
+        """
+        return self
+
+    def context(self):
+        """
+        Overrides Puzzle.context()
+
+        Return what every SudokuPuzzle reached from SudokuPuzzle self
+        shares: n, symbol_set, and "*" followed by the symbols of
+        symbol_set in order, whose positions code them in to_bytes.
+
+        @type self: SudokuPuzzle
+        @rtype: (int, set[str], tuple[str])
+        """
+        return (self._n, self._symbol_set,
+                ("*",) + tuple(sorted(self._symbol_set)))
+
+    def to_bytes(self):
+        """
+        Overrides Puzzle.to_bytes()
+
+        Return a byte for each position of SudokuPuzzle self: 0 if it is
+        open, otherwise the position of its symbol in context()[2].
+
+        @type self: SudokuPuzzle
+        @rtype: bytes
+
+        >>> grid = ["A", "B", "C", "D"]
+        >>> grid += ["C", "D", "A", "B"]
+        >>> grid += ["B", "A", "D", "C"]
+        >>> grid += ["D", "C", "B", "*"]
+        >>> s = SudokuPuzzle(4, grid, {"A", "B", "C", "D"})
+        >>> data = s.to_bytes()
+        >>> list(data)
+        [1, 2, 3, 4, 3, 4, 1, 2, 2, 1, 4, 3, 4, 3, 2, 0]
+        >>> copy = SudokuPuzzle.from_bytes(data, s.context())
+        >>> copy == s, hash(copy) == hash(s)
+        (True, True)
+        """
+        codes = {"*": 0}
+        for c, d in enumerate(sorted(self._symbol_set)):
+            codes[d] = c + 1
+        return bytes([codes[d] for d in self._symbols])
+
+    @classmethod
+    def from_bytes(cls, data, context):
+        """
+        Overrides Puzzle.from_bytes()
+
+        Return the SudokuPuzzle whose to_bytes gave data, given its
+        context().
+
+        @type cls: type
+        @type data: bytes
+        @type context: (int, set[str], tuple[str])
+        @rtype: SudokuPuzzle
+        """
+        n, symbol_set, order = context
+        puzzle = cls.__new__(cls)
+        puzzle._n, puzzle._symbol_set = n, symbol_set
+        puzzle._symbols = [order[c] for c in data]
+        puzzle._table = _zobrist_table(n, symbol_set)
+        puzzle._zobrist = 0
+        for i, c in enumerate(data):
+            if c:
+                puzzle._zobrist ^= puzzle._table[order[c]][i]
+        return puzzle
+
     def __str__(self):
         """
         Return a human-readable string representation of SudokuPuzzle self.
@@ -179,10 +343,47 @@ class SudokuPuzzle(Puzzle):
                                 self._column_set(i) |
                                 self._subsquare_set(i)))
             # list of SudokuPuzzles with each legal digit at position i
-            return (
-                [SudokuPuzzle(n,
-                              symbols[:i] + [d] + symbols[i + 1:], symbol_set)
-                 for d in allowed_symbols])
+            return [self._placed(i, d) for d in allowed_symbols]
+
+    def describe_move(self, extension):
+        """
+        Overrides Puzzle.describe_move()
+
+        Return the move from SudokuPuzzle self to extension as the position
+        filled in and the symbol placed there.
+
+        @type self: SudokuPuzzle
+        @type extension: SudokuPuzzle
+        @rtype: (int, str)
+
+        >>> grid = ["A", "B", "C", "D"]
+        >>> grid += ["C", "D", "A", "B"]
+        >>> grid += ["B", "A", "D", "C"]
+        >>> grid += ["D", "C", "B", "*"]
+        >>> s = SudokuPuzzle(4, grid, {"A", "B", "C", "D"})
+        >>> s.describe_move(s.extensions()[0])
+        (15, 'A')
+        >>> s.apply_move((15, "A")).is_solved()
+        True
+        """
+        i = self._symbols.index("*")
+        return i, extension._symbols[i]
+
+    def apply_move(self, move):
+        """
+        Overrides Puzzle.apply_move()
+
+        Return SudokuPuzzle self with the symbol of move placed in the
+        open position of move.
+
+        @type self: SudokuPuzzle
+        @type move: (int, str)
+        @rtype: SudokuPuzzle
+        """
+        i, d = move
+        if self._symbols[i] != "*" or d not in self._symbol_set:
+            raise ValueError("can't place {} at {} in\n{}".format(d, i, self))
+        return self._placed(i, d)
 
     def fail_fast(self):
         """
@@ -0,0 +1,573 @@
+"""
+A shared, read-only dictionary of words for word ladders
+"""
+from array import array
+from collections import deque
+from weakref import WeakValueDictionary
+import json
+import mmap
+import os
+import sys
+import threading
+
+# first line of every compiled dictionary, followed by a line of json
+_MAGIC = b"wordsdb 1\n"
+
+# letters a word ladder may change a character to
+LETTERS = "abcdefghijklmnopqrstuvwxyz"
+
+# the one WordDictionary for each set of words in use
+_interned = WeakValueDictionary()
+
+
+class WordDictionary:
+    """
+    An immutable set of words, split by length, with the words one letter
+    apart from each word looked up through wildcard patterns.
+
+    There is only ever one WordDictionary for a given set of words, made
+    by WordDictionary.intern, so dictionaries are compared by identity.
+    """
+
+    def __init__(self, words):
+        """
+        Create a new WordDictionary self of words.
+
+        Use WordDictionary.intern rather than calling this directly.
+
+        @type self: WordDictionary
+        @type words: frozenset[str]
+        @rtype: None
+        """
+        self._words = words
+        by_length = {}
+        for word in words:
+            by_length.setdefault(len(word), set()).add(word)
+        self._by_length = {length: frozenset(group)
+                           for length, group in by_length.items()}
+        # words fitting each wildcard pattern such as "c*st", in
+        # alphabetical order, built one word length at a time
+        self._buckets = {}
+        self._indexed = set()
+        # neighbours of each word looked up so far
+        self._neighbours = {}
+        # connected component of each word, labelled one length at a time
+        self._components = {}
+        self._labelled = set()
+        # held while labelling, so that threads sharing self never give
+        # two components the same number
+        self._labelling = threading.Lock()
+
+    @staticmethod
+    def intern(words):
+        """
+        Return the WordDictionary of words, creating it only if no
+        WordDictionary of exactly these words is in use.
+
+        @type words: set[str] | frozenset[str] | WordDictionary
+        @rtype: WordDictionary
+
+        >>> d1 = WordDictionary.intern({"on", "no", "oo"})
+        >>> d2 = WordDictionary.intern({"oo", "no", "on"})
+        >>> d1 is d2
+        True
+        >>> d1 is WordDictionary.intern({"on", "no"})
+        False
+        """
+        if isinstance(words, WordDictionary):
+            return words
+        words = frozenset(words)
+        dictionary = _interned.get(words)
+        if dictionary is None:
+            dictionary = WordDictionary(words)
+            _interned[words] = dictionary
+        return dictionary
+
+    @staticmethod
+    def from_file(path):
+        """
+        Return the WordDictionary of the whitespace-separated words in the
+        file at path.
+
+        @type path: str
+        @rtype: WordDictionary
+        """
+        with open(path, encoding="utf-8") as f:
+            return WordDictionary.intern(f.read().split())
+
+    @staticmethod
+    def open(path):
+        """
+        Return the CompiledWordDictionary at path, opening it only if it isn't
+        already open.
+
+        @type path: str
+        @rtype: CompiledWordDictionary
+
+        >>> import tempfile
+        >>> path = os.path.join(tempfile.mkdtemp(), "words.wdb")
+        >>> compile_dictionary({"cast", "cost", "cyst", "most", "a"}, path)
+        >>> d = WordDictionary.open(path)
+        >>> d is WordDictionary.open(path), len(d), "cyst" in d, "cyan" in d
+        (True, 5, True, False)
+        >>> d.neighbours("cost"), d.neighbours("bost")
+        (['most', 'cast', 'cyst'], ['cost', 'most'])
+        """
+        key = ("compiled", os.path.realpath(path))
+        dictionary = _interned.get(key)
+        if dictionary is None:
+            dictionary = CompiledWordDictionary(path)
+            _interned[key] = dictionary
+        return dictionary
+
+    def __reduce__(self):
+        """
+        Return how to pickle WordDictionary self, so that unpickling it
+        gives back the interned dictionary of the same words.
+
+        @type self: WordDictionary
+        @rtype: tuple
+
+        >>> import pickle
+        >>> d = WordDictionary.intern({"on", "no", "oo"})
+        >>> pickle.loads(pickle.dumps(d)) is d
+        True
+        """
+        return WordDictionary.intern, (self._words,)
+
+    def __contains__(self, word):
+        """
+        Return whether word is in WordDictionary self.
+
+        @type self: WordDictionary
+        @type word: str
+        @rtype: bool
+
+        >>> "no" in WordDictionary.intern({"on", "no", "oo"})
+        True
+        """
+        return word in self._by_length.get(len(word), ())
+
+    def __len__(self):
+        """
+        Return the number of words in WordDictionary self.
+
+        @type self: WordDictionary
+        @rtype: int
+        """
+        return len(self._words)
+
+    def __iter__(self):
+        """
+        Return an iterator over the words in WordDictionary self.
+
+        @type self: WordDictionary
+        @rtype: iterator[str]
+        """
+        return iter(self._words)
+
+    def __repr__(self):
+        """
+        Return a short description of WordDictionary self.
+
+        @type self: WordDictionary
+        @rtype: str
+
+        >>> WordDictionary.intern({"on", "no", "oo"})
+        <WordDictionary of 3 words>
+        """
+        return "<WordDictionary of {} words>".format(len(self._words))
+
+    def words(self, length):
+        """
+        Return the words of WordDictionary self with length letters.
+
+        @type self: WordDictionary
+        @type length: int
+        @rtype: frozenset[str]
+        """
+        return self._by_length.get(length, frozenset())
+
+    def _index_length(self, length):
+        """
+        Add every word of length length to the buckets of the wildcard
+        patterns it fits, where only letters in LETTERS may be wild.
+
+        @type self: WordDictionary
+        @type length: int
+        @rtype: None
+        """
+        buckets = {}
+        for word in self.words(length):
+            for i in range(length):
+                if word[i] in LETTERS:
+                    pattern = word[:i] + "*" + word[i + 1:]
+                    buckets.setdefault(pattern, []).append(word)
+        for pattern in buckets:
+            buckets[pattern].sort()
+        self._buckets.update(buckets)
+        self._indexed.add(length)
+
+    def neighbours(self, word):
+        """
+        Return the words of WordDictionary self that can be reached from
+        word by changing the letter in one position to one in LETTERS,
+        ordered by that position and then alphabetically.
+
+        @type self: WordDictionary
+        @type word: str
+        @rtype: list[str]
+
+        >>> d = WordDictionary.intern({"cast", "cost", "cyst", "most"})
+        >>> d.neighbours("cost")
+        ['most', 'cast', 'cyst']
+        >>> d.neighbours("bost")
+        ['cost', 'most']
+        """
+        if word not in self._neighbours:
+            if len(word) not in self._indexed:
+                self._index_length(len(word))
+            found = []
+            for i in range(len(word)):
+                for w in self._buckets.get(word[:i] + "*" + word[i + 1:], []):
+                    if w != word:
+                        found.append(w)
+            self._neighbours[word] = found
+        return self._neighbours[word]
+
+    def _label_components(self, length):
+        """
+        Label every word of length length with the number of the connected
+        component it belongs to in the graph joining neighbouring words,
+        by a breadth-first search from each word not yet labelled, unless
+        another thread has labelled them already.
+
+        @type self: WordDictionary
+        @type length: int
+        @rtype: None
+        """
+        with self._labelling:
+            if length in self._labelled:
+                return
+            # labelled apart from self._components until done, so that
+            # component never finds a length half labelled
+            components, label = {}, len(self._components)
+            for word in sorted(self.words(length)):
+                if word not in components:
+                    components[word] = label
+                    q = deque([word])
+                    while q:
+                        for w in self.neighbours(q.popleft()):
+                            if w not in components:
+                                components[w] = label
+                                q.append(w)
+                    label += 1
+            self._components.update(components)
+            self._labelled.add(length)
+
+    def precompute_components(self):
+        """
+        Label the connected components of the words of every length now,
+        rather than one length at a time as they are first asked for.
+
+        @type self: WordDictionary
+        @rtype: None
+        """
+        for length in self._by_length:
+            if length not in self._labelled:
+                self._label_components(length)
+
+    def component(self, word):
+        """
+        Return the number of the connected component of word among the
+        words of its length, where words are joined when one is a
+        neighbour of the other, or None if word isn't in self.
+
+        Two words of the same length are joined by a ladder exactly when
+        their components are the same.
+
+        @type self: WordDictionary
+        @type word: str
+        @rtype: int | None
+
+        >>> d = WordDictionary.intern({"cast", "cost", "most", "mild", "mind"})
+        >>> d.component("cast") == d.component("most")
+        True
+        >>> d.component("cast") == d.component("mind")
+        False
+        >>> d.component("cyst") is None
+        True
+        """
+        if word not in self:
+            return None
+        if len(word) not in self._labelled:
+            self._label_components(len(word))
+        return self._components[word]
+
+
+class CompiledWordDictionary(WordDictionary):
+    """
+    A WordDictionary read straight from a file written by
+    compile_dictionary, memory-mapped so that nothing is rebuilt on
+    opening it and every process opening the file shares its pages.
+
+    For each word length the file holds the words sorted and padded to a
+    common width, so a word is found by binary search, the neighbours of
+    each word as a list of word numbers and the connected component of
+    each word.
+    """
+
+    def __init__(self, path):
+        """
+        Open the compiled dictionary at path.
+
+        Use WordDictionary.open rather than calling this directly.
+
+        @type self: CompiledWordDictionary
+        @type path: str
+        @rtype: None
+        """
+        self._path = path
+        with open(path, "rb") as f:
+            self._data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        data = self._data
+        assert data[:len(_MAGIC)] == _MAGIC, "not a compiled dictionary"
+        end = data.find(b"\n", len(_MAGIC))
+        header = json.loads(data[len(_MAGIC):end].decode("utf-8"))
+        assert header["byteorder"] == sys.byteorder
+        body = end + 1
+        view = memoryview(data)[body:]
+        self._count, self._sections = header["count"], {}
+        for length, section in header["lengths"].items():
+            count = section["count"]
+            self._sections[int(length)] = (
+                section["width"], count, body + section["words"],
+                view[section["offsets"]:
+                     section["offsets"] + 4 * (count + 1)].cast("I"),
+                view[section["neighbours"]:
+                     section["neighbours"] + 4 * section["links"]].cast("I"),
+                view[section["components"]:
+                     section["components"] + 4 * count].cast("I"))
+        self._by_length = {}
+        self._neighbours = {}
+
+    def __reduce__(self):
+        """
+        Return how to pickle CompiledWordDictionary self: by its path.
+
+        @type self: CompiledWordDictionary
+        @rtype: tuple
+        """
+        return WordDictionary.open, (self._path,)
+
+    def _find(self, word):
+        """
+        Return the number of word among the words of its length, or -1 if
+        it isn't in CompiledWordDictionary self.
+
+        @type self: CompiledWordDictionary
+        @type word: str
+        @rtype: int
+        """
+        section = self._sections.get(len(word))
+        if section is None:
+            return -1
+        width, count, start = section[:3]
+        key = word.encode("utf-8").ljust(width, b"\0")
+        if len(key) > width:
+            return -1
+        data = self._data
+        low, high = 0, count
+        while low < high:
+            middle = (low + high) // 2
+            at = start + middle * width
+            if data[at:at + width] < key:
+                low = middle + 1
+            else:
+                high = middle
+        at = start + low * width
+        if low < count and data[at:at + width] == key:
+            return low
+        return -1
+
+    def _word(self, length, number):
+        """
+        Return word number number among the words of length length.
+
+        @type self: CompiledWordDictionary
+        @type length: int
+        @type number: int
+        @rtype: str
+        """
+        width, _, start = self._sections[length][:3]
+        at = start + number * width
+        return self._data[at:at + width].rstrip(b"\0").decode("utf-8")
+
+    def __contains__(self, word):
+        """
+        Return whether word is in CompiledWordDictionary self.
+
+        @type self: CompiledWordDictionary
+        @type word: str
+        @rtype: bool
+        """
+        return self._find(word) >= 0
+
+    def __len__(self):
+        """
+        Return the number of words in CompiledWordDictionary self.
+
+        @type self: CompiledWordDictionary
+        @rtype: int
+        """
+        return self._count
+
+    def __iter__(self):
+        """
+        Return an iterator over the words in CompiledWordDictionary self.
+
+        @type self: CompiledWordDictionary
+        @rtype: iterator[str]
+        """
+        return (word for length in sorted(self._sections)
+                for word in self.words(length))
+
+    def __repr__(self):
+        """
+        Return a short description of CompiledWordDictionary self.
+
+        @type self: CompiledWordDictionary
+        @rtype: str
+        """
+        return "<CompiledWordDictionary of {} words from {}>".format(
+            self._count, self._path)
+
+    def words(self, length):
+        """
+        Return the words of CompiledWordDictionary self with length
+        letters, decoding them the first time they are asked for.
+
+        @type self: CompiledWordDictionary
+        @type length: int
+        @rtype: frozenset[str]
+        """
+        if length not in self._by_length:
+            count = self._sections[length][1] if length in self._sections else 0
+            self._by_length[length] = frozenset(
+                [self._word(length, i) for i in range(count)])
+        return self._by_length[length]
+
+    def neighbours(self, word):
+        """
+        Return the words of CompiledWordDictionary self that can be reached
+        from word by changing the letter in one position to one in LETTERS,
+        ordered by that position and then alphabetically.
+
+        @type self: CompiledWordDictionary
+        @type word: str
+        @rtype: list[str]
+        """
+        if word not in self._neighbours:
+            number = self._find(word)
+            if number >= 0:
+                offsets, links = self._sections[len(word)][3:5]
+                found = [self._word(len(word), i)
+                         for i in links[offsets[number]:offsets[number + 1]]]
+            else:
+                # not stored, so try every letter in every position
+                found = []
+                for i in range(len(word)):
+                    for c in LETTERS:
+                        w = word[:i] + c + word[i + 1:]
+                        if w != word and w in self:
+                            found.append(w)
+            self._neighbours[word] = found
+        return self._neighbours[word]
+
+    def precompute_components(self):
+        """
+        Do nothing: components were labelled when the file was compiled.
+
+        @type self: CompiledWordDictionary
+        @rtype: None
+        """
+
+    def component(self, word):
+        """
+        Return the number of the connected component of word among the
+        words of its length, as labelled when the file was compiled, or
+        None if word isn't in self.
+
+        @type self: CompiledWordDictionary
+        @type word: str
+        @rtype: int | None
+        """
+        number = self._find(word)
+        if number < 0:
+            return None
+        return self._sections[len(word)][5][number]
+
+
+def compile_dictionary(words, path):
+    """
+    Write words, an iterable of words or a WordDictionary, to path in the
+    format read by WordDictionary.open, including the neighbours and
+    connected component of every word.
+
+    @type words: iterable[str] | WordDictionary
+    @type path: str
+    @rtype: None
+    """
+    dictionary = WordDictionary.intern(words)
+    header = {"count": len(dictionary), "byteorder": sys.byteorder,
+              "lengths": {}}
+    body, offset = [], 0
+    for length in sorted(dictionary._by_length):
+        group = sorted([w.encode("utf-8") for w in dictionary.words(length)])
+        width = max([len(b) for b in group])
+        number = {b.decode("utf-8"): i for i, b in enumerate(group)}
+        offsets, links = array("I", [0]), array("I")
+        components = array("I")
+        for b in group:
+            links.extend([number[w]
+                          for w in dictionary.neighbours(b.decode("utf-8"))])
+            offsets.append(len(links))
+            components.append(dictionary.component(b.decode("utf-8")))
+        parts = [b"".join([b.ljust(width, b"\0") for b in group]),
+                 offsets.tobytes(), links.tobytes(), components.tobytes()]
+        section = {"count": len(group), "width": width, "links": len(links)}
+        for name, part in zip(["words", "offsets", "neighbours",
+                               "components"], parts):
+            # keep the 4-byte arrays aligned relative to the body
+            padding = -offset % 4
+            body.append(b"\0" * padding)
+            section[name] = offset + padding
+            body.append(part)
+            offset += padding + len(part)
+        header["lengths"][length] = section
+    # offsets in the header count from the start of the body, which the
+    # header line is padded to start 4-byte aligned
+    line = json.dumps(header).encode("utf-8")
+    line += b" " * (-(len(_MAGIC) + len(line) + 1) % 4)
+    with open(path, "wb") as f:
+        f.write(_MAGIC + line + b"\n")
+        f.write(b"".join(body))
+
+
+if __name__ == "__main__":
+    import doctest
+    doctest.testmod()
+    import argparse
+    from time import time
+    parser = argparse.ArgumentParser(
+        description="Compile a words file into a dictionary that word "
+                    "ladders can open instantly.")
+    parser.add_argument("source", nargs="?", default="words",
+                        help="whitespace-separated words")
+    parser.add_argument("target", nargs="?", default="words.wdb",
+                        help="compiled dictionary to write")
+    args = parser.parse_args()
+    start = time()
+    compile_dictionary(WordDictionary.from_file(args.source), args.target)
+    print("compiled {} to {} in {} seconds".format(
+        args.source, args.target, time() - start))
@@ -1,4 +1,7 @@
+from collections import deque
+from heapq import heappush, heappop
 from puzzle import Puzzle
+from word_dictionary import WordDictionary
 
 
 class WordLadderPuzzle(Puzzle):
@@ -12,15 +15,16 @@ class WordLadderPuzzle(Puzzle):
         from from_word to to_word using words in ws, changing one
         character at each step.
 
+        ws is interned as a WordDictionary, so puzzles over the same words
+        share one dictionary; passing a WordDictionary skips that step.
+
         @type from_word: str
         @type to_word: str
-        @type ws: set[str]
+        @type ws: set[str] | WordDictionary
         @rtype: None
         """
-        (self._from_word, self._to_word, self._word_set) = (from_word,
-                                                            to_word, ws)
-        # set of characters to use for 1-character changes
-        self._chars = "abcdefghijklmnopqrstuvwxyz"
+        (self._from_word, self._to_word, self._word_set) = (
+            from_word, to_word, WordDictionary.intern(ws))
 
     def __str__(self):
         """
@@ -51,10 +55,71 @@ class WordLadderPuzzle(Puzzle):
         >>> w1 == w3
         False
         """
-        return (type(self) == type(other) and self._chars == other._chars and
+        # interned dictionaries of the same words are the same object
+        return (type(self) == type(other) and
                 self._from_word == other._from_word and
-                self._to_word == other._to_word and self._word_set ==
-                                                                other._word_set)
+                self._to_word == other._to_word and
+                self._word_set is other._word_set)
+
+    def __hash__(self):
+        """
+        Return a hash of this puzzle's words
+
+        @param WordLadderPuzzle self: this puzzle
+        @rtype: int
+
+        >>> w1 = WordLadderPuzzle("on", "no", {"on", "no", "oo"})
+        >>> w2 = WordLadderPuzzle("on", "no", {"oo", "no", "on"})
+        >>> hash(w1) == hash(w2)
+        True
+        """
+        return hash((self._from_word, self._to_word))
+
+    def context(self):
+        """
+        Overrides Puzzle.context()
+
+        Return what every puzzle reached from this one shares: the word to
+        reach and the words that may be used.
+
+        @param WordLadderPuzzle self: this puzzle
+        @rtype: (str, WordDictionary)
+        """
+        return self._to_word, self._word_set
+
+    def to_bytes(self):
+        """
+        Overrides Puzzle.to_bytes()
+
+        Return the word this puzzle is at, in UTF-8.
+
+        @param WordLadderPuzzle self: this puzzle
+        @rtype: bytes
+
+        >>> w = WordLadderPuzzle("same", "cost", {"same", "some", "cost"})
+        >>> w.to_bytes()
+        b'same'
+        >>> copy = WordLadderPuzzle.from_bytes(b"some", w.context())
+        >>> copy == WordLadderPuzzle("some", "cost", {"same", "some", "cost"})
+        True
+        """
+        return self._from_word.encode("utf-8")
+
+    @classmethod
+    def from_bytes(cls, data, context):
+        """
+        Overrides Puzzle.from_bytes()
+
+        Return the WordLadderPuzzle whose to_bytes gave data, given its
+        context().
+
+        @param type cls: WordLadderPuzzle or a subclass
+        @param bytes data: what to_bytes returned
+        @param (str, WordDictionary) context: what context returned
+        @rtype: WordLadderPuzzle
+        """
+        to_word, word_set = context
+        return cls(data.decode("utf-8"), to_word, word_set)
 
     def extensions(self):
         """
@@ -62,7 +127,8 @@ class WordLadderPuzzle(Puzzle):
 
         Returns extensions of the present configuration. Legal extensions are
         WordLadderPuzzles that have a from_word that can be reached from this
-        one by changing a single letter to one of those in self._chars.
+        one by changing a single letter to a lowercase letter. They are
+        looked up in the shared WordDictionary.
 
         @param WordLadderPuzzle self: This word ladder puzzle
         @rtype: list[WordLadderPuzzle] | None
@@ -81,14 +147,83 @@ class WordLadderPuzzle(Puzzle):
         True
 
         """
-        l = []
-        for i in range(len(self._from_word)):
-            for c in self._chars:
-                s = self._from_word[:i] + c + self._from_word[i+1:]
-                if s in self._word_set and not s == self._from_word:
-                    l.append(WordLadderPuzzle(s, self._to_word, self._word_set))
+        return [WordLadderPuzzle(s, self._to_word, self._word_set)
+                for s in self._word_set.neighbours(self._from_word)]
+
+    def describe_move(self, extension):
+        """
+        Overrides Puzzle.describe_move()
+
+        Return the word stepped to in extension.
+
+        @param WordLadderPuzzle self: This word ladder puzzle
+        @param WordLadderPuzzle extension: an extension of self
+        @rtype: str
+
+        >>> w1 = WordLadderPuzzle("on", "no", {"on", "no", "an","oo"})
+        >>> w1.describe_move(w1.extensions()[1])
+        'oo'
+        >>> print(w1.apply_move("oo"))
+        oo -> no
+        """
+        return extension._from_word
+
+    def apply_move(self, move):
+        """
+        Overrides Puzzle.apply_move()
+
+        Return the word ladder puzzle stepped to the word move.
+
+        @param WordLadderPuzzle self: This word ladder puzzle
+        @param str move: a word one letter away from self._from_word
+        @rtype: WordLadderPuzzle
+        """
+        if (move not in self._word_set or len(move) != len(self._from_word)
+                or sum([a != b for a, b in zip(move, self._from_word)]) != 1):
+            raise ValueError("can't step from {} to {}".format(
+                self._from_word, move))
+        return WordLadderPuzzle(move, self._to_word, self._word_set)
+
+    def fail_fast(self):
+        """
+        Overrides Puzzle.fail_fast()
 
-        return l
+        Return True if no ladder leads from self._from_word to
+        self._to_word: when self._to_word isn't in the dictionary, or when
+        no word the ladder can start on is in the same connected component
+        of the dictionary as self._to_word. The components are labelled
+        once per dictionary, so this takes constant time from then on.
+
+        @param WordLadderPuzzle self: This word ladder puzzle
+        @rtype: bool
+
+        >>> ws = {"cast", "cost", "most", "mild", "mind"}
+        >>> WordLadderPuzzle("cast", "most", ws).fail_fast()
+        False
+        >>> WordLadderPuzzle("cast", "mind", ws).fail_fast()
+        True
+        >>> WordLadderPuzzle("cast", "mist", ws).fail_fast()
+        True
+        >>> WordLadderPuzzle("bost", "cast", ws).fail_fast()
+        False
+        >>> [str(e) for e in WordLadderPuzzle("cast", "mild", ws).extensions()]
+        ['cost -> mild']
+        >>> from puzzle_tools import breadth_first_solve
+        >>> breadth_first_solve(WordLadderPuzzle("cast", "mild", ws)) is None
+        True
+        """
+        from_word, to_word, words = (self._from_word, self._to_word,
+                                     self._word_set)
+        if from_word == to_word:
+            return False
+        target = words.component(to_word)
+        if target is None or len(from_word) != len(to_word):
+            return True
+        if from_word in words:
+            return words.component(from_word) != target
+        # a word outside the dictionary can still step into it
+        return all([words.component(w) != target
+                    for w in words.neighbours(from_word)])
 
     def is_solved(self):
         """
@@ -106,14 +241,197 @@ class WordLadderPuzzle(Puzzle):
         """
         return self._from_word == self._to_word
 
+
+def _ladder_parents(from_word, to_words, words):
+    """
+    Return the breadth-first tree of ladders from from_word through
+    WordDictionary words as a dict mapping each word reached to the words
+    one step nearer from_word on its shortest ladders. The search stops
+    after the layer where the last word of to_words is reached.
+
+    @type from_word: str
+    @type to_words: set[str]
+    @type words: WordDictionary
+    @rtype: dict[str, list[str]]
+    """
+    parents = {from_word: []}
+    layer, remaining = [from_word], set(to_words) - {from_word}
+    while layer and remaining:
+        next_layer = {}
+        for word in layer:
+            for w in words.neighbours(word):
+                if w not in parents:
+                    next_layer.setdefault(w, []).append(word)
+        parents.update(next_layer)
+        remaining.difference_update(next_layer)
+        layer = list(next_layer)
+    return parents
+
+
+def _ladders_to(word, parents):
+    """
+    Yield every shortest ladder, as a list of words, to word in the tree
+    parents built by _ladder_parents.
+
+    @type word: str
+    @type parents: dict[str, list[str]]
+    @rtype: generator[list[str]]
+    """
+    if not parents[word]:
+        yield [word]
+    for parent in parents[word]:
+        for ladder in _ladders_to(parent, parents):
+            yield ladder + [word]
+
+
+def all_shortest_ladders(puzzle):
+    """
+    Return every shortest ladder, as a list of words, solving
+    WordLadderPuzzle puzzle, in alphabetical order.
+
+    @type puzzle: WordLadderPuzzle
+    @rtype: list[list[str]]
+
+    >>> ws = {"cast", "cost", "case", "cose", "lose", "lost", "last"}
+    >>> for ladder in all_shortest_ladders(WordLadderPuzzle("cast", "lose", ws)):
+    ...     print(ladder)
+    ['cast', 'case', 'cose', 'lose']
+    ['cast', 'cost', 'cose', 'lose']
+    ['cast', 'cost', 'lost', 'lose']
+    ['cast', 'last', 'lost', 'lose']
+    >>> all_shortest_ladders(WordLadderPuzzle("cast", "most", ws))
+    []
+    """
+    if puzzle.is_solved():
+        return [[puzzle._from_word]]
+    if puzzle.fail_fast():
+        return []
+    parents = _ladder_parents(puzzle._from_word, {puzzle._to_word},
+                              puzzle._word_set)
+    if puzzle._to_word not in parents:
+        return []
+    return sorted(_ladders_to(puzzle._to_word, parents))
+
+
+def shortest_ladders_from(from_word, to_words, ws):
+    """
+    Return a dict mapping each word in to_words to a shortest ladder, as a
+    list of words, from from_word using words in ws, or to None where there
+    is no ladder. All the ladders come from one breadth-first search.
+
+    @type from_word: str
+    @type to_words: list[str]
+    @type ws: set[str] | WordDictionary
+    @rtype: dict[str, list[str] | None]
+
+    >>> ws = {"cast", "cost", "case", "cose", "lose", "lost", "last"}
+    >>> ladders = shortest_ladders_from("cast", ["lost", "case", "most"], ws)
+    >>> ladders["lost"], ladders["case"], ladders["most"]
+    (['cast', 'last', 'lost'], ['cast', 'case'], None)
+    """
+    words = WordDictionary.intern(ws)
+    # only search towards words the ladder can reach
+    reachable = [w for w in to_words
+                 if not WordLadderPuzzle(from_word, w, words).fail_fast()]
+    parents = _ladder_parents(from_word, reachable, words)
+    ladders = {}
+    for word in to_words:
+        if word in parents:
+            ladders[word] = next(_ladders_to(word, parents))
+        else:
+            ladders[word] = None
+    return ladders
+
+
+def _shortest_ladder(from_word, to_word, words, banned_words, banned_steps):
+    """
+    Return a shortest ladder, as a list of words, from from_word to to_word
+    through WordDictionary words that uses none of banned_words and none of
+    the steps in banned_steps, or None if there is none.
+
+    @type from_word: str
+    @type to_word: str
+    @type words: WordDictionary
+    @type banned_words: set[str]
+    @type banned_steps: set[(str, str)]
+    @rtype: list[str] | None
+    """
+    parents, q = {from_word: None}, deque([from_word])
+    while q:
+        word = q.popleft()
+        if word == to_word:
+            ladder = []
+            while word is not None:
+                ladder.append(word)
+                word = parents[word]
+            return ladder[::-1]
+        for w in words.neighbours(word):
+            if (w not in parents and w not in banned_words and
+                    (word, w) not in banned_steps):
+                parents[w] = word
+                q.append(w)
+    return None
+
+
+def k_shortest_ladders(puzzle, k):
+    """
+    Return the k shortest ladders, as lists of words, solving
+    WordLadderPuzzle puzzle without repeating a word, shortest first, or as
+    many as there are if there are fewer than k.
+
+    This is Yen's algorithm: each ladder after the first is the shortest
+    one found by leaving an earlier ladder at some word and avoiding the
+    steps the earlier ladders took from there.
+
+    @type puzzle: WordLadderPuzzle
+    @type k: int
+    @rtype: list[list[str]]
+
+    >>> ws = {"cast", "cost", "case", "cose", "lose", "lost", "last", "lase"}
+    >>> for ladder in k_shortest_ladders(WordLadderPuzzle("cast", "cost", ws), 3):
+    ...     print(ladder)
+    ['cast', 'cost']
+    ['cast', 'last', 'lost', 'cost']
+    ['cast', 'case', 'cose', 'cost']
+    """
+    from_word, to_word, words = (puzzle._from_word, puzzle._to_word,
+                                 puzzle._word_set)
+    if k <= 0 or puzzle.fail_fast():
+        return []
+    first = _shortest_ladder(from_word, to_word, words, set(), set())
+    if first is None:
+        return []
+    found, candidates, queued = [first], [], {tuple(first)}
+    while len(found) < k:
+        previous = found[-1]
+        for i in range(len(previous) - 1):
+            root = previous[:i + 1]
+            # steps from the end of root already taken by found ladders
+            banned_steps = {(ladder[i], ladder[i + 1]) for ladder in found
+                            if ladder[:i + 1] == root}
+            spur = _shortest_ladder(root[-1], to_word, words, set(root[:-1]),
+                                    banned_steps)
+            if spur is not None and tuple(root[:-1] + spur) not in queued:
+                queued.add(tuple(root[:-1] + spur))
+                heappush(candidates, (len(root) - 1 + len(spur),
+                                      root[:-1] + spur))
+        if not candidates:
+            break
+        found.append(heappop(candidates)[1])
+    return found
+
+
 if __name__ == '__main__':
     import doctest
     doctest.testmod()
     from puzzle_tools import breadth_first_solve, depth_first_solve
     from time import time
-    with open("words", encoding='utf-8') as words:
-        # with open("words","r") as words:
-        word_set = set(words.read().split())
+    import os
+    # run word_dictionary.py once to compile words for a faster start
+    if os.path.exists("words.wdb"):
+        word_set = WordDictionary.open("words.wdb")
+    else:
+        word_set = WordDictionary.from_file("words")
 
     w = WordLadderPuzzle("same", "cost", word_set)
     start = time()
@@ -0,0 +1,32 @@
+"""
+Zobrist hashing for puzzles on grids
+
+A Zobrist hash gives every pair of a cell and what it may hold a random
+64-bit key, and hashes a grid as the exclusive or of the keys of what its
+cells hold. A move then updates the hash with one exclusive or for each
+key it adds or takes away, instead of hashing the whole grid again.
+"""
+from random import Random
+
+# seeded, so the keys and every hash built from them are the same in
+# every process
+_random = Random(20161114)
+_keys = []
+
+
+def zobrist_keys(count):
+    """
+    Return count random 64-bit keys, the same ones in the same order in
+    every process.
+
+    @type count: int
+    @rtype: list[int]
+
+    >>> zobrist_keys(3) == zobrist_keys(5)[:3]
+    True
+    >>> all([0 <= key < 2 ** 64 for key in zobrist_keys(10)])
+    True
+    """
+    while len(_keys) < count:
+        _keys.append(_random.getrandbits(64))
+    return _keys[:count]